@@ -0,0 +1,87 @@
+"""
+Wire formats for the agent WebSocket
+
+JSON text frames remain the default (the Rust agent speaks nothing else).
+Agents can ask for MessagePack binary frames instead, either by offering the
+``msgpack`` WebSocket subprotocol or with ``?encoding=msgpack``; command output
+then travels as raw bytes instead of JSON-escaped strings. Compression is
+per-message deflate, negotiated by the WebSocket server itself.
+"""
+
+import json
+import logging
+from typing import Optional
+
+try:
+    import msgpack
+except ImportError:  # optional: only needed by agents that ask for it
+    msgpack = None
+
+# Message fields that may arrive as raw bytes from binary-encoding agents
+_BYTES_FIELDS = ("output", "error", "data")
+
+logger = logging.getLogger(__name__)
+
+
+class UnsupportedEncoding(Exception):
+    """The agent asked for an encoding this server can't speak"""
+
+
+class JsonCodec:
+    """JSON in text frames"""
+
+    name = "json"
+
+    async def receive(self, websocket) -> dict:
+        return json.loads(await websocket.receive_text())
+
+    async def send(self, websocket, message: dict):
+        await websocket.send_text(json.dumps(message, default=str))
+
+
+class MsgpackCodec:
+    """MessagePack in binary frames; output fields may be raw bytes"""
+
+    name = "msgpack"
+
+    async def receive(self, websocket) -> dict:
+        message = msgpack.unpackb(await websocket.receive_bytes(), raw=False)
+        data = message.get("data")
+        if isinstance(data, dict):
+            for field in _BYTES_FIELDS:
+                if isinstance(data.get(field), bytes):
+                    # Stored and shown as text like JSON agents' output
+                    data[field] = data[field].decode("utf-8", errors="replace")
+        return message
+
+    async def send(self, websocket, message: dict):
+        await websocket.send_bytes(
+            msgpack.packb(message, use_bin_type=True, default=str)
+        )
+
+
+JSON_CODEC = JsonCodec()
+CODECS = {"json": JSON_CODEC}
+if msgpack is not None:
+    CODECS["msgpack"] = MsgpackCodec()
+
+
+def negotiate_codec(websocket) -> tuple:
+    """(codec, subprotocol to accept) for a connecting agent
+
+    An explicit ``?encoding=`` must be supported or ``UnsupportedEncoding``
+    is raised; offered subprotocols are matched in the client's order and
+    ignored when none is supported, falling back to JSON.
+    """
+    encoding: Optional[str] = websocket.query_params.get("encoding")
+    if encoding:
+        codec = CODECS.get(encoding)
+        if codec is None:
+            raise UnsupportedEncoding(f"Unsupported encoding: {encoding}")
+        return codec, None
+
+    for subprotocol in websocket.scope.get("subprotocols", []):
+        codec = CODECS.get(subprotocol)
+        if codec is not None:
+            return codec, subprotocol
+    return JSON_CODEC, None
@@ -2,9 +2,15 @@
 Authentication Module for Remote Agent Manager
 """
 
+import asyncio
+import os
+import threading
+import time
 import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Set, Tuple
 
 import jwt
 from fastapi import Depends, HTTPException, Request, status
@@ -12,14 +18,33 @@ from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from passlib.context import CryptContext
 from pydantic import BaseModel
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing. Raising BCRYPT_ROUNDS makes older, cheaper hashes count
+# as outdated; they are replaced the next time their user logs in.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
+# Threads hashing passwords off the event loop (bcrypt releases the GIL), and
+# how many hashes may wait for one before new logins are turned away
+PASSWORD_HASH_WORKERS = int(
+    os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1)))
+)
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
 
 # JWT settings
 SECRET_KEY = "your-secret-key-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# How long a token's user is remembered without asking the database again.
+# Changes made in this process evict it at once; other workers' changes are
+# picked up within this time.
+PRINCIPAL_CACHE_TTL = 30  # seconds
+PRINCIPAL_CACHE_SIZE = 10000
+
 # Security
 security = HTTPBearer()
 
@@ -56,6 +81,190 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     username: Optional[str] = None
+    # Expiry as a Unix timestamp, when the token has one
+    exp: Optional[int] = None
+
+
+class PrincipalCache:
+    """Users behind recently verified tokens
+
+    Entries are keyed by token and expire after ``ttl`` seconds or when the
+    token does, whichever comes first. ``invalidate_user`` drops every token
+    of a user whose row changed; a lookup that started before the change
+    (``generation`` moved on meanwhile) is not cached.
+    """
+
+    def __init__(
+        self, ttl: float = PRINCIPAL_CACHE_TTL, max_size: int = PRINCIPAL_CACHE_SIZE
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.generation = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._tokens_by_user: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._attached = set()
+
+    def attach(self, db):
+        """Listen for user changes committed through ``db``"""
+        if id(db) not in self._attached:
+            self._attached.add(id(db))
+            db.user_listeners.append(self.invalidate_user)
+
+    def get(self, token: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            user_data, expires_at = entry
+            if expires_at <= time.time():
+                self._drop(token)
+                return None
+            return user_data
+
+    def put(self, token: str, user_data: dict, exp: Optional[int], generation: int):
+        expires_at = time.time() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, exp)
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._drop(token)
+            self._entries[token] = (user_data, expires_at)
+            self._tokens_by_user.setdefault(user_data["id"], set()).add(token)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: str):
+        with self._lock:
+            self.generation += 1
+            for token in self._tokens_by_user.pop(user_id, ()):
+                self._entries.pop(token, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def _drop(self, token: str):
+        entry = self._entries.pop(token, None)
+        if entry is not None:
+            tokens = self._tokens_by_user.get(entry[0]["id"])
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self._tokens_by_user[entry[0]["id"]]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+principal_cache = PrincipalCache()
+
+
+class PasswordHasher:
+    """Runs password hashing on a small pool of its own threads
+
+    At most ``workers`` hashes run at once; up to ``max_queue`` more wait for
+    a thread, beyond that callers get a 503 rather than piling up. Counters
+    and wait/run times are kept for the health endpoint.
+    """
+
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_queue: int = PASSWORD_HASH_MAX_QUEUE,
+    ):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hash"
+        )
+        self.queued = 0
+        self.running = 0
+        self.counters = {
+            "completed": 0,
+            "rejected": 0,
+            "rehashed": 0,
+            "wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "hash_seconds": 0.0,
+        }
+        self._lock = threading.Lock()
+
+    async def run(self, func, *args):
+        """Run ``func(*args)`` on the pool and await its result"""
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.counters["rejected"] += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many logins in progress, try again shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self.queued += 1
+        # Whichever side leaves the queue first - the pool thread picking the
+        # call up, or a caller cancelled while it waits - takes it off the count
+        ticket = {"queued": True}
+        submitted = time.monotonic()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                self.executor, self._timed, ticket, submitted, func, *args
+            )
+        finally:
+            self._dequeue(ticket)
+
+    def _dequeue(self, ticket: dict):
+        with self._lock:
+            if ticket["queued"]:
+                ticket["queued"] = False
+                self.queued -= 1
+
+    def _timed(self, ticket: dict, submitted: float, func, *args):
+        started = time.monotonic()
+        self._dequeue(ticket)
+        with self._lock:
+            self.running += 1
+            wait = started - submitted
+            self.counters["wait_seconds"] += wait
+            self.counters["max_wait_seconds"] = max(
+                self.counters["max_wait_seconds"], wait
+            )
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.counters["completed"] += 1
+                self.counters["hash_seconds"] += time.monotonic() - started
+
+    def count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def metrics(self) -> dict:
+        """Snapshot of pool usage and timing"""
+        with self._lock:
+            completed = self.counters["completed"]
+            return {
+                "workers": self.workers,
+                "running": self.running,
+                "queued": self.queued,
+                "max_queue": self.max_queue,
+                "rounds": BCRYPT_ROUNDS,
+                **self.counters,
+                "avg_wait_seconds": (
+                    self.counters["wait_seconds"] / completed if completed else 0.0
+                ),
+                "avg_hash_seconds": (
+                    self.counters["hash_seconds"] / completed if completed else 0.0
+                ),
+            }
+
+
+password_hasher = PasswordHasher()
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -68,6 +277,47 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def hash_password(password: str) -> str:
+    """Hash a password without blocking the event loop"""
+    return await password_hasher.run(get_password_hash, password)
+
+
+async def check_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """Verify a password without blocking the event loop
+
+    Returns whether it matched and, if the stored hash uses outdated
+    settings, a fresh hash to store in its place.
+    """
+    return await password_hasher.run(
+        pwd_context.verify_and_update, plain_password, hashed_password
+    )
+
+
+async def check_user_password(user_data: dict, plain_password: str) -> bool:
+    """Verify a user's password, upgrading its stored hash when outdated"""
+    import logging
+
+    logger = logging.getLogger(__name__)
+
+    valid, new_hash = await check_password(plain_password, user_data["hashed_password"])
+    if valid and new_hash:
+        from Scripts.database import async_db_manager
+
+        try:
+            await async_db_manager.update_user(
+                user_data["id"], {"hashed_password": new_hash}
+            )
+            password_hasher.count("rehashed")
+            logger.info(f"🔐 Rehashed password for user: {user_data['username']}")
+        except Exception as e:
+            logger.error(
+                f"❌ Failed to rehash password for {user_data['username']}: {e}"
+            )
+    return valid
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -94,7 +344,7 @@ def verify_token(token: str) -> Optional[TokenData]:
         if username is None:
             logger.error("❌ No 'sub' field in token payload")
             return None
-        token_data = TokenData(username=username)
+        token_data = TokenData(username=username, exp=payload.get("exp"))
         logger.info(f"✅ Token verified successfully for user: {username}")
         return token_data
     except jwt.PyJWTError as e:
@@ -102,6 +352,29 @@ def verify_token(token: str) -> Optional[TokenData]:
         return None
 
 
+async def load_principal(token: str, token_data: TokenData) -> Optional[dict]:
+    """Look up the user a verified token names, and cache it"""
+    from Scripts.database import async_db_manager
+
+    principal_cache.attach(async_db_manager.db)
+    generation = principal_cache.generation
+    user_data = await async_db_manager.get_user_by_username(token_data.username)
+    if user_data is not None:
+        principal_cache.put(token, user_data, token_data.exp, generation)
+    return user_data
+
+
+async def get_user_for_token(token: str) -> Optional[dict]:
+    """The user behind a token; None if the token or the user is invalid"""
+    user_data = principal_cache.get(token)
+    if user_data is not None:
+        return user_data
+    token_data = verify_token(token)
+    if token_data is None:
+        return None
+    return await load_principal(token, token_data)
+
+
 async def get_current_user(request: Request) -> Optional[User]:
     """Get current user from token (supports both Bearer token and cookie)"""
     import logging
@@ -137,6 +410,10 @@ async def get_current_user(request: Request) -> Optional[User]:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    user_data = principal_cache.get(token)
+    if user_data is not None:
+        return User(**user_data)
+
     logger.info(f"🔍 Verifying token: {token[:20]}...")
     token_data = verify_token(token)
     if token_data is None:
@@ -149,10 +426,8 @@ async def get_current_user(request: Request) -> Optional[User]:
 
     logger.info(f"🔍 Token verified for username: {token_data.username}")
 
-    # Get user from database
-    from Scripts.database import db_manager
-
-    user_data = db_manager.get_user_by_username(token_data.username)
+    # Get user from database (and remember it for this token)
+    user_data = await load_principal(token, token_data)
     if user_data is None:
         logger.error(f"❌ User not found in database: {token_data.username}")
         raise HTTPException(
@@ -0,0 +1,163 @@
+"""
+Commands waiting for an agent to collect them
+
+Commands for agents without a WebSocket are queued here (and in the
+pending_commands table, so they survive restarts). HTTP agents poll
+``GET /api/agents/{agent_id}/commands``; each poll leases the commands it
+returns, and a leased command is not handed out again until the agent
+acknowledges it (or reports its result) or the lease runs out, in which case
+it is delivered again (at-least-once). Long polls wait on a per-agent event
+that is set as soon as a command is queued. When the agent's WebSocket
+connects the queue is drained onto it.
+
+Commands are handed out highest priority first, oldest first within a
+priority. Each agent's queue is bounded; ``put`` raises ``CommandQueueFull``
+past the limit.
+"""
+
+import asyncio
+import itertools
+import time
+from typing import Dict, List, Optional
+
+# Unacknowledged commands are handed out again after this long
+COMMAND_LEASE_TIMEOUT = 60  # seconds
+# Longest ``?wait=`` a poll may ask for
+LONG_POLL_MAX_WAIT = 60  # seconds
+# Commands queued per agent before new ones are rejected
+COMMAND_QUEUE_LIMIT = 100
+
+
+class CommandQueueFull(Exception):
+    """The agent already has as many queued commands as allowed"""
+
+
+class QueuedCommand:
+    """A command waiting for, or leased to, an agent"""
+
+    __slots__ = ("task_id", "command", "priority", "seq", "leased_until", "deliveries")
+
+    def __init__(self, task_id: str, command: dict, priority: int, seq: int):
+        self.task_id = task_id
+        self.command = command
+        self.priority = priority
+        self.seq = seq
+        # Monotonic time the current lease ends; None while never delivered
+        self.leased_until: Optional[float] = None
+        self.deliveries = 0
+
+    def available(self, now: float) -> bool:
+        return self.leased_until is None or self.leased_until <= now
+
+
+class CommandQueue:
+    """Per-agent bounded priority queues with leases and long-poll wakeups"""
+
+    def __init__(
+        self,
+        lease_timeout: float = COMMAND_LEASE_TIMEOUT,
+        max_per_agent: int = COMMAND_QUEUE_LIMIT,
+    ):
+        self.lease_timeout = lease_timeout
+        self.max_per_agent = max_per_agent
+        self._queues: Dict[str, Dict[str, QueuedCommand]] = {}
+        self._seq = itertools.count()
+        # Long polls in progress per agent, sharing one wakeup event
+        self._events: Dict[str, asyncio.Event] = {}
+        self._waiting: Dict[str, int] = {}
+
+    def is_full(self, agent_id: str) -> bool:
+        return len(self._queues.get(agent_id, ())) >= self.max_per_agent
+
+    def put(
+        self,
+        agent_id: str,
+        task_id: str,
+        command: dict,
+        priority: int = 0,
+        enforce_limit: bool = True,
+    ):
+        """Queue a command and wake the agent's long polls"""
+        queue = self._queues.get(agent_id, {})
+        if enforce_limit and task_id not in queue and self.is_full(agent_id):
+            raise CommandQueueFull(
+                f"Agent {agent_id} already has {len(queue)} queued commands"
+            )
+        # Only an accepted command creates the agent's queue
+        queue = self._queues.setdefault(agent_id, queue)
+        queue[task_id] = QueuedCommand(task_id, command, priority, next(self._seq))
+        event = self._events.get(agent_id)
+        if event is not None:
+            event.set()
+
+    def ack(self, agent_id: str, task_id: str) -> bool:
+        """Remove a command the agent has taken; False if it wasn't queued"""
+        queue = self._queues.get(agent_id)
+        if queue is None or queue.pop(task_id, None) is None:
+            return False
+        if not queue:
+            del self._queues[agent_id]
+        return True
+
+    def ordered(self, agent_id: str) -> List[QueuedCommand]:
+        """The agent's queued commands in delivery order"""
+        return sorted(
+            self._queues.get(agent_id, {}).values(),
+            key=lambda entry: (-entry.priority, entry.seq),
+        )
+
+    def pending(self, agent_id: str) -> List[dict]:
+        """Every queued command, leased or not, in delivery order"""
+        return [entry.command for entry in self.ordered(agent_id)]
+
+    def lease(self, agent_id: str, now: Optional[float] = None) -> List[dict]:
+        """Hand out every command that is not currently leased"""
+        now = time.monotonic() if now is None else now
+        leased = []
+        for entry in self.ordered(agent_id):
+            if entry.available(now):
+                entry.leased_until = now + self.lease_timeout
+                entry.deliveries += 1
+                leased.append({**entry.command, "delivery": entry.deliveries})
+        return leased
+
+    def _next_expiry(self, agent_id: str) -> Optional[float]:
+        leases = [
+            entry.leased_until
+            for entry in self._queues.get(agent_id, {}).values()
+            if entry.leased_until is not None
+        ]
+        return min(leases) if leases else None
+
+    async def wait(self, agent_id: str, timeout: float) -> List[dict]:
+        """Lease commands, waiting up to ``timeout`` seconds for one to arrive
+
+        Returns as soon as a command is queued or a lease runs out; an empty
+        list means the wait timed out.
+        """
+        deadline = time.monotonic() + timeout
+        event = self._events.setdefault(agent_id, asyncio.Event())
+        self._waiting[agent_id] = self._waiting.get(agent_id, 0) + 1
+        try:
+            while True:
+                event.clear()
+                leased = self.lease(agent_id)
+                now = time.monotonic()
+                if leased or now >= deadline:
+                    return leased
+                wake_at = deadline
+                expiry = self._next_expiry(agent_id)
+                if expiry is not None:
+                    wake_at = min(wake_at, expiry)
+                try:
+                    await asyncio.wait_for(event.wait(), max(wake_at - now, 0))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._waiting[agent_id] -= 1
+            if not self._waiting[agent_id]:
+                del self._waiting[agent_id]
+                del self._events[agent_id]
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
@@ -2,14 +2,28 @@
 Customer Authentication Module for Remote Agent Manager
 """
 
+import asyncio
+import hashlib
 import logging
-from typing import Optional
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Set
 
 from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pydantic import BaseModel
 
-from Scripts.database import db_manager
+from Scripts.database import async_db_manager
+
+# How long a key's customer is remembered without asking the database again.
+# Key changes made in this process evict it at once; other workers' changes
+# are picked up within this time.
+API_KEY_CACHE_TTL = 30  # seconds
+API_KEY_CACHE_SIZE = 10000
+# How often buffered api_key_last_used times are written
+API_KEY_USAGE_FLUSH_INTERVAL = 30  # seconds
 
 # Security
 security = HTTPBearer()
@@ -35,6 +49,164 @@ class CustomerAPIKey(BaseModel):
     api_key: str
 
 
+def hash_api_key(api_key: str) -> str:
+    """Digest an API key is cached under, so the key itself isn't kept"""
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+class ApiKeyCache:
+    """Customers behind recently used API keys
+
+    Entries are keyed by the SHA-256 of the key and stored without it; they
+    expire after ``ttl`` seconds. ``invalidate_customer`` drops a customer
+    whose row or key changed; a lookup that started before the change
+    (``generation`` moved on meanwhile) is not cached.
+    """
+
+    def __init__(
+        self, ttl: float = API_KEY_CACHE_TTL, max_size: int = API_KEY_CACHE_SIZE
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.generation = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._keys_by_customer: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._attached = set()
+
+    def attach(self, db):
+        """Listen for customer changes committed through ``db``"""
+        if id(db) not in self._attached:
+            self._attached.add(id(db))
+            db.customer_listeners.append(self.invalidate_customer)
+
+    def get(self, key_hash: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key_hash)
+            if entry is None:
+                return None
+            customer_data, expires_at = entry
+            if expires_at <= time.time():
+                self._drop(key_hash)
+                return None
+            return customer_data
+
+    def put(self, key_hash: str, customer_data: dict, generation: int):
+        customer_data = {k: v for k, v in customer_data.items() if k != "api_key"}
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._drop(key_hash)
+            self._entries[key_hash] = (customer_data, time.time() + self.ttl)
+            self._keys_by_customer.setdefault(customer_data["uuid"], set()).add(
+                key_hash
+            )
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate_customer(self, customer_uuid: str):
+        with self._lock:
+            self.generation += 1
+            for key_hash in self._keys_by_customer.pop(customer_uuid, ()):
+                self._entries.pop(key_hash, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._keys_by_customer.clear()
+
+    def _drop(self, key_hash: str):
+        entry = self._entries.pop(key_hash, None)
+        if entry is not None:
+            keys = self._keys_by_customer.get(entry[0]["uuid"])
+            if keys is not None:
+                keys.discard(key_hash)
+                if not keys:
+                    del self._keys_by_customer[entry[0]["uuid"]]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ApiKeyUsageBuffer:
+    """Latest API key use per customer, flushed to the customers table in batches
+
+    Authenticated requests only update this table; ``flush`` writes every
+    buffered ``api_key_last_used`` in one transaction. A use still buffered
+    when its customer's key is replaced or revoked is dropped.
+    """
+
+    def __init__(self, db, flush_interval: float = API_KEY_USAGE_FLUSH_INTERVAL):
+        self.db = db
+        self.flush_interval = flush_interval
+        # customer_uuid -> time of the latest use not yet written
+        self.pending: Dict[str, datetime] = {}
+        self.logger = logging.getLogger(__name__)
+        # forget() is called from the database writer thread
+        self._lock = threading.Lock()
+        self._attached = set()
+
+    def attach(self, db):
+        """Listen for customer changes committed through ``db``"""
+        if id(db) not in self._attached:
+            self._attached.add(id(db))
+            db.customer_listeners.append(self.forget)
+
+    def record(self, customer_uuid: str) -> datetime:
+        """Absorb a use of a customer's key; it is written on the next flush"""
+        used_at = datetime.utcnow()
+        with self._lock:
+            self.pending[customer_uuid] = used_at
+        return used_at
+
+    def forget(self, customer_uuid: str):
+        """Drop a buffered use (e.g. after the key was replaced or revoked)"""
+        with self._lock:
+            self.pending.pop(customer_uuid, None)
+
+    async def flush(self) -> int:
+        """Write all buffered uses in a single batched transaction"""
+        with self._lock:
+            if not self.pending:
+                return 0
+            batch, self.pending = self.pending, {}
+        try:
+            return await self.db.update_api_key_usage(batch)
+        except Exception:
+            # Put the batch back unless a newer use arrived meanwhile
+            with self._lock:
+                for customer_uuid, used_at in batch.items():
+                    self.pending.setdefault(customer_uuid, used_at)
+            raise
+
+    async def run(self):
+        """Background task that flushes buffered uses periodically"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                flushed = await self.flush()
+                if flushed:
+                    self.logger.debug(f"💾 Flushed {flushed} API key uses")
+            except Exception as e:
+                self.logger.error(f"❌ Error flushing API key uses: {e}")
+
+
+api_key_cache = ApiKeyCache()
+api_key_usage = ApiKeyUsageBuffer(async_db_manager)
+api_key_usage.attach(async_db_manager.db)
+api_key_cache.attach(async_db_manager.db)
+
+
+async def load_customer(api_key: str, key_hash: str) -> Optional[dict]:
+    """Look up the customer owning an API key, and cache it"""
+    generation = api_key_cache.generation
+    customer_data = await async_db_manager.find_customer_by_api_key(api_key)
+    if customer_data is not None:
+        api_key_cache.put(key_hash, customer_data, generation)
+    return customer_data
+
+
 async def get_current_customer(request: Request) -> Optional[Customer]:
     """Get current customer from API key"""
     logger.info(
@@ -69,8 +241,11 @@ async def get_current_customer(request: Request) -> Optional[Customer]:
 
     logger.info(f"🔍 Verifying API key: {api_key[:20]}...")
 
-    # Get customer from database
-    customer_data = db_manager.get_customer_by_api_key(api_key)
+    # Get customer from the cache, or the database on a miss
+    key_hash = hash_api_key(api_key)
+    customer_data = api_key_cache.get(key_hash)
+    if customer_data is None:
+        customer_data = await load_customer(api_key, key_hash)
     if customer_data is None:
         logger.error("❌ Invalid API key")
         raise HTTPException(
@@ -87,8 +262,16 @@ async def get_current_customer(request: Request) -> Optional[Customer]:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    # Record the use; it is written with the next batch
+    used_at = api_key_usage.record(customer_data["uuid"])
     logger.info(f"✅ Customer authenticated successfully: {customer_data['name']}")
-    return Customer(**customer_data)
+    return Customer(
+        **{
+            **customer_data,
+            "api_key": api_key,
+            "api_key_last_used": used_at.isoformat(),
+        }
+    )
 
 
 async def get_current_customer_dependency(request: Request) -> Customer:
@@ -1,37 +1,371 @@
 """
-SQLite Database Module for Agent Registration
+Database Module for Agent Registration
+
+SQLite in Data/agents.db by default; ``DATABASE_URL`` points it at any
+database SQLAlchemy supports.
 """
 
+import asyncio
+import atexit
+import base64
+import binascii
+import functools
 import json
 
 # Database setup
 import os
+import queue
+import threading
+import time
 import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional
 
 from sqlalchemy import (
     Boolean,
     Column,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
+    and_,
+    bindparam,
+    case,
     create_engine,
+    event,
+    func,
+    or_,
+    update,
 )
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
 # Get the project root directory (parent of Scripts)
 project_root = Path(__file__).parent.parent
 data_dir = project_root / "Data"
 data_dir.mkdir(exist_ok=True)  # Ensure Data directory exists
 
-DATABASE_URL = f"sqlite:///{data_dir}/agents.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Any SQLAlchemy URL; SQLite in Data/ unless told otherwise
+DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{data_dir}/agents.db")
+# "production" (WAL, relaxed fsync) or "default" (SQLite's own settings)
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "production")
+# Threads used to run database calls off the event loop
+DB_EXECUTOR_WORKERS = 4
+# Connections kept open: one per executor thread plus the odd caller that
+# runs outside it (startup, scripts), so a worker never waits for one
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", str(DB_EXECUTOR_WORKERS + 2)))
+# Writes committed in one transaction at most, and how long the first of
+# them waits for others to join it. With no wait a group is whatever queued
+# up while the previous one committed, which adds no latency when idle.
+GROUP_COMMIT_MAX_WRITES = 64
+GROUP_COMMIT_MAX_DELAY = float(os.getenv("GROUP_COMMIT_MAX_DELAY", "0"))  # seconds
+# Largest page the list endpoints hand out
+MAX_PAGE_SIZE = 500
+
+
+class StorageBackend:
+    """How the engine for one kind of database is built
+
+    ``DatabaseManager`` only sees the engines, so supporting another
+    database means another subclass here. Each manager has a writer engine
+    (a single connection, owned by its writer thread) and a reader engine.
+    This base is used for server databases (PostgreSQL, MySQL, ...): a sized
+    connection pool whose connections are checked before use, as the server
+    may have closed them.
+    """
+
+    name = "server"
+
+    def __init__(self, url: str):
+        self.url = url
+
+    def is_memory(self) -> bool:
+        return False
+
+    def engine_options(self, writer: bool = False) -> dict:
+        pool_size = 1 if writer else DB_POOL_SIZE
+        return {
+            "pool_size": pool_size,
+            "max_overflow": 0 if writer else pool_size,
+            "pool_pre_ping": True,
+            "pool_recycle": 1800,
+        }
+
+    def on_connect(self, dbapi_connection, connection_record):
+        """Per-connection setup"""
+
+    def on_connect_reader(self, dbapi_connection, connection_record):
+        """Extra setup for reader connections"""
+
+    def on_connect_writer(self, dbapi_connection, connection_record):
+        """Extra setup for the writer's connection"""
+
+    def on_begin_writer(self, connection):
+        """Called as the writer starts a transaction"""
+
+    def create_engine(self, writer: bool = False):
+        engine = create_engine(self.url, **self.engine_options(writer))
+        event.listen(engine, "connect", self.on_connect)
+        if writer:
+            event.listen(engine, "connect", self.on_connect_writer)
+            event.listen(engine, "begin", self.on_begin_writer)
+        else:
+            event.listen(engine, "connect", self.on_connect_reader)
+        return engine
+
+
+class SQLiteBackend(StorageBackend):
+    """SQLite with its own defaults (rollback journal, full fsync)"""
+
+    name = "sqlite"
+
+    def is_memory(self) -> bool:
+        database = make_url(self.url).database
+        return not database or database == ":memory:"
+
+    def engine_options(self, writer: bool = False) -> dict:
+        # Connections are handed between executor threads
+        options = {"connect_args": {"check_same_thread": False}}
+        if self.is_memory():
+            # One connection shared by every thread, or each gets its own DB
+            options["poolclass"] = StaticPool
+        elif writer:
+            options.update(pool_size=1, max_overflow=0)
+        else:
+            options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_POOL_SIZE)
+        return options
+
+    def on_connect_reader(self, dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            # Writes go through the writer thread; catch any that don't
+            cursor.execute("PRAGMA query_only=ON")
+        finally:
+            cursor.close()
+
+    def on_connect_writer(self, dbapi_connection, connection_record):
+        # pysqlite only issues BEGIN before DML, which breaks the SAVEPOINTs
+        # each write runs in; let SQLAlchemy's begin event do it instead
+        dbapi_connection.isolation_level = None
+
+    def on_begin_writer(self, connection):
+        # Take the write lock up front rather than upgrading mid-transaction
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+class TunedSQLiteBackend(SQLiteBackend):
+    """SQLite set up for a busy server
+
+    WAL lets readers carry on while a write commits, ``synchronous=NORMAL``
+    fsyncs at checkpoints instead of on every commit (a power cut can lose the
+    last commits, never corrupt the file), and the busy timeout makes a
+    writer wait for the lock instead of failing with "database is locked".
+    """
+
+    name = "sqlite-production"
+
+    PRAGMAS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,  # milliseconds
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,  # KiB
+        "temp_store": "MEMORY",
+    }
+
+    def on_connect(self, dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma, value in self.PRAGMAS.items():
+                cursor.execute(f"PRAGMA {pragma}={value}")
+        finally:
+            cursor.close()
+
+
+def create_storage_backend(
+    url: str = DATABASE_URL, profile: str = SQLITE_PROFILE
+) -> StorageBackend:
+    """The backend for a database URL (and SQLite profile)"""
+    if make_url(url).get_backend_name() != "sqlite":
+        return StorageBackend(url)
+    if profile == "production":
+        return TunedSQLiteBackend(url)
+    if profile == "default":
+        return SQLiteBackend(url)
+    raise ValueError(f"Unknown SQLite profile: {profile}")
+
+
+class GroupSession:
+    """The writer's session as seen by one write
+
+    Each ``get_session()`` on the writer thread runs in its own SAVEPOINT:
+    ``commit`` releases it (the real commit happens once for the whole
+    group) and ``rollback``/``close`` undo whatever it has not committed, so
+    a failing write never takes the rest of its group down with it.
+    """
+
+    def __init__(self, session):
+        self._session = session
+        self._savepoint = session.begin_nested()
+
+    def commit(self):
+        self._savepoint.commit()
+        self._savepoint = self._session.begin_nested()
+
+    def rollback(self):
+        self._savepoint.rollback()
+        self._savepoint = self._session.begin_nested()
+
+    def close(self):
+        if self._savepoint is not None:
+            self._savepoint.rollback()
+            self._savepoint = None
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+class DatabaseWriter:
+    """The one thread that writes to the database
+
+    Writes are queued from any thread and run one after another on the
+    writer's single connection. Every write that arrives within
+    ``max_delay`` of the first (up to ``max_writes``) is committed in the same
+    transaction, so a burst costs one commit instead of one each and writers
+    never fight over the database lock. Callers get a future that resolves to
+    the write's return value once its group has committed.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        max_writes: int = GROUP_COMMIT_MAX_WRITES,
+        max_delay: float = GROUP_COMMIT_MAX_DELAY,
+    ):
+        self.session_factory = session_factory
+        self.max_writes = max_writes
+        self.max_delay = max_delay
+        self.session = None
+        # Totals, for benchmarks and health checks
+        self.writes = 0
+        self.groups = 0
+        # Callbacks waiting for the current group to commit
+        self._after_commit: List[tuple] = []
+        self._queue = queue.SimpleQueue()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+        # Commit whatever is still queued when the process exits
+        atexit.register(self.stop)
+
+    def on_writer_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def submit(self, func, *args, **kwargs) -> Future:
+        """Queue ``func(*args, **kwargs)`` to run on the writer thread"""
+        if self._stopping:
+            raise RuntimeError("Database writer has stopped")
+        future = Future()
+        self._queue.put((future, func, args, kwargs))
+        return future
+
+    def call(self, func, *args, **kwargs):
+        """Run a write and wait until it has committed"""
+        if self.on_writer_thread():
+            # A write calling another write: part of the same group
+            return func(*args, **kwargs)
+        return self.submit(func, *args, **kwargs).result()
+
+    def after_commit(self, callback, *args):
+        """Call ``callback(*args)`` once the current write's group commits
+
+        Only for writes (on the writer thread); the callback runs there too.
+        """
+        self._after_commit.append((callback, args))
+
+    def stop(self):
+        """Commit the queued writes and end the thread"""
+        if self._stopping:
+            return
+        self._stopping = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self) -> List[tuple]:
+        group = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while group[-1] is not None and len(group) < self.max_writes:
+            try:
+                group.append(
+                    self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                )
+            except queue.Empty:
+                break
+        return group
+
+    def _run(self):
+        self.session = self.session_factory()
+        try:
+            while True:
+                group = self._collect()
+                writes = [write for write in group if write is not None]
+                if writes:
+                    self._commit_group(writes)
+                if len(writes) < len(group):
+                    return
+        finally:
+            self.session.close()
+
+    def _commit_group(self, writes: List[tuple]):
+        done = []
+        for future, func, args, kwargs in writes:
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                done.append((future, func(*args, **kwargs)))
+            except Exception as e:
+                future.set_exception(e)
+        try:
+            self.session.commit()
+        except Exception as e:
+            self.session.rollback()
+            print(f"❌ Error committing {len(done)} writes: {e}")
+            for future, _ in done:
+                future.set_exception(e)
+        else:
+            self.writes += len(done)
+            self.groups += 1
+            for callback, args in self._after_commit:
+                try:
+                    callback(*args)
+                except Exception as e:
+                    print(f"❌ Error in after-commit callback: {e}")
+            for future, result in done:
+                future.set_result(result)
+        finally:
+            self._after_commit.clear()
+            # Nothing is read back from the writer between groups
+            self.session.expunge_all()
+
+
+def writes(method):
+    """Run a DatabaseManager method on its writer thread"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return self.writer.call(method, self, *args, **kwargs)
+
+    wrapper.writes = True
+    return wrapper
+
+
+storage_backend = create_storage_backend()
 Base = declarative_base()
 
 
@@ -53,6 +387,21 @@ class Agent(Base):
     is_active = Column(Boolean, default=True)
     customer_uuid = Column(String, nullable=True)
 
+    # Each sortable column is indexed with agent_id as the tie-breaker, so a
+    # keyset page is an index range scan whatever the fleet size
+    __table_args__ = (
+        Index("ix_agents_active_hostname", "is_active", "hostname", "agent_id"),
+        Index(
+            "ix_agents_active_last_heartbeat", "is_active", "last_heartbeat", "agent_id"
+        ),
+        Index(
+            "ix_agents_active_registered_at", "is_active", "registered_at", "agent_id"
+        ),
+        Index("ix_agents_active_status", "is_active", "status", "agent_id"),
+        Index("ix_agents_active_version", "is_active", "version", "agent_id"),
+        Index("ix_agents_customer_uuid", "customer_uuid"),
+    )
+
 
 class Task(Base):
     """Task execution model"""
@@ -73,6 +422,18 @@ class Task(Base):
     logs = Column(Text, nullable=True)  # JSON string
 
 
+class PendingCommand(Base):
+    """Command queued for an agent that has not collected it yet"""
+
+    __tablename__ = "pending_commands"
+
+    task_id = Column(String, primary_key=True)
+    agent_id = Column(String, index=True)
+    priority = Column(Integer, default=0)
+    command = Column(Text)  # JSON string of the command message
+    queued_at = Column(DateTime, default=datetime.utcnow)
+
+
 class Customer(Base):
     """Customer model"""
 
@@ -143,22 +504,247 @@ class LoginHistory(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
+# Columns agent listings can be sorted by
+AGENT_SORT_COLUMNS = {
+    "hostname": Agent.hostname,
+    "last_heartbeat": Agent.last_heartbeat,
+    "registered_at": Agent.registered_at,
+    "status": Agent.status,
+    "version": Agent.version,
+}
+
+
+def encode_cursor(values: list) -> str:
+    """Opaque page cursor holding the sort key of the last row returned"""
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(values).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, columns) -> list:
+    """Inverse of ``encode_cursor``; raises ValueError for a malformed cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, binascii.Error):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError("Invalid cursor")
+    try:
+        return [
+            (
+                datetime.fromisoformat(value)
+                if isinstance(column.type, DateTime) and value is not None
+                else value
+            )
+            for value, column in zip(values, columns)
+        ]
+    except TypeError:
+        # A crafted cursor holding a number or list where a datetime belongs
+        raise ValueError("Invalid cursor")
+
+
+def keyset_page(query, sort_column, id_column, descending, limit, cursor, row_key):
+    """Fetch the page of ``query`` that follows ``cursor``
+
+    Rows are ordered by ``(sort_column, id_column)`` and the cursor holds
+    that pair for the last row of the previous page, so every page is a
+    range scan rather than an OFFSET. ``row_key`` extracts the pair from a
+    result row. Returns ``(rows, next_cursor)``.
+    """
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor, (sort_column, id_column))
+        if descending:
+            query = query.filter(
+                or_(
+                    sort_column < sort_value,
+                    and_(sort_column == sort_value, id_column < last_id),
+                )
+            )
+        else:
+            query = query.filter(
+                or_(
+                    sort_column > sort_value,
+                    and_(sort_column == sort_value, id_column > last_id),
+                )
+            )
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(list(row_key(rows[-1])))
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def filter_agents(
+    query,
+    status: Optional[str] = None,
+    customer_uuid: Optional[str] = None,
+    hostname_prefix: Optional[str] = None,
+    capability: Optional[str] = None,
+    version: Optional[str] = None,
+):
+    """Apply agent listing filters to a query over active agents"""
+    query = query.filter(Agent.is_active == True)
+    if status:
+        query = query.filter(Agent.status == status)
+    if customer_uuid:
+        query = query.filter(Agent.customer_uuid == customer_uuid)
+    if hostname_prefix:
+        query = query.filter(
+            Agent.hostname.like(_like_escape(hostname_prefix) + "%", escape="\\")
+        )
+    if capability:
+        # Capabilities are stored as a JSON list, so a quoted match is exact
+        query = query.filter(
+            Agent.capabilities.like(
+                "%" + _like_escape(json.dumps(capability)) + "%", escape="\\"
+            )
+        )
+    if version:
+        query = query.filter(Agent.version == version)
+    return query
+
+
 class DatabaseManager:
     """Database manager for agent and task operations"""
 
-    def __init__(self):
-        self.engine = engine
-        self.SessionLocal = SessionLocal
+    def __init__(self, backend: Optional[StorageBackend] = None):
+        self.backend = backend or storage_backend
+        # Writes go through the writer thread's single connection; reads
+        # (every other session) come from the reader pool
+        self.engine = self.backend.create_engine(writer=True)
+        self.read_engine = (
+            self.engine if self.backend.is_memory() else self.backend.create_engine()
+        )
+        self.SessionLocal = sessionmaker(
+            autocommit=False, autoflush=False, bind=self.read_engine
+        )
         self.create_tables()
+        self.writer = DatabaseWriter(
+            sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        )
+        # Called with a user_id once a change to that user is committed
+        self.user_listeners: List[Callable[[str], None]] = []
+        # Called with a customer_uuid once a change to its row or API key
+        # is committed
+        self.customer_listeners: List[Callable[[str], None]] = []
+
+    def notify_user_changed(self, user_id: str):
+        for listener in self.user_listeners:
+            listener(user_id)
+
+    def notify_customer_changed(self, customer_uuid: str):
+        for listener in self.customer_listeners:
+            listener(customer_uuid)
+
+    @writes
+    def flush_writes(self):
+        """Return once every write queued before this one has committed"""
+
+    def close(self):
+        """Commit queued writes and close every connection"""
+        self.writer.stop()
+        self.engine.dispose()
+        self.read_engine.dispose()
 
     def create_tables(self):
         """Create database tables"""
         Base.metadata.create_all(bind=self.engine)
+        # create_all skips tables that already exist, so add indexes
+        # introduced after the table was first created
+        for index in Agent.__table__.indexes:
+            index.create(bind=self.engine, checkfirst=True)
+
+    @staticmethod
+    def _agent_to_dict(agent: Agent, customer_name: Optional[str] = None) -> dict:
+        return {
+            "agent_id": agent.agent_id,
+            "hostname": agent.hostname,
+            "ip_address": agent.ip_address,
+            "port": agent.port,
+            "capabilities": json.loads(agent.capabilities),
+            "version": agent.version,
+            "registered_at": agent.registered_at,
+            "last_heartbeat": agent.last_heartbeat,
+            "status": agent.status,
+            "customer_uuid": agent.customer_uuid,
+            "customer_name": customer_name,
+        }
 
     def get_session(self):
-        """Get database session"""
+        """Get database session
+
+        Read-only, except in methods marked ``@writes``, which run on the
+        writer thread and get a savepoint of the writer's session.
+        """
+        if self.writer.on_writer_thread():
+            return GroupSession(self.writer.session)
         return self.SessionLocal()
 
+    @staticmethod
+    def _customer_to_dict(customer: Customer) -> dict:
+        return {
+            "id": customer.id,
+            "uuid": customer.uuid,
+            "name": customer.name,
+            "address": customer.address,
+            "api_key": customer.api_key,
+            "api_key_created_at": (
+                customer.api_key_created_at.isoformat()
+                if customer.api_key_created_at
+                else None
+            ),
+            "api_key_last_used": (
+                customer.api_key_last_used.isoformat()
+                if customer.api_key_last_used
+                else None
+            ),
+            "is_active": customer.is_active,
+            "created_at": customer.created_at.isoformat(),
+            "updated_at": customer.updated_at.isoformat(),
+        }
+
+    @staticmethod
+    def _script_to_dict(script: Script) -> dict:
+        return {
+            "id": script.id,
+            "script_id": script.script_id,
+            "name": script.name,
+            "description": script.description,
+            "content": script.content,
+            "script_type": script.script_type,
+            "customer_uuid": script.customer_uuid,
+            "created_at": script.created_at,
+            "updated_at": script.updated_at,
+        }
+
+    @staticmethod
+    def _user_to_dict(user: User) -> dict:
+        return {
+            "id": user.id,
+            "username": user.username,
+            "email": user.email,
+            "full_name": user.full_name,
+            "is_active": user.is_active,
+            "is_admin": user.is_admin,
+            "is_approved": user.is_approved,
+            "approved_by": user.approved_by,
+            "approved_at": (user.approved_at.isoformat() if user.approved_at else None),
+            "created_at": user.created_at.isoformat(),
+            "updated_at": user.updated_at.isoformat(),
+        }
+
+    @writes
     def register_agent(self, agent_data: dict) -> str:
         """Register a new agent in the database"""
         session = self.get_session()
@@ -206,6 +792,7 @@ class DatabaseManager:
         finally:
             session.close()
 
+    @writes
     def update_heartbeat(self, agent_id: str, status: str = "online"):
         """Update agent heartbeat"""
         session = self.get_session()
@@ -220,24 +807,57 @@ class DatabaseManager:
         finally:
             session.close()
 
+    @writes
+    def update_heartbeats(self, heartbeats: List[dict]) -> int:
+        """Write a batch of buffered heartbeats in a single transaction
+
+        Each entry needs ``agent_id``, ``last_heartbeat`` and ``status``.
+        """
+        if not heartbeats:
+            return 0
+
+        agents = Agent.__table__
+        stmt = (
+            update(agents)
+            .where(agents.c.agent_id == bindparam("b_agent_id"))
+            .values(
+                last_heartbeat=bindparam("b_last_heartbeat"),
+                status=bindparam("b_status"),
+            )
+        )
+        params = [
+            {
+                "b_agent_id": heartbeat["agent_id"],
+                "b_last_heartbeat": heartbeat["last_heartbeat"],
+                "b_status": heartbeat["status"],
+            }
+            for heartbeat in heartbeats
+        ]
+
+        session = self.get_session()
+        try:
+            # A list of parameter sets runs as one executemany
+            session.execute(stmt, params)
+            session.commit()
+            return len(params)
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
+
     def get_agent(self, agent_id: str) -> Optional[dict]:
-        """Get agent by ID"""
+        """Get agent by ID, with its customer's name"""
         session = self.get_session()
         try:
-            agent = session.query(Agent).filter(Agent.agent_id == agent_id).first()
-            if agent:
-                return {
-                    "agent_id": agent.agent_id,
-                    "hostname": agent.hostname,
-                    "ip_address": agent.ip_address,
-                    "port": agent.port,
-                    "capabilities": json.loads(agent.capabilities),
-                    "version": agent.version,
-                    "registered_at": agent.registered_at,
-                    "last_heartbeat": agent.last_heartbeat,
-                    "status": agent.status,
-                    "customer_uuid": agent.customer_uuid,
-                }
+            row = (
+                session.query(Agent, Customer.name)
+                .outerjoin(Customer, Customer.uuid == Agent.customer_uuid)
+                .filter(Agent.agent_id == agent_id)
+                .first()
+            )
+            if row:
+                return self._agent_to_dict(*row)
             return None
         finally:
             session.close()
@@ -268,6 +888,7 @@ class DatabaseManager:
         finally:
             session.close()
 
+    @writes
     def delete_agent(self, agent_id: str) -> bool:
         """Delete agent by ID (soft delete - sets is_active to False)"""
         session = self.get_session()
@@ -285,28 +906,80 @@ class DatabaseManager:
             session.close()
 
     def get_all_agents(self) -> List[dict]:
-        """Get all active agents"""
+        """Get all active agents with their customer's name in one query"""
         session = self.get_session()
         try:
-            agents = session.query(Agent).filter(Agent.is_active == True).all()
-            return [
-                {
-                    "agent_id": agent.agent_id,
-                    "hostname": agent.hostname,
-                    "ip_address": agent.ip_address,
-                    "port": agent.port,
-                    "capabilities": json.loads(agent.capabilities),
-                    "version": agent.version,
-                    "registered_at": agent.registered_at,
-                    "last_heartbeat": agent.last_heartbeat,
-                    "status": agent.status,
-                    "customer_uuid": agent.customer_uuid,
-                }
-                for agent in agents
-            ]
+            rows = (
+                session.query(Agent, Customer.name)
+                .outerjoin(Customer, Customer.uuid == Agent.customer_uuid)
+                .filter(Agent.is_active == True)
+                .all()
+            )
+            return [self._agent_to_dict(agent, name) for agent, name in rows]
         finally:
             session.close()
 
+    def get_agents_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        sort: str = "hostname",
+        descending: bool = False,
+        online_timeout_minutes: int = 2,
+        **filters,
+    ) -> dict:
+        """One page of active agents matching ``filters`` (see ``filter_agents``)
+
+        Also counts every matching agent and how many of them have a
+        heartbeat within ``online_timeout_minutes``, in a single aggregate.
+        """
+        sort_column = AGENT_SORT_COLUMNS.get(sort)
+        if sort_column is None:
+            raise ValueError(f"Cannot sort agents by {sort}")
+
+        session = self.get_session()
+        try:
+            query = filter_agents(
+                session.query(Agent, Customer.name).outerjoin(
+                    Customer, Customer.uuid == Agent.customer_uuid
+                ),
+                **filters,
+            )
+            rows, next_cursor = keyset_page(
+                query,
+                sort_column,
+                Agent.agent_id,
+                descending,
+                limit,
+                cursor,
+                lambda row: (getattr(row[0], sort_column.key), row[0].agent_id),
+            )
+
+            total, online = self._count_agents(
+                session, online_timeout_minutes, **filters
+            )
+
+            return {
+                "agents": [self._agent_to_dict(agent, name) for agent, name in rows],
+                "next_cursor": next_cursor,
+                "total": total,
+                "online": online,
+            }
+        finally:
+            session.close()
+
+    @staticmethod
+    def _count_agents(session, online_timeout_minutes: int, **filters):
+        online_since = datetime.utcnow() - timedelta(minutes=online_timeout_minutes)
+        total, online = filter_agents(
+            session.query(
+                func.count(Agent.id),
+                func.sum(case((Agent.last_heartbeat >= online_since, 1), else_=0)),
+            ),
+            **filters,
+        ).one()
+        return total, online or 0
+
     def get_online_agents(self, timeout_minutes: int = 2) -> List[dict]:
         """Get online agents (heartbeat within timeout)"""
         session = self.get_session()
@@ -336,6 +1009,7 @@ class DatabaseManager:
         finally:
             session.close()
 
+    @writes
     def mark_agent_offline(self, agent_id: str):
         """Mark agent as offline"""
         session = self.get_session()
@@ -347,6 +1021,7 @@ class DatabaseManager:
         finally:
             session.close()
 
+    @writes
     def create_task(self, task_data: dict) -> str:
         """Create a new task"""
         session = self.get_session()
@@ -366,6 +1041,7 @@ class DatabaseManager:
         finally:
             session.close()
 
+    @writes
     def update_task(self, task_id: str, updates: dict):
         """Update task status"""
         session = self.get_session()
@@ -431,30 +1107,132 @@ class DatabaseManager:
         finally:
             session.close()
 
-    def cleanup_offline_agents(self, timeout_minutes: int = 2):
-        """Mark agents as offline if they haven't sent heartbeat"""
+    def get_pending_commands(self) -> List[dict]:
+        """Every queued command, in the order they were queued"""
         session = self.get_session()
         try:
-            timeout_threshold = datetime.utcnow() - timedelta(minutes=timeout_minutes)
-            offline_agents = (
-                session.query(Agent)
-                .filter(
-                    Agent.is_active == True,
-                    Agent.last_heartbeat < timeout_threshold,
-                    Agent.status == "online",
-                )
-                .all()
-            )
+            rows = session.query(PendingCommand).order_by(PendingCommand.queued_at)
+            return [
+                {
+                    "task_id": row.task_id,
+                    "agent_id": row.agent_id,
+                    "priority": row.priority,
+                    "command": json.loads(row.command),
+                }
+                for row in rows
+            ]
+        finally:
+            session.close()
 
-            for agent in offline_agents:
-                agent.status = "offline"
+    @writes
+    def apply_task_writes(self, writes: List[dict]) -> int:
+        """Apply a batch of task lifecycle writes in a single transaction
+
+        Each write has an ``op`` and a ``task_id``:
+        - ``create``: new task with ``agent_id``, ``command``, ``status``
+        - ``status``: progress payload from a ``task_status`` message
+        - ``result``: final payload from a ``task_result`` message
+        - ``enqueue``: queued ``command`` (with ``agent_id``, ``priority``)
+        - ``dequeue``: the queued command was delivered or acknowledged
+        Writes are applied in order; tasks without a row yet are created.
+        """
+        if not writes:
+            return 0
+
+        session = self.get_session()
+        try:
+            task_ids = {write["task_id"] for write in writes}
+            tasks = {
+                task.task_id: task
+                for task in session.query(Task).filter(Task.task_id.in_(task_ids))
+            }
+
+            for write in writes:
+                if write["op"] == "enqueue":
+                    session.merge(
+                        PendingCommand(
+                            task_id=write["task_id"],
+                            agent_id=write["agent_id"],
+                            priority=write.get("priority", 0),
+                            command=json.dumps(write["command"]),
+                            queued_at=write.get("queued_at") or datetime.utcnow(),
+                        )
+                    )
+                    continue
+                if write["op"] == "dequeue":
+                    session.query(PendingCommand).filter(
+                        PendingCommand.task_id == write["task_id"]
+                    ).delete(synchronize_session=False)
+                    continue
+
+                task = tasks.get(write["task_id"])
+                if task is None:
+                    task = Task(
+                        id=str(uuid.uuid4()),
+                        agent_id=write.get("agent_id"),
+                        task_id=write["task_id"],
+                        command=write.get("command", ""),
+                        status=write.get("status", "pending"),
+                        created_at=write.get("created_at") or datetime.utcnow(),
+                    )
+                    session.add(task)
+                    tasks[task.task_id] = task
+                elif write["op"] == "create":
+                    task.command = task.command or write.get("command", "")
+
+                if write["op"] == "status":
+                    self._apply_task_payload(task, write["result"], task.status)
+                elif write["op"] == "result":
+                    self._apply_task_payload(task, write["result"], "completed")
 
             session.commit()
-            return len(offline_agents)
+            return len(writes)
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
+
+    @staticmethod
+    def _apply_task_payload(task: Task, payload: dict, default_status: str):
+        """Copy fields an agent reported for a task onto its row"""
+        task.status = payload.get("status") or default_status
+        for key in ("output", "error", "exit_code"):
+            if payload.get(key) is not None:
+                setattr(task, key, payload[key])
+        if isinstance(payload.get("logs"), list):
+            task.logs = json.dumps(payload["logs"])
+
+        now = datetime.utcnow()
+        if task.status == "running":
+            task.started_at = task.started_at or now
+        elif task.status in ("completed", "failed", "timeout", "cancelled"):
+            task.completed_at = task.completed_at or now
+
+    @writes
+    def mark_agents_offline(self, agent_ids: List[str]) -> int:
+        """Set status to offline for the given agents in one transaction"""
+        if not agent_ids:
+            return 0
+        session = self.get_session()
+        try:
+            # Chunked so a large batch stays under SQLite's bound-parameter limit
+            for start in range(0, len(agent_ids), 500):
+                session.execute(
+                    update(Agent)
+                    .where(Agent.agent_id.in_(agent_ids[start : start + 500]))
+                    .values(status="offline")
+                )
+            session.commit()
+            return len(agent_ids)
+        except Exception as e:
+            session.rollback()
+            raise e
         finally:
             session.close()
 
     # Customer management methods
+    @writes
     def create_customer(self, customer_data: dict) -> str:
         """Create a new customer"""
         session = self.get_session()
@@ -514,32 +1292,31 @@ class DatabaseManager:
             customers = (
                 session.query(Customer).order_by(Customer.created_at.desc()).all()
             )
-            return [
-                {
-                    "id": customer.id,
-                    "uuid": customer.uuid,
-                    "name": customer.name,
-                    "address": customer.address,
-                    "api_key": customer.api_key,
-                    "api_key_created_at": (
-                        customer.api_key_created_at.isoformat()
-                        if customer.api_key_created_at
-                        else None
-                    ),
-                    "api_key_last_used": (
-                        customer.api_key_last_used.isoformat()
-                        if customer.api_key_last_used
-                        else None
-                    ),
-                    "is_active": customer.is_active,
-                    "created_at": customer.created_at.isoformat(),
-                    "updated_at": customer.updated_at.isoformat(),
-                }
-                for customer in customers
-            ]
+            return [self._customer_to_dict(customer) for customer in customers]
+        finally:
+            session.close()
+
+    def get_customers_page(self, limit: int, cursor: Optional[str] = None) -> dict:
+        """One page of customers, newest first"""
+        session = self.get_session()
+        try:
+            customers, next_cursor = keyset_page(
+                session.query(Customer),
+                Customer.created_at,
+                Customer.uuid,
+                True,
+                limit,
+                cursor,
+                lambda customer: (customer.created_at, customer.uuid),
+            )
+            return {
+                "customers": [self._customer_to_dict(c) for c in customers],
+                "next_cursor": next_cursor,
+            }
         finally:
             session.close()
 
+    @writes
     def update_customer(self, customer_uuid: str, updates: dict) -> bool:
         """Update customer information"""
         session = self.get_session()
@@ -555,6 +1332,7 @@ class DatabaseManager:
                     customer.address = updates["address"]
                 customer.updated_at = datetime.utcnow()
                 session.commit()
+                self.writer.after_commit(self.notify_customer_changed, customer_uuid)
                 return True
             return False
         except Exception as e:
@@ -563,6 +1341,7 @@ class DatabaseManager:
         finally:
             session.close()
 
+    @writes
     def delete_customer(self, customer_uuid: str) -> bool:
         """Delete customer by UUID"""
         session = self.get_session()
@@ -574,6 +1353,7 @@ class DatabaseManager:
             if customer:
                 session.delete(customer)
                 session.commit()
+                self.writer.after_commit(self.notify_customer_changed, customer_uuid)
                 return True
             return False
         except Exception as e:
@@ -582,6 +1362,7 @@ class DatabaseManager:
         finally:
             session.close()
 
+    @writes
     def generate_api_key(self, customer_uuid: str) -> Optional[str]:
         """Generate a new API key for a customer"""
         import secrets
@@ -599,6 +1380,7 @@ class DatabaseManager:
                 customer.api_key_created_at = datetime.utcnow()
                 customer.api_key_last_used = None
                 session.commit()
+                self.writer.after_commit(self.notify_customer_changed, customer_uuid)
                 return api_key
             return None
         except Exception as e:
@@ -607,6 +1389,7 @@ class DatabaseManager:
         finally:
             session.close()
 
+    @writes
     def get_customer_by_api_key(self, api_key: str) -> Optional[dict]:
         """Get customer by API key"""
         session = self.get_session()
@@ -649,6 +1432,55 @@ class DatabaseManager:
         finally:
             session.close()
 
+    def find_customer_by_api_key(self, api_key: str) -> Optional[dict]:
+        """Active customer owning an API key, without recording the use"""
+        session = self.get_session()
+        try:
+            customer = (
+                session.query(Customer)
+                .filter(Customer.api_key == api_key, Customer.is_active == True)
+                .first()
+            )
+            return self._customer_to_dict(customer) if customer else None
+        finally:
+            session.close()
+
+    @writes
+    def update_api_key_usage(self, last_used: Dict[str, datetime]) -> int:
+        """Write buffered ``api_key_last_used`` times in a single transaction
+
+        ``last_used`` maps customer_uuid to the latest use. Customers whose
+        key was revoked meanwhile are left alone.
+        """
+        if not last_used:
+            return 0
+
+        customers = Customer.__table__
+        stmt = (
+            update(customers)
+            .where(
+                customers.c.uuid == bindparam("b_uuid"),
+                customers.c.api_key.isnot(None),
+            )
+            .values(api_key_last_used=bindparam("b_last_used"))
+        )
+        params = [
+            {"b_uuid": customer_uuid, "b_last_used": used_at}
+            for customer_uuid, used_at in last_used.items()
+        ]
+
+        session = self.get_session()
+        try:
+            session.execute(stmt, params)
+            session.commit()
+            return len(params)
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
+
+    @writes
     def revoke_api_key(self, customer_uuid: str) -> bool:
         """Revoke API key for a customer"""
         session = self.get_session()
@@ -662,6 +1494,7 @@ class DatabaseManager:
                 customer.api_key_created_at = None
                 customer.api_key_last_used = None
                 session.commit()
+                self.writer.after_commit(self.notify_customer_changed, customer_uuid)
                 return True
             return False
         except Exception as e:
@@ -670,6 +1503,7 @@ class DatabaseManager:
         finally:
             session.close()
 
+    @writes
     def update_customer_api_key_usage(self, customer_uuid: str) -> bool:
         """Update the last used timestamp for a customer's API key"""
         session = self.get_session()
@@ -690,6 +1524,7 @@ class DatabaseManager:
             session.close()
 
     # Script Management Methods
+    @writes
     def create_script(self, script_data: dict) -> str:
         """Create a new script"""
         session = self.get_session()
@@ -711,26 +1546,48 @@ class DatabaseManager:
         session = self.get_session()
         try:
             scripts = session.query(Script).filter(Script.is_active == True).all()
-            return [
-                {
-                    "id": script.id,
-                    "script_id": script.script_id,
-                    "name": script.name,
-                    "description": script.description,
-                    "content": script.content,
-                    "script_type": script.script_type,
-                    "customer_uuid": script.customer_uuid,
-                    "created_at": script.created_at,
-                    "updated_at": script.updated_at,
-                }
-                for script in scripts
-            ]
+            return [self._script_to_dict(script) for script in scripts]
         except Exception as e:
             print(f"❌ Error getting scripts: {e}")
             return []
         finally:
             session.close()
 
+    def get_scripts_version(self) -> tuple:
+        """(row count, latest update) of the scripts table
+
+        Every create, update and soft delete changes it, so it tells whether
+        a cached listing is still current, across workers too.
+        """
+        session = self.get_session()
+        try:
+            count, updated_at = session.query(
+                func.count(Script.id), func.max(Script.updated_at)
+            ).one()
+            return count, updated_at
+        finally:
+            session.close()
+
+    def get_scripts_page(self, limit: int, cursor: Optional[str] = None) -> dict:
+        """One page of active scripts, newest first"""
+        session = self.get_session()
+        try:
+            scripts, next_cursor = keyset_page(
+                session.query(Script).filter(Script.is_active == True),
+                Script.created_at,
+                Script.script_id,
+                True,
+                limit,
+                cursor,
+                lambda script: (script.created_at, script.script_id),
+            )
+            return {
+                "scripts": [self._script_to_dict(script) for script in scripts],
+                "next_cursor": next_cursor,
+            }
+        finally:
+            session.close()
+
     def get_script(self, script_id: str) -> Optional[dict]:
         """Get a specific script"""
         session = self.get_session()
@@ -760,6 +1617,7 @@ class DatabaseManager:
         finally:
             session.close()
 
+    @writes
     def update_script(self, script_id: str, updates: dict) -> bool:
         """Update a script"""
         session = self.get_session()
@@ -785,6 +1643,7 @@ class DatabaseManager:
         finally:
             session.close()
 
+    @writes
     def delete_script(self, script_id: str) -> bool:
         """Soft delete a script"""
         session = self.get_session()
@@ -838,6 +1697,7 @@ class DatabaseManager:
             session.close()
 
     # User management methods
+    @writes
     def create_user(self, user_data: dict) -> str:
         """Create a new user"""
         session = self.get_session()
@@ -966,30 +1826,34 @@ class DatabaseManager:
         session = self.get_session()
         try:
             users = session.query(User).all()
-            return [
-                {
-                    "id": user.id,
-                    "username": user.username,
-                    "email": user.email,
-                    "full_name": user.full_name,
-                    "is_active": user.is_active,
-                    "is_admin": user.is_admin,
-                    "is_approved": user.is_approved,
-                    "approved_by": user.approved_by,
-                    "approved_at": (
-                        user.approved_at.isoformat() if user.approved_at else None
-                    ),
-                    "created_at": user.created_at.isoformat(),
-                    "updated_at": user.updated_at.isoformat(),
-                }
-                for user in users
-            ]
+            return [self._user_to_dict(user) for user in users]
         except Exception as e:
             print(f"Error getting all users: {e}")
             return []
         finally:
             session.close()
 
+    def get_users_page(self, limit: int, cursor: Optional[str] = None) -> dict:
+        """One page of users, newest first"""
+        session = self.get_session()
+        try:
+            users, next_cursor = keyset_page(
+                session.query(User),
+                User.created_at,
+                User.id,
+                True,
+                limit,
+                cursor,
+                lambda user: (user.created_at, user.id),
+            )
+            return {
+                "users": [self._user_to_dict(user) for user in users],
+                "next_cursor": next_cursor,
+            }
+        finally:
+            session.close()
+
+    @writes
     def update_user(self, user_id: str, updates: dict) -> bool:
         """Update user information"""
         session = self.get_session()
@@ -1004,6 +1868,7 @@ class DatabaseManager:
 
             user.updated_at = datetime.utcnow()
             session.commit()
+            self.writer.after_commit(self.notify_user_changed, user_id)
             return True
         except Exception as e:
             session.rollback()
@@ -1012,6 +1877,7 @@ class DatabaseManager:
         finally:
             session.close()
 
+    @writes
     def delete_user(self, user_id: str) -> bool:
         """Delete a user"""
         session = self.get_session()
@@ -1022,6 +1888,7 @@ class DatabaseManager:
 
             session.delete(user)
             session.commit()
+            self.writer.after_commit(self.notify_user_changed, user_id)
             return True
         except Exception as e:
             session.rollback()
@@ -1063,6 +1930,7 @@ class DatabaseManager:
         finally:
             session.close()
 
+    @writes
     def approve_user(self, user_id: str, approved_by: str) -> bool:
         """Approve a user"""
         session = self.get_session()
@@ -1073,6 +1941,7 @@ class DatabaseManager:
                 user.approved_by = approved_by
                 user.approved_at = datetime.utcnow()
                 session.commit()
+                self.writer.after_commit(self.notify_user_changed, user_id)
                 return True
             return False
         except Exception as e:
@@ -1082,6 +1951,7 @@ class DatabaseManager:
         finally:
             session.close()
 
+    @writes
     def reject_user(self, user_id: str) -> bool:
         """Reject a user (deactivate)"""
         session = self.get_session()
@@ -1090,6 +1960,7 @@ class DatabaseManager:
             if user:
                 user.is_active = False
                 session.commit()
+                self.writer.after_commit(self.notify_user_changed, user_id)
                 return True
             return False
         except Exception as e:
@@ -1099,6 +1970,7 @@ class DatabaseManager:
         finally:
             session.close()
 
+    @writes
     def make_admin(self, user_id: str) -> bool:
         """Make a user an admin"""
         session = self.get_session()
@@ -1107,6 +1979,7 @@ class DatabaseManager:
             if user:
                 user.is_admin = True
                 session.commit()
+                self.writer.after_commit(self.notify_user_changed, user_id)
                 return True
             return False
         except Exception as e:
@@ -1116,6 +1989,7 @@ class DatabaseManager:
         finally:
             session.close()
 
+    @writes
     def remove_admin(self, user_id: str) -> bool:
         """Remove admin privileges from a user"""
         session = self.get_session()
@@ -1124,6 +1998,7 @@ class DatabaseManager:
             if user:
                 user.is_admin = False
                 session.commit()
+                self.writer.after_commit(self.notify_user_changed, user_id)
                 return True
             return False
         except Exception as e:
@@ -1133,6 +2008,7 @@ class DatabaseManager:
         finally:
             session.close()
 
+    @writes
     def record_login_attempt(
         self,
         user_id: str,
@@ -1236,5 +2112,55 @@ class DatabaseManager:
             session.close()
 
 
+class AsyncDatabaseManager:
+    """Awaitable front for DatabaseManager
+
+    Every DatabaseManager method is exposed as a coroutine that runs the
+    synchronous call on a bounded thread pool, so a slow query only occupies
+    one worker thread instead of stalling the event loop (and with it every
+    agent WebSocket). Writes are handed to the writer thread directly.
+    """
+
+    def __init__(self, db: DatabaseManager, max_workers: int = DB_EXECUTOR_WORKERS):
+        self.db = db
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="db"
+        )
+
+    async def run(self, func, *args, **kwargs):
+        """Run any blocking callable on the database thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(func, *args, **kwargs)
+        )
+
+    def __getattr__(self, name):
+        attr = getattr(self.db, name)
+        if not callable(attr):
+            return attr
+
+        if getattr(attr, "writes", False):
+            # Straight onto the writer's queue; no pool thread waits for it.
+            # Shielded: a cancelled caller must not drop a queued write
+            async def call(*args, **kwargs):
+                future = self.db.writer.submit(
+                    attr.__wrapped__, self.db, *args, **kwargs
+                )
+                return await asyncio.shield(asyncio.wrap_future(future))
+
+            call.__name__ = name
+            return call
+
+        async def call(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+
+        call.__name__ = name
+        return call
+
+
 # Initialize database manager
 db_manager = DatabaseManager()
+async_db_manager = AsyncDatabaseManager(db_manager)
+# The process-wide writer engine and read-only session factory
+engine = db_manager.engine
+SessionLocal = db_manager.SessionLocal
@@ -0,0 +1,119 @@
+"""
+Bulk dispatch jobs: one command fanned out to many agents, tracked as a job
+that aggregates the per-agent task IDs and their progress
+"""
+
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from Scripts.task_events import FINAL_TASK_STATUSES
+
+# Sockets written to at the same time when a job is dispatched
+BULK_DISPATCH_CONCURRENCY = 64
+# Jobs kept in memory; the oldest ones are forgotten past this
+JOB_MAX_ENTRIES = 1_000
+
+
+class DispatchJob:
+    """Per-agent tasks created by one bulk dispatch"""
+
+    def __init__(self, job_id: str, command: str, selector: dict):
+        self.job_id = job_id
+        self.command = command
+        self.selector = selector
+        self.created_at = datetime.utcnow()
+        # agent_id -> {"task_id": ..., "status": ...}
+        self.tasks: Dict[str, dict] = {}
+        # agent_id -> reason it was not dispatched to
+        self.skipped: Dict[str, str] = {}
+
+    def progress(self) -> dict:
+        counts: Dict[str, int] = {}
+        for task in self.tasks.values():
+            counts[task["status"]] = counts.get(task["status"], 0) + 1
+        finished = sum(
+            count for status, count in counts.items() if status in FINAL_TASK_STATUSES
+        )
+        return {
+            "total": len(self.tasks),
+            "finished": finished,
+            "skipped": len(self.skipped),
+            "by_status": counts,
+            "done": finished == len(self.tasks),
+        }
+
+    def to_dict(self, include_tasks: bool = True) -> dict:
+        job = {
+            "job_id": self.job_id,
+            "command": self.command,
+            "selector": self.selector,
+            "created_at": self.created_at,
+            "progress": self.progress(),
+        }
+        if include_tasks:
+            job["tasks"] = [
+                {"agent_id": agent_id, **task} for agent_id, task in self.tasks.items()
+            ]
+            job["skipped"] = [
+                {"agent_id": agent_id, "reason": reason}
+                for agent_id, reason in self.skipped.items()
+            ]
+        return job
+
+
+class JobRegistry:
+    """Bounded registry of dispatch jobs with a task_id -> job index
+
+    The index lets status updates reported by agents advance the owning
+    job's progress in O(1).
+    """
+
+    def __init__(self, max_entries: int = JOB_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._jobs: "OrderedDict[str, DispatchJob]" = OrderedDict()
+        self._task_index: Dict[str, Tuple[str, str]] = {}
+
+    def create(self, command: str, selector: dict) -> DispatchJob:
+        job = DispatchJob(str(uuid.uuid4()), command, selector)
+        self._jobs[job.job_id] = job
+        while len(self._jobs) > self.max_entries:
+            _, evicted = self._jobs.popitem(last=False)
+            for task in evicted.tasks.values():
+                self._task_index.pop(task["task_id"], None)
+        return job
+
+    def add_task(self, job: DispatchJob, agent_id: str, task_id: str, status: str):
+        job.tasks[agent_id] = {"task_id": task_id, "status": status}
+        self._task_index[task_id] = (job.job_id, agent_id)
+
+    def remove_task(self, job: DispatchJob, agent_id: str):
+        """Take back a task that turned out not to be dispatched after all"""
+        task = job.tasks.pop(agent_id, None)
+        if task is not None:
+            self._task_index.pop(task["task_id"], None)
+
+    def skip(self, job: DispatchJob, agent_id: str, reason: str):
+        job.skipped[agent_id] = reason
+
+    def update_task(self, task_id: str, status: Optional[str]):
+        """Record a status reported for a task, if it belongs to a job"""
+        location = self._task_index.get(task_id)
+        if location is None or not status:
+            return
+        job_id, agent_id = location
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        job.tasks[agent_id]["status"] = status
+
+    def get(self, job_id: str) -> Optional[DispatchJob]:
+        return self._jobs.get(job_id)
+
+    def recent(self) -> List[DispatchJob]:
+        """Jobs, newest first"""
+        return list(reversed(self._jobs.values()))
+
+    def __len__(self) -> int:
+        return len(self._jobs)
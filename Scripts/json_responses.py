@@ -0,0 +1,89 @@
+"""
+Fast JSON responses
+
+FastAPI runs every return value through ``jsonable_encoder`` and the stdlib
+encoder, which dominates the time spent on large listings such as
+``/api/agents`` with thousands of agents. Setting ``FAST_JSON=1`` (with
+``orjson`` installed) switches the app's default response class to
+``ORJSONResponse`` and lets the big collection routes serialize straight to
+bytes, reusing the body while the collection is unchanged.
+"""
+
+import json
+import os
+import time
+from typing import Any, Callable, Hashable, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse
+except ImportError:  # optional: the stdlib path is used instead
+    orjson = None
+    ORJSONResponse = None
+
+# Opt-in, and only when orjson is available
+FAST_JSON = os.getenv("FAST_JSON", "0") == "1" and orjson is not None
+# Longest a cached body is served for, even when its key still matches
+# (heartbeat times and online counts move without a revision bump)
+RESPONSE_CACHE_MAX_AGE = float(os.getenv("RESPONSE_CACHE_MAX_AGE", "2"))  # seconds
+
+
+def default_response_class():
+    return ORJSONResponse if FAST_JSON else JSONResponse
+
+
+def _default(value: Any):
+    if isinstance(value, BaseModel):
+        # Field values only; nested models come back through here
+        return value.__dict__
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize a response body the way FastAPI would, only faster"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(jsonable_encoder(content), separators=(",", ":")).encode()
+
+
+class CachedBody:
+    """The last serialized body of one collection and the key it was built for"""
+
+    def __init__(self, max_age: float = RESPONSE_CACHE_MAX_AGE):
+        self.max_age = max_age
+        self._key: Optional[Hashable] = None
+        self._body: Optional[bytes] = None
+        self._built_at = 0.0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        if (
+            self._body is None
+            or self._key != key
+            or time.monotonic() - self._built_at > self.max_age
+        ):
+            return None
+        return self._body
+
+    def put(self, key: Hashable, body: bytes):
+        self._key, self._body, self._built_at = key, body, time.monotonic()
+
+    def clear(self):
+        self._key = self._body = None
+
+
+async def cached_response(
+    cache: CachedBody,
+    key: Hashable,
+    build: Callable,
+    headers: Optional[dict] = None,
+) -> Response:
+    """Serve ``cache``'s body for ``key``, rebuilding it with ``await build()``"""
+    body = cache.get(key)
+    if body is None:
+        body = dumps(await build())
+        cache.put(key, body)
+    return Response(body, media_type="application/json", headers=headers)
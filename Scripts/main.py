@@ -1,5 +1,4 @@
 import asyncio
-import json
 import logging
 import sys
 from contextlib import asynccontextmanager
@@ -32,6 +31,11 @@ from shared import (
 )
 
 from routes import api, ui
+from Scripts.agent_codec import UnsupportedEncoding, negotiate_codec
+from Scripts.customer_auth import api_key_usage
+from Scripts.database import async_db_manager
+from Scripts.json_responses import default_response_class
+from Scripts.task_store import parse_output_chunk
 
 # Initialize connection manager (imported from shared)
 manager = manager
@@ -79,22 +83,65 @@ agent_manager = agent_manager
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("🚀 Remote Agent Manager starting up...")
-    # Start background task to cleanup offline agents
-    cleanup_task = asyncio.create_task(agent_manager.cleanup_offline_agents())
+    # Serve agent reads from memory; the agents table is written through
+    await agent_manager.load_registry()
+    # Commands queued for agents before the restart are still owed to them
+    await manager.load_pending_commands()
+    # Join the other workers serving this fleet (no-op for a single process)
+    await manager.bus.start()
+    # Start background task marking agents offline when heartbeats stop
+    cleanup_task = asyncio.create_task(agent_manager.detect_offline_agents())
+    # Start background task to flush buffered heartbeats
+    heartbeat_task = asyncio.create_task(agent_manager.heartbeats.run())
+    # Start background task to persist task lifecycle changes
+    task_writer_task = asyncio.create_task(manager.task_writer.run())
+    # Start background task to write buffered API key last-used times
+    api_key_usage_task = asyncio.create_task(api_key_usage.run())
     logger.info("🚀 Remote Agent Manager started")
     yield
     # Shutdown
     logger.info("🛑 Remote Agent Manager shutting down...")
-    cleanup_task.cancel()
+    for task in (cleanup_task, heartbeat_task, task_writer_task, api_key_usage_task):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    # Make sure no buffered heartbeat is lost
+    try:
+        flushed = await agent_manager.heartbeats.flush()
+        logger.info(f"💾 Flushed {flushed} buffered heartbeats")
+    except Exception as e:
+        logger.error(f"❌ Failed to flush heartbeats on shutdown: {e}")
     try:
-        await cleanup_task
-    except asyncio.CancelledError:
-        pass
+        written = await manager.task_writer.flush()
+        logger.info(f"💾 Wrote {written} queued task updates")
+    except Exception as e:
+        logger.error(f"❌ Failed to write task updates on shutdown: {e}")
+    try:
+        flushed = await api_key_usage.flush()
+        logger.info(f"💾 Flushed {flushed} buffered API key uses")
+    except Exception as e:
+        logger.error(f"❌ Failed to flush API key uses on shutdown: {e}")
+    try:
+        # Writes cancelled callers left on the writer's queue
+        await async_db_manager.flush_writes()
+    except Exception as e:
+        logger.error(f"❌ Failed to commit queued writes on shutdown: {e}")
+    try:
+        await manager.bus.stop()
+    except Exception as e:
+        logger.error(f"❌ Failed to leave the message bus: {e}")
     logger.info("🛑 Remote Agent Manager shutdown complete")
 
 
 # Initialize FastAPI app
-app = FastAPI(title="Remote Agent Manager", version="1.0.0", lifespan=lifespan)
+app = FastAPI(
+    title="Remote Agent Manager",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=default_response_class(),
+)
 
 # Setup templates and static files
 templates = Jinja2Templates(directory="templates")
@@ -147,28 +194,38 @@ async def general_exception_handler(request: Request, exc: Exception):
 # WebSocket endpoint for agent connections
 @app.websocket("/ws/agent/{agent_id}")
 async def websocket_endpoint(websocket: WebSocket, agent_id: str):
+    # Pick the wire format (JSON unless the agent asks for MessagePack)
+    try:
+        codec, subprotocol = negotiate_codec(websocket)
+    except UnsupportedEncoding as e:
+        logger.warning(f"⚠️ Rejecting agent {agent_id}: {e}")
+        # Accepted first so the agent sees the close code and reason
+        await websocket.accept()
+        await websocket.close(code=1003, reason=str(e))
+        return
+
     # Accept the WebSocket connection FIRST
-    await websocket.accept()
+    await websocket.accept(subprotocol=subprotocol)
 
-    connection_id = await manager.connect(websocket, agent_id)
+    connection_id = await manager.connect(websocket, agent_id, codec)
     try:
+        # Hand over anything queued while the agent was away
+        await manager.drain_pending_commands(agent_id)
         while True:
             # Receive messages from agent
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            message = await codec.receive(websocket)
 
             if message.get("type") == "heartbeat":
                 # Update heartbeat
                 heartbeat = HeartbeatRequest(agent_id=agent_id, status="online")
                 await agent_manager.update_heartbeat(agent_id, heartbeat)
                 # Send acknowledgment
-                await websocket.send_text(
-                    json.dumps(
-                        {
-                            "type": "heartbeat_ack",
-                            "timestamp": datetime.utcnow().isoformat(),
-                        }
-                    )
+                await codec.send(
+                    websocket,
+                    {
+                        "type": "heartbeat_ack",
+                        "timestamp": datetime.utcnow().isoformat(),
+                    },
                 )
 
             elif message.get("type") == "task_result":
@@ -180,23 +237,27 @@ async def websocket_endpoint(websocket: WebSocket, agent_id: str):
                 if "data" in message and "task_id" in message["data"]:
                     task_id = message["data"]["task_id"]
                     logger.info(f"💾 Storing task result for {task_id}")
-                    manager.store_task_result(task_id, message["data"])
+                    manager.store_task_result(
+                        task_id, message["data"], agent_id=agent_id
+                    )
                     logger.info(
-                        f"💾 Stored task result. All stored results: {list(manager.task_results.keys())}"
+                        f"💾 Stored task result. {len(manager.task_results)} results in memory"
                     )
                 else:
                     logger.warning(f"⚠️ Task result missing task_id: {message}")
-                    # Try to find the most recent command sent to this agent
-                    # This is a fallback for clients that don't include task_id in response
+                    # Fallback for clients that don't include task_id in their
+                    # response: match it to the agent's oldest outstanding task
                     logger.info(
-                        f"🔍 Attempting to match task result to recent command for agent {agent_id}"
+                        f"🔍 Attempting to match task result to an outstanding command for agent {agent_id}"
                     )
-                    if agent_id in manager.recent_commands:
-                        fallback_task_id = manager.recent_commands[agent_id]
+                    fallback_task_id = manager.match_untagged_result(agent_id)
+                    if fallback_task_id is not None:
                         logger.info(
                             f"💾 Storing task result with tracked task_id: {fallback_task_id}"
                         )
-                        manager.store_task_result(fallback_task_id, message["data"])
+                        manager.store_task_result(
+                            fallback_task_id, message["data"], agent_id=agent_id
+                        )
                     else:
                         # For now, we'll store it with a generated task_id
                         fallback_task_id = (
@@ -205,7 +266,24 @@ async def websocket_endpoint(websocket: WebSocket, agent_id: str):
                         logger.info(
                             f"💾 Storing task result with fallback task_id: {fallback_task_id}"
                         )
-                        manager.store_task_result(fallback_task_id, message["data"])
+                        manager.store_task_result(
+                            fallback_task_id, message["data"], agent_id=agent_id
+                        )
+
+            elif message.get("type") == "task_output_chunk":
+                # Incremental output from a running task
+                chunk = parse_output_chunk(message.get("data"))
+                if chunk is not None:
+                    manager.append_task_output(
+                        chunk["task_id"],
+                        chunk["seq"],
+                        chunk["data"],
+                        stream=chunk["stream"],
+                        agent_id=agent_id,
+                    )
+                else:
+                    # Skip it rather than drop the agent's socket over one chunk
+                    logger.warning(f"⚠️ Malformed output chunk: {message}")
 
             elif message.get("type") == "task_status":
                 # Handle task status update
@@ -214,8 +292,8 @@ async def websocket_endpoint(websocket: WebSocket, agent_id: str):
                 )
                 # Store the task status for later retrieval
                 if "data" in message and "task_id" in message["data"]:
-                    manager.store_task_result(
-                        message["data"]["task_id"], message["data"]
+                    manager.store_task_status(
+                        message["data"]["task_id"], message["data"], agent_id=agent_id
                     )
 
     except WebSocketDisconnect:
@@ -0,0 +1,282 @@
+"""
+Cross-worker message bus
+
+Agent WebSockets, task results and the agent registry live in each server
+process. When several processes serve the same database (uvicorn
+``--workers``, or the separate HTTP and HTTPS servers) they use this bus to
+route commands to the worker holding an agent's socket and to broadcast
+state changes. The default ``MessageBus`` is a single-process no-op;
+``UnixSocketBus`` connects workers on one host over Unix domain sockets.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import os
+import socket
+import struct
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+# "local" (single process) or "unix" (workers on this host)
+MESSAGE_BUS = os.getenv("MESSAGE_BUS", "local")
+MESSAGE_BUS_DIR = os.getenv(
+    "MESSAGE_BUS_DIR", str(Path(__file__).parent.parent / "Data" / "bus")
+)
+# How long a worker waits for another worker to answer a request
+BUS_REQUEST_TIMEOUT = 5  # seconds
+
+_FRAME_HEADER = struct.Struct("!I")
+
+Handler = Callable[[dict, str], Awaitable[Any]]
+
+
+class BusError(Exception):
+    """A message could not be delivered to, or answered by, another worker"""
+
+
+class MessageBus:
+    """Single-process bus: there is nobody to talk to
+
+    Subclasses deliver ``broadcast`` to every other worker and ``request`` to
+    one of them. Handlers registered with ``on`` are called as
+    ``await handler(payload, sender_worker_id)``; a request's reply is the
+    handler's return value.
+    """
+
+    distributed = False
+
+    def __init__(self, worker_id: Optional[str] = None):
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.handlers: Dict[str, Handler] = {}
+        # Broadcasts started by ``publish``; the loop only keeps weak references
+        self._publishing: Set[asyncio.Task] = set()
+        self.logger = logging.getLogger(__name__)
+
+    def on(self, kind: str, handler: Handler):
+        self.handlers[kind] = handler
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def broadcast(self, kind: str, payload: dict):
+        pass
+
+    async def send(self, worker_id: str, kind: str, payload: dict):
+        raise BusError(f"No worker {worker_id} on a single-process bus")
+
+    async def request(
+        self,
+        worker_id: str,
+        kind: str,
+        payload: dict,
+        timeout: float = BUS_REQUEST_TIMEOUT,
+    ) -> Any:
+        raise BusError(f"No worker {worker_id} on a single-process bus")
+
+    def publish(self, kind: str, payload: dict):
+        """Fire-and-forget ``broadcast`` usable from synchronous code"""
+        if not self.distributed:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self.broadcast(kind, payload))
+        self._publishing.add(task)
+        task.add_done_callback(functools.partial(self._published, kind))
+
+    def _published(self, kind: str, task: asyncio.Task):
+        self._publishing.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.error(f"❌ Failed to broadcast {kind}: {task.exception()}")
+
+    async def _dispatch(self, kind: str, payload: dict, sender: str) -> Any:
+        handler = self.handlers.get(kind)
+        if handler is None:
+            return None
+        return await handler(payload, sender)
+
+
+class UnixSocketBus(MessageBus):
+    """Workers on one host, each listening on ``<directory>/<worker_id>.sock``
+
+    Peers are discovered by listing the directory; a socket nobody listens
+    on any more (a crashed worker) is removed on first use. Frames are a
+    4-byte length followed by JSON.
+    """
+
+    distributed = True
+
+    def __init__(
+        self, directory: str = MESSAGE_BUS_DIR, worker_id: Optional[str] = None
+    ):
+        super().__init__(worker_id)
+        self.directory = Path(directory)
+        self.path = self.directory / f"{self.worker_id}.sock"
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers: Dict[str, asyncio.StreamWriter] = {}
+        self._send_locks: Dict[str, asyncio.Lock] = {}
+        self._replies: Dict[str, asyncio.Future] = {}
+        # Requests being answered; the loop only keeps weak references
+        self._answering: Set[asyncio.Task] = set()
+
+    async def start(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            self.path.unlink()
+        self._server = await asyncio.start_unix_server(self._serve, path=str(self.path))
+        self.logger.info(f"🚌 Message bus listening on {self.path}")
+        await self.broadcast("peer_joined", {})
+
+    async def stop(self):
+        # Let state changes published so far reach the other workers first
+        await asyncio.gather(*self._publishing, return_exceptions=True)
+        try:
+            await self.broadcast("peer_left", {})
+        except Exception:
+            pass
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._answering:
+            task.cancel()
+        await asyncio.gather(*self._answering, return_exceptions=True)
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+        if self.path.exists():
+            self.path.unlink()
+
+    def peers(self) -> List[str]:
+        if not self.directory.exists():
+            return []
+        return [
+            path.stem
+            for path in self.directory.glob("*.sock")
+            if path.stem != self.worker_id
+        ]
+
+    async def broadcast(self, kind: str, payload: dict):
+        message = {"kind": kind, "payload": payload, "sender": self.worker_id}
+        await asyncio.gather(
+            *(self._deliver(peer, message) for peer in self.peers()),
+            return_exceptions=True,
+        )
+
+    async def send(self, worker_id: str, kind: str, payload: dict):
+        message = {"kind": kind, "payload": payload, "sender": self.worker_id}
+        await self._deliver(worker_id, message)
+
+    async def request(
+        self,
+        worker_id: str,
+        kind: str,
+        payload: dict,
+        timeout: float = BUS_REQUEST_TIMEOUT,
+    ) -> Any:
+        request_id = str(uuid.uuid4())
+        future = asyncio.get_running_loop().create_future()
+        self._replies[request_id] = future
+        message = {
+            "kind": kind,
+            "payload": payload,
+            "sender": self.worker_id,
+            "id": request_id,
+        }
+        try:
+            await self._deliver(worker_id, message)
+            reply = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise BusError(f"Worker {worker_id} did not answer {kind}")
+        finally:
+            self._replies.pop(request_id, None)
+        if "error" in reply:
+            raise BusError(reply["error"])
+        return reply.get("result")
+
+    async def _deliver(self, worker_id: str, message: dict):
+        data = json.dumps(message, default=str).encode("utf-8")
+        frame = _FRAME_HEADER.pack(len(data)) + data
+        lock = self._send_locks.setdefault(worker_id, asyncio.Lock())
+        async with lock:
+            try:
+                writer = self._writers.get(worker_id)
+                if writer is None or writer.is_closing():
+                    writer = await self._connect(worker_id)
+                writer.write(frame)
+                await writer.drain()
+            except (OSError, ConnectionError) as e:
+                self._writers.pop(worker_id, None)
+                raise BusError(f"Cannot reach worker {worker_id}: {e}")
+
+    async def _connect(self, worker_id: str) -> asyncio.StreamWriter:
+        path = self.directory / f"{worker_id}.sock"
+        try:
+            _, writer = await asyncio.open_unix_connection(str(path))
+        except ConnectionRefusedError:
+            # The worker died without cleaning up
+            path.unlink(missing_ok=True)
+            raise
+        self._writers[worker_id] = writer
+        return writer
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                header = await reader.readexactly(_FRAME_HEADER.size)
+                (length,) = _FRAME_HEADER.unpack(header)
+                message = json.loads(await reader.readexactly(length))
+                await self._receive(message)
+        except asyncio.IncompleteReadError:
+            pass
+        except Exception as e:
+            self.logger.error(f"❌ Message bus connection failed: {e}")
+        finally:
+            writer.close()
+
+    async def _receive(self, message: dict):
+        if message["kind"] == "reply":
+            future = self._replies.get(message["payload"].get("reply_to"))
+            if future is not None and not future.done():
+                future.set_result(message["payload"])
+            return
+
+        if "id" in message:
+            # Requests may wait on an agent socket; don't hold up the stream
+            task = asyncio.create_task(self._answer(message))
+            self._answering.add(task)
+            task.add_done_callback(self._answering.discard)
+            return
+
+        try:
+            await self._dispatch(message["kind"], message["payload"], message["sender"])
+        except Exception as e:
+            self.logger.error(f"❌ Error handling {message['kind']} from bus: {e}")
+
+    async def _answer(self, message: dict):
+        reply = {"reply_to": message["id"]}
+        try:
+            reply["result"] = await self._dispatch(
+                message["kind"], message["payload"], message["sender"]
+            )
+        except Exception as e:
+            reply["error"] = str(e)
+        try:
+            await self.send(message["sender"], "reply", reply)
+        except BusError as e:
+            self.logger.warning(f"⚠️ Could not answer {message['kind']}: {e}")
+
+
+def create_message_bus(kind: str = MESSAGE_BUS) -> MessageBus:
+    """Build the bus selected by the MESSAGE_BUS environment variable"""
+    if kind == "unix":
+        return UnixSocketBus()
+    if kind != "local":
+        raise ValueError(f"Unknown MESSAGE_BUS: {kind}")
+    return MessageBus()
@@ -3,17 +3,39 @@ Shared components for Remote Agent Manager
 """
 
 import asyncio
-import json
+import heapq
 import logging
+import time
 import uuid
 from datetime import datetime, timedelta
 from enum import Enum
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 from fastapi import HTTPException
 from pydantic import BaseModel
 
-from Scripts.database import db_manager
+from Scripts.agent_codec import JSON_CODEC
+from Scripts.command_queue import CommandQueue, CommandQueueFull
+from Scripts.database import async_db_manager
+from Scripts.dispatch_jobs import BULK_DISPATCH_CONCURRENCY, JobRegistry
+from Scripts.message_bus import BusError, MessageBus, create_message_bus
+from Scripts.task_events import FINAL_TASK_STATUSES, TaskEventBroker
+from Scripts.task_store import (
+    TaskFutures,
+    TaskOutputStore,
+    TaskResultStore,
+    TaskWriter,
+)
+
+# How often buffered heartbeats are written to the agents table
+HEARTBEAT_FLUSH_INTERVAL = 5  # seconds
+# Agents count as online while their last heartbeat is this recent
+ONLINE_TIMEOUT_MINUTES = 2
+# How often expired heartbeat deadlines are collected
+OFFLINE_CHECK_INTERVAL = 1  # seconds
+# Removed agents are reported in delta listings for this long; listings
+# asked for from before that get the full agent list instead
+REMOVED_AGENT_RETENTION = 3600  # seconds
 
 
 # Models
@@ -59,6 +81,8 @@ class CommandRequest(BaseModel):
     timeout: Optional[int] = 30
     working_directory: Optional[str] = None
     environment: Optional[Dict[str, str]] = None
+    # Queued commands are delivered highest priority first
+    priority: int = 0
 
 
 class CommandResponse(BaseModel):
@@ -117,6 +141,34 @@ class ScriptExecutionRequest(BaseModel):
     parameters: Optional[Dict[str, str]] = None
 
 
+class BulkTargetSelector(BaseModel):
+    """Agents a bulk dispatch goes to; the given filters are combined"""
+
+    agent_ids: Optional[List[str]] = None
+    customer_uuid: Optional[str] = None
+    capability: Optional[str] = None
+
+    def is_empty(self) -> bool:
+        return self.agent_ids is None and not self.customer_uuid and not self.capability
+
+    def describe(self) -> dict:
+        """The filters that were set, without any request fields around them"""
+        filters = {
+            "agent_ids": self.agent_ids,
+            "customer_uuid": self.customer_uuid,
+            "capability": self.capability,
+        }
+        return {key: value for key, value in filters.items() if value is not None}
+
+
+class BulkCommandRequest(CommandRequest, BulkTargetSelector):
+    pass
+
+
+class BulkScriptExecutionRequest(BulkTargetSelector):
+    parameters: Optional[Dict[str, str]] = None
+
+
 class AgentCommandRequest(BaseModel):
     agent_id: str
     command_request: CommandRequest
@@ -131,82 +183,841 @@ class AgentRegistrationResponse(BaseModel):
 
 # Manager instances
 class ConnectionManager:
-    def __init__(self):
+    def __init__(self, bus: Optional[MessageBus] = None):
         self.active_connections: Dict[str, Any] = {}
-        self.task_results: Dict[str, dict] = {}
-        self.recent_commands: Dict[str, str] = {}
+        # Secondary index: agent_id -> connection_ids, so dispatch and presence
+        # checks don't scan every open socket
+        self.agent_connections: Dict[str, Set[str]] = {}
+        # Socket used for dispatch when an agent holds several connections
+        self.preferred_connections: Dict[str, str] = {}
+        # Every status/result is also queued for the tasks table as it arrives,
+        # so results evicted from memory can still be served from there
+        self.task_results = TaskResultStore()
+        self.task_writer = TaskWriter(async_db_manager)
+        # Output streamed by agents while a task is still running
+        self.task_output = TaskOutputStore()
+        # Pushes status transitions and results to dashboards as they arrive
+        self.task_events = TaskEventBroker()
+        # Bulk dispatches and the tasks they fanned out to
+        self.jobs = JobRegistry()
+        # Dispatched tasks awaiting a result, per agent in the order sent
+        self.task_futures = TaskFutures()
+        # Commands waiting for agents to collect them (leased until
+        # acknowledged, drained onto the WebSocket when it connects)
+        self.pending_commands = CommandQueue()
+        # Called with an agent_id when its first socket opens or last one closes
+        self.on_presence_change: Optional[Callable[[str], None]] = None
+        # Other workers serving the same fleet: agent_id -> worker holding
+        # that agent's socket, learned from their presence broadcasts
+        self.bus = bus or create_message_bus()
+        self.remote_agents: Dict[str, str] = {}
+        self.bus.on("peer_joined", self._on_peer_joined)
+        self.bus.on("peer_left", self._on_peer_left)
+        self.bus.on("presence", self._on_remote_presence)
+        self.bus.on("presence_snapshot", self._on_presence_snapshot)
+        self.bus.on("send_command", self._on_remote_command)
+        self.bus.on("task_event", self._on_remote_task_event)
+        self.bus.on("pending_command", self._on_remote_pending_command)
+        self.logger = logging.getLogger(__name__)
+
+    def _presence_changed(self, agent_id: str):
+        self.bus.publish(
+            "presence",
+            {"agent_id": agent_id, "connected": agent_id in self.agent_connections},
+        )
+        self._notify_presence(agent_id)
+
+    def _notify_presence(self, agent_id: str):
+        if self.on_presence_change is not None:
+            self.on_presence_change(agent_id)
+
+    async def _on_peer_joined(self, payload: dict, sender: str):
+        """Tell a freshly started worker which agents are connected here"""
+        await self.bus.send(
+            sender, "presence_snapshot", {"agent_ids": list(self.agent_connections)}
+        )
 
-    async def connect(self, websocket, agent_id: str):
+    async def _on_presence_snapshot(self, payload: dict, sender: str):
+        for agent_id in payload["agent_ids"]:
+            self.remote_agents[agent_id] = sender
+
+    async def _on_peer_left(self, payload: dict, sender: str):
+        """A worker shut down; its sockets went with it"""
+        gone = [
+            agent_id
+            for agent_id, owner in self.remote_agents.items()
+            if owner == sender
+        ]
+        for agent_id in gone:
+            del self.remote_agents[agent_id]
+            if agent_id not in self.agent_connections:
+                self._notify_presence(agent_id)
+
+    async def _on_remote_presence(self, payload: dict, sender: str):
+        agent_id = payload["agent_id"]
+        if payload["connected"]:
+            self.remote_agents[agent_id] = sender
+        elif self.remote_agents.get(agent_id) == sender:
+            del self.remote_agents[agent_id]
+        else:
+            # The agent already reconnected to another worker
+            return
+        if agent_id not in self.agent_connections:
+            self._notify_presence(agent_id)
+
+    async def connect(self, websocket, agent_id: str, codec=JSON_CODEC):
         connection_id = f"{agent_id}_{uuid.uuid4()}"
         self.active_connections[connection_id] = {
             "websocket": websocket,
             "agent_id": agent_id,
+            "codec": codec,
             "connected_at": datetime.utcnow(),
         }
+        connection_ids = self.agent_connections.setdefault(agent_id, set())
+        connection_ids.add(connection_id)
+        if len(connection_ids) == 1:
+            self._presence_changed(agent_id)
+        # Prefer the newest socket: an agent that reconnects usually leaves a
+        # half-dead connection behind until the old receive loop notices
+        self.preferred_connections[agent_id] = connection_id
         return connection_id
 
     def disconnect(self, connection_id: str):
-        if connection_id in self.active_connections:
-            del self.active_connections[connection_id]
+        connection = self.active_connections.pop(connection_id, None)
+        if connection is None:
+            return
+
+        agent_id = connection["agent_id"]
+        connection_ids = self.agent_connections.get(agent_id)
+        if connection_ids is not None:
+            connection_ids.discard(connection_id)
+            if not connection_ids:
+                del self.agent_connections[agent_id]
+                self._presence_changed(agent_id)
+
+        if self.preferred_connections.get(agent_id) == connection_id:
+            if connection_ids:
+                # Fall back to the most recently connected remaining socket
+                self.preferred_connections[agent_id] = max(
+                    connection_ids,
+                    key=lambda cid: self.active_connections[cid]["connected_at"],
+                )
+            else:
+                del self.preferred_connections[agent_id]
+
+    def get_agent_connection(self, agent_id: str) -> Optional[dict]:
+        """Get the preferred connection for an agent, if it has one"""
+        connection_id = self.preferred_connections.get(agent_id)
+        if connection_id is None:
+            return None
+        return self.active_connections.get(connection_id)
 
     async def send_command_to_agent(self, agent_id: str, command_data: dict):
-        # Find the connection for this agent
-        for connection in self.active_connections.values():
-            if connection["agent_id"] == agent_id:
-                websocket = connection["websocket"]
-                await websocket.send_text(json.dumps(command_data))
+        """Send a command on the agent's socket, in this worker or another"""
+        if await self._send_local(agent_id, command_data):
+            return True
+
+        owner = self.remote_agents.get(agent_id)
+        if owner is None:
+            return False
+        try:
+            return bool(
+                await self.bus.request(
+                    owner,
+                    "send_command",
+                    {"agent_id": agent_id, "command": command_data},
+                )
+            )
+        except BusError as e:
+            self.logger.warning(f"⚠️ Failed to route command for {agent_id}: {e}")
+            return False
+
+    async def _on_remote_command(self, payload: dict, sender: str) -> bool:
+        agent_id, command_data = payload["agent_id"], payload["command"]
+        # Tracked here too, so results without a task_id can be matched
+        self.task_futures.track(agent_id, command_data["task_id"])
+        return await self._send_local(agent_id, command_data)
+
+    async def _send_local(self, agent_id: str, command_data: dict) -> bool:
+        # Try the preferred socket first; if it turns out to be dead, drop it
+        # and retry on whatever the agent still has open
+        while True:
+            connection_id = self.preferred_connections.get(agent_id)
+            if connection_id is None:
+                return False
+            connection = self.active_connections[connection_id]
+            try:
+                await connection["codec"].send(connection["websocket"], command_data)
                 return True
-        return False
+            except Exception as e:
+                self.logger.warning(
+                    f"⚠️ Failed to send to {agent_id} on {connection_id}: {e}"
+                )
+                self.disconnect(connection_id)
 
     def is_agent_connected(self, agent_id: str) -> bool:
-        return any(
-            conn["agent_id"] == agent_id for conn in self.active_connections.values()
-        )
+        return agent_id in self.agent_connections or agent_id in self.remote_agents
 
     def get_task_result(self, task_id: str) -> Optional[dict]:
         return self.task_results.get(task_id)
 
-    def store_pending_command(self, agent_id: str, task_id: str, command_data: dict):
-        """Store a pending command for HTTP agents to poll"""
-        if agent_id not in self.recent_commands:
-            self.recent_commands[agent_id] = {}
-        self.recent_commands[agent_id][task_id] = command_data
+    def store_pending_command(
+        self, agent_id: str, task_id: str, command_data: dict, priority: int = 0
+    ):
+        """Store a pending command for HTTP agents to poll
+
+        Raises ``CommandQueueFull`` when the agent's backlog is at its limit.
+        """
+        self.pending_commands.put(agent_id, task_id, command_data, priority)
+        self.task_writer.record_enqueue(task_id, agent_id, command_data, priority)
+        self.bus.publish(
+            "pending_command",
+            {
+                "agent_id": agent_id,
+                "task_id": task_id,
+                "command": command_data,
+                "priority": priority,
+            },
+        )
+
+    async def load_pending_commands(self):
+        """Restore commands queued before a restart (called at startup)"""
+        rows = await async_db_manager.get_pending_commands()
+        for row in rows:
+            self.pending_commands.put(
+                row["agent_id"],
+                row["task_id"],
+                row["command"],
+                row["priority"],
+                enforce_limit=False,
+            )
+        if rows:
+            self.logger.info(f"📬 Restored {len(rows)} queued commands")
+
+    async def drain_pending_commands(self, agent_id: str) -> int:
+        """Send an agent's queued commands over its newly connected WebSocket"""
+        sent = 0
+        for entry in self.pending_commands.ordered(agent_id):
+            self.task_futures.track(agent_id, entry.task_id)
+            if not await self._send_local(agent_id, entry.command):
+                break
+            self.remove_pending_command(agent_id, entry.task_id)
+            self.task_writer.record_status(
+                entry.task_id, agent_id, {"status": "accepted"}
+            )
+            self.jobs.update_task(entry.task_id, "accepted")
+            sent += 1
+        if sent:
+            self.logger.info(f"📬 Delivered {sent} queued commands to {agent_id}")
+        return sent
 
     def get_pending_commands(self, agent_id: str) -> List[dict]:
         """Get pending commands for an agent"""
-        if agent_id in self.recent_commands:
-            return list(self.recent_commands[agent_id].values())
-        return []
+        return self.pending_commands.pending(agent_id)
 
-    def remove_pending_command(self, agent_id: str, task_id: str):
+    async def poll_pending_commands(self, agent_id: str, wait: float = 0) -> List[dict]:
+        """Lease the agent's undelivered commands, waiting up to ``wait`` seconds"""
+        if wait > 0:
+            return await self.pending_commands.wait(agent_id, wait)
+        return self.pending_commands.lease(agent_id)
+
+    def remove_pending_command(self, agent_id: str, task_id: str) -> bool:
         """Remove a pending command after it's been processed"""
-        if (
-            agent_id in self.recent_commands
-            and task_id in self.recent_commands[agent_id]
-        ):
-            del self.recent_commands[agent_id][task_id]
+        if not self.pending_commands.ack(agent_id, task_id):
+            return False
+        self.task_writer.record_dequeue(task_id)
+        self.bus.publish(
+            "pending_command",
+            {"agent_id": agent_id, "task_id": task_id, "command": None},
+        )
+        return True
+
+    def drop_pending_commands(self, agent_id: str):
+        """Forget everything queued for an agent that no longer exists"""
+        for entry in self.pending_commands.ordered(agent_id):
+            self.remove_pending_command(agent_id, entry.task_id)
+
+    async def _on_remote_pending_command(self, payload: dict, sender: str):
+        agent_id, task_id = payload["agent_id"], payload["task_id"]
+        if payload["command"] is None:
+            self.pending_commands.ack(agent_id, task_id)
+        else:
+            # The worker that queued it enforced the limit and persisted it
+            self.pending_commands.put(
+                agent_id,
+                task_id,
+                payload["command"],
+                payload.get("priority", 0),
+                enforce_limit=False,
+            )
+
+    def match_untagged_result(self, agent_id: str) -> Optional[str]:
+        """Task a result reported without a task_id most likely answers"""
+        return self.task_futures.oldest(agent_id)
+
+    async def wait_for_task_result(
+        self, task_id: str, timeout: float
+    ) -> Optional[dict]:
+        """The task's final result, waiting up to ``timeout`` seconds for it"""
+        future = self.task_futures.get(task_id)
+        if future is None:
+            # Not outstanding: it either finished already or was never sent
+            stored = self.task_results.get(task_id)
+            if stored and stored.get("status", "completed") in FINAL_TASK_STATUSES:
+                return stored
+            return None
+        try:
+            # Shielded: other callers may be waiting on the same future
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            return None
 
     def get_stored_task_result(self, task_id: str) -> Optional[dict]:
         """Get a stored task result"""
         return self.task_results.get(task_id)
 
-    def store_task_result(self, task_id: str, result_data: dict):
+    def store_task_result(
+        self, task_id: str, result_data: dict, agent_id: Optional[str] = None
+    ):
         """Store a task result"""
-        self.task_results[task_id] = result_data
+        if agent_id is not None:
+            # A result is as good as an acknowledgement
+            self.remove_pending_command(agent_id, task_id)
+        result_data = self._apply_task_result(task_id, result_data, agent_id)
+        self.task_writer.record_result(task_id, agent_id, result_data)
+        self._publish_task_event("result", task_id, agent_id, result_data)
+
+    def _apply_task_result(
+        self, task_id: str, result_data: dict, agent_id: Optional[str]
+    ) -> dict:
+        self.task_output.finish(task_id)
+        output_buffer = self.task_output.get(task_id)
+        if result_data.get("output") is None and output_buffer is not None:
+            # Agents that streamed their output may not repeat it in the result
+            result_data = {**result_data, "output": output_buffer.text()}
+
+        self.task_results.put(task_id, result_data, agent_id=agent_id)
+        self.jobs.update_task(task_id, result_data.get("status", "completed"))
+        self.task_events.publish(
+            "task_result",
+            task_id,
+            {"agent_id": agent_id, "status": "completed", **result_data},
+        )
+        self.task_futures.resolve(task_id, {"status": "completed", **result_data})
+        return result_data
+
+    def append_task_output(
+        self,
+        task_id: str,
+        seq: int,
+        data: str,
+        stream: str = "stdout",
+        agent_id: Optional[str] = None,
+    ) -> bool:
+        """Buffer a chunk of streamed output and push it to live viewers"""
+        if not self._apply_task_output(task_id, seq, data, stream, agent_id):
+            return False
+        self._publish_task_event(
+            "output", task_id, agent_id, {"seq": seq, "data": data, "stream": stream}
+        )
+        return True
+
+    def _apply_task_output(
+        self, task_id: str, seq: int, data: str, stream: str, agent_id: Optional[str]
+    ) -> bool:
+        chunk = self.task_output.append(task_id, agent_id, seq, data, stream)
+        if chunk is None:
+            return False
+        self.task_events.publish(
+            "task_output", task_id, {"agent_id": agent_id, **chunk}
+        )
+        return True
+
+    def store_task_status(
+        self, task_id: str, status_data: dict, agent_id: Optional[str] = None
+    ):
+        """Store a task status update"""
+        self._apply_task_status(task_id, status_data, agent_id)
+        self.task_writer.record_status(task_id, agent_id, status_data)
+        self._publish_task_event("status", task_id, agent_id, status_data)
+
+    def _apply_task_status(
+        self, task_id: str, status_data: dict, agent_id: Optional[str]
+    ):
+        self.task_results.put(task_id, status_data, agent_id=agent_id)
+        self.jobs.update_task(task_id, status_data.get("status"))
+        self.task_events.publish(
+            "task_status", task_id, {"agent_id": agent_id, **status_data}
+        )
+        if status_data.get("status") in FINAL_TASK_STATUSES:
+            self.task_futures.resolve(task_id, status_data)
+
+    def _publish_task_event(
+        self, kind: str, task_id: str, agent_id: Optional[str], data: dict
+    ):
+        """Let the other workers' dashboards and jobs see this task change"""
+        self.bus.publish(
+            "task_event",
+            {"kind": kind, "task_id": task_id, "agent_id": agent_id, "data": data},
+        )
+
+    async def _on_remote_task_event(self, payload: dict, sender: str):
+        # The worker that received it from the agent already persisted it
+        kind, task_id, agent_id = (
+            payload["kind"],
+            payload["task_id"],
+            payload["agent_id"],
+        )
+        data = payload["data"]
+        if kind == "result":
+            self._apply_task_result(task_id, data, agent_id)
+        elif kind == "status":
+            self._apply_task_status(task_id, data, agent_id)
+        elif kind == "output":
+            self._apply_task_output(
+                task_id, data["seq"], data["data"], data["stream"], agent_id
+            )
+
+
+class HeartbeatBuffer:
+    """In-memory heartbeat table flushed to the agents table in batches
+
+    Heartbeats only update this table; ``flush`` writes the latest
+    ``last_heartbeat``/``status`` per agent in one transaction, so the cost
+    no longer grows with the heartbeat rate.
+    """
+
+    def __init__(
+        self,
+        db,
+        flush_interval: float = HEARTBEAT_FLUSH_INTERVAL,
+        on_flush: Optional[Callable[[List[dict]], None]] = None,
+    ):
+        self.db = db
+        self.flush_interval = flush_interval
+        # agent_id -> {"agent_id", "last_heartbeat", "status"} not yet written
+        self.pending: Dict[str, dict] = {}
+        # Called with each batch once it has been written
+        self.on_flush = on_flush
+        self.logger = logging.getLogger(__name__)
+
+    def record(self, agent_id: str, status: str = "online"):
+        """Absorb a heartbeat; it reaches the database on the next flush"""
+        self.pending[agent_id] = {
+            "agent_id": agent_id,
+            "last_heartbeat": datetime.utcnow(),
+            "status": status,
+        }
+
+    def mark_offline(self, agent_id: str):
+        """Keep an unflushed heartbeat from writing the agent back online"""
+        pending = self.pending.get(agent_id)
+        if pending is not None:
+            pending["status"] = "offline"
+
+    def forget(self, agent_id: str):
+        """Drop everything buffered for an agent (e.g. after unregistering)"""
+        self.pending.pop(agent_id, None)
+
+    async def flush(self) -> int:
+        """Write all buffered heartbeats in a single batched transaction"""
+        if not self.pending:
+            return 0
+
+        batch, self.pending = self.pending, {}
+        rows = list(batch.values())
+        try:
+            written = await self.db.update_heartbeats(rows)
+        except Exception:
+            # Put the batch back unless a newer heartbeat arrived meanwhile
+            for agent_id, heartbeat in batch.items():
+                self.pending.setdefault(agent_id, heartbeat)
+            raise
+        if self.on_flush is not None:
+            self.on_flush(rows)
+        return written
+
+    async def run(self):
+        """Background task that flushes buffered heartbeats periodically"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                flushed = await self.flush()
+                if flushed:
+                    self.logger.debug(f"💾 Flushed {flushed} heartbeats")
+            except Exception as e:
+                self.logger.error(f"❌ Error flushing heartbeats: {e}")
+
+
+class HeartbeatDeadlines:
+    """Min-heap of per-agent heartbeat deadlines
+
+    Every heartbeat pushes a new deadline; superseded entries stay in the
+    heap and are skipped when popped, so both operations are O(log n) and a
+    tick only looks at agents that actually expired.
+    """
+
+    def __init__(self, timeout: float = ONLINE_TIMEOUT_MINUTES * 60):
+        self.timeout = timeout
+        self._heap: List[Tuple[float, str]] = []
+        # agent_id -> its current deadline (time.monotonic() based)
+        self._deadlines: Dict[str, float] = {}
+
+    def touch(self, agent_id: str, deadline: Optional[float] = None):
+        """Push an agent's deadline out (by default to now + timeout)"""
+        if deadline is None:
+            deadline = time.monotonic() + self.timeout
+        self._deadlines[agent_id] = deadline
+        heapq.heappush(self._heap, (deadline, agent_id))
+
+    def remove(self, agent_id: str):
+        self._deadlines.pop(agent_id, None)
+
+    def pop_expired(self, now: Optional[float] = None) -> List[str]:
+        """Agents whose deadline has passed; they are no longer tracked"""
+        if now is None:
+            now = time.monotonic()
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, agent_id = heapq.heappop(self._heap)
+            if self._deadlines.get(agent_id) == deadline:
+                del self._deadlines[agent_id]
+                expired.append(agent_id)
+        return expired
+
+    def __contains__(self, agent_id: str) -> bool:
+        return agent_id in self._deadlines
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+
+class AgentRecord:
+    """Compact in-memory copy of one row of the agents table"""
+
+    __slots__ = (
+        "agent_id",
+        "hostname",
+        "ip_address",
+        "port",
+        "capabilities",
+        "version",
+        "registered_at",
+        "last_heartbeat",
+        "status",
+        "customer_uuid",
+        "customer_name",
+    )
+
+    def __init__(
+        self,
+        agent_id: str,
+        hostname: str,
+        ip_address: str,
+        port: int,
+        capabilities: List[str],
+        version: str,
+        registered_at: datetime,
+        last_heartbeat: datetime,
+        status: str = "online",
+        customer_uuid: Optional[str] = None,
+        customer_name: Optional[str] = None,
+    ):
+        self.agent_id = agent_id
+        self.hostname = hostname
+        self.ip_address = ip_address
+        self.port = port
+        self.capabilities = capabilities
+        self.version = version
+        self.registered_at = registered_at
+        self.last_heartbeat = last_heartbeat
+        self.status = status
+        self.customer_uuid = customer_uuid
+        self.customer_name = customer_name
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class AgentRegistry:
+    """Active agents indexed by agent_id, hostname and customer
+
+    Loaded from the agents table at startup; ``AgentManager`` writes every
+    change through to the database and then applies it here, so reads never
+    need to go to the database.
+    """
+
+    def __init__(self):
+        self.by_id: Dict[str, AgentRecord] = {}
+        self.by_hostname: Dict[str, str] = {}
+        self.by_customer: Dict[str, Set[str]] = {}
+
+    def load(self, rows: List[dict]):
+        self.by_id.clear()
+        self.by_hostname.clear()
+        self.by_customer.clear()
+        for row in rows:
+            self.add(AgentRecord(**row))
+
+    def add(self, record: AgentRecord):
+        self.remove(record.agent_id)
+        self.by_id[record.agent_id] = record
+        self.by_hostname[record.hostname] = record.agent_id
+        if record.customer_uuid:
+            self.by_customer.setdefault(record.customer_uuid, set()).add(
+                record.agent_id
+            )
+
+    def remove(self, agent_id: str) -> Optional[AgentRecord]:
+        record = self.by_id.pop(agent_id, None)
+        if record is None:
+            return None
+        if self.by_hostname.get(record.hostname) == agent_id:
+            del self.by_hostname[record.hostname]
+        customer_agents = self.by_customer.get(record.customer_uuid)
+        if customer_agents is not None:
+            customer_agents.discard(agent_id)
+            if not customer_agents:
+                del self.by_customer[record.customer_uuid]
+        return record
+
+    def get(self, agent_id: str) -> Optional[AgentRecord]:
+        return self.by_id.get(agent_id)
+
+    def get_by_hostname(self, hostname: str) -> Optional[AgentRecord]:
+        agent_id = self.by_hostname.get(hostname)
+        return self.by_id.get(agent_id) if agent_id else None
+
+    def for_customer(self, customer_uuid: str) -> List[AgentRecord]:
+        return [
+            self.by_id[agent_id] for agent_id in self.by_customer.get(customer_uuid, ())
+        ]
+
+    def all(self) -> List[AgentRecord]:
+        return list(self.by_id.values())
+
+    def __len__(self) -> int:
+        return len(self.by_id)
 
 
 class AgentManager:
     def __init__(self):
-        self.db = db_manager
+        self.db = async_db_manager
         self.heartbeat_timeout = timedelta(minutes=2)
+        self.heartbeats = HeartbeatBuffer(self.db, on_flush=self._publish_heartbeats)
+        # Authoritative view of active agents; the agents table backs it
+        self.registry = AgentRegistry()
+        # When each online agent must be heard from again
+        self.deadlines = HeartbeatDeadlines()
+        # Agents marked offline in memory whose row still needs updating
+        self._offline_writes: Set[str] = set()
+        # Fleet revision, bumped whenever an agent is added or removed or its
+        # status or connection changes, so listings can be served as deltas.
+        # Seeded from the clock so it keeps increasing across restarts.
+        self.revision = int(time.time() * 1000)
+        self.base_revision = self.revision
+        self._agent_revisions: Dict[str, int] = {}
+        # agent_id -> (revision, monotonic time) of its removal, oldest first
+        self._removed_revisions: Dict[str, Tuple[int, float]] = {}
+        self.removed_retention = REMOVED_AGENT_RETENTION
+        # Keeps the registries of other workers in step with this one
+        self.bus = MessageBus()
         self.logger = logging.getLogger(__name__)
 
+    def attach_bus(self, bus: MessageBus):
+        """Share registry changes with the other workers on ``bus``"""
+        self.bus = bus
+        bus.on("agent_upsert", self._on_remote_upsert)
+        bus.on("agent_removed", self._on_remote_removed)
+        bus.on("heartbeats", self._on_remote_heartbeats)
+        bus.on("customer_renamed", self._on_remote_customer_renamed)
+
+    def _observe_revision(self, payload: dict):
+        # Lamport-style: never fall behind a revision another worker handed out
+        self.revision = max(self.revision, payload["revision"])
+
+    def _publish_heartbeats(self, rows: List[dict]):
+        self.bus.publish("heartbeats", {"heartbeats": rows})
+
+    def _deadline_for(self, last_heartbeat: datetime) -> float:
+        """Monotonic deadline for an agent last heard from at ``last_heartbeat``"""
+        remaining = (last_heartbeat - datetime.utcnow()).total_seconds()
+        return time.monotonic() + remaining + self.deadlines.timeout
+
+    async def _on_remote_upsert(self, payload: dict, sender: str):
+        record = AgentRecord(**payload["agent"])
+        record.registered_at = datetime.fromisoformat(str(record.registered_at))
+        record.last_heartbeat = datetime.fromisoformat(str(record.last_heartbeat))
+        self._observe_revision(payload)
+        self.registry.add(record)
+        self.deadlines.touch(record.agent_id, self._deadline_for(record.last_heartbeat))
+        self.mark_changed(record.agent_id)
+
+    async def _on_remote_removed(self, payload: dict, sender: str):
+        agent_id = payload["agent_id"]
+        self._observe_revision(payload)
+        self.heartbeats.forget(agent_id)
+        self.deadlines.remove(agent_id)
+        self._offline_writes.discard(agent_id)
+        if self.registry.remove(agent_id) is not None:
+            self.mark_changed(agent_id, removed=True)
+
+    async def _on_remote_heartbeats(self, payload: dict, sender: str):
+        for heartbeat in payload["heartbeats"]:
+            record = self.registry.get(heartbeat["agent_id"])
+            if record is None:
+                continue
+            last_heartbeat = datetime.fromisoformat(heartbeat["last_heartbeat"])
+            if last_heartbeat <= record.last_heartbeat:
+                continue
+            record.last_heartbeat = last_heartbeat
+            if heartbeat["status"] != "offline":
+                self.deadlines.touch(
+                    record.agent_id, self._deadline_for(last_heartbeat)
+                )
+                self._offline_writes.discard(record.agent_id)
+            else:
+                self.deadlines.remove(record.agent_id)
+            if record.status != heartbeat["status"]:
+                record.status = heartbeat["status"]
+                self.mark_changed(record.agent_id)
+
+    async def _on_remote_customer_renamed(self, payload: dict, sender: str):
+        self._observe_revision(payload)
+        self._rename_customer(payload["customer_uuid"], payload["name"])
+
+    async def load_registry(self):
+        """Fill the registry from the agents table (called at startup)"""
+        self.registry.load(await self.db.get_all_agents())
+        # Resume deadlines from the last heartbeat each agent sent
+        for record in self.registry.all():
+            if record.status != "offline":
+                self.deadlines.touch(
+                    record.agent_id, self._deadline_for(record.last_heartbeat)
+                )
+        self.logger.info(f"📇 Loaded {len(self.registry)} agents into the registry")
+
+    def mark_changed(self, agent_id: str, removed: bool = False):
+        """Bump the fleet revision for a change to one agent"""
+        self.revision += 1
+        if removed:
+            self._agent_revisions.pop(agent_id, None)
+            # Re-inserted so the oldest removal is always first
+            self._removed_revisions.pop(agent_id, None)
+            self._removed_revisions[agent_id] = (self.revision, time.monotonic())
+        else:
+            self._removed_revisions.pop(agent_id, None)
+            self._agent_revisions[agent_id] = self.revision
+        self._prune_removed()
+
+    def _prune_removed(self, now: Optional[float] = None):
+        """Forget removals older than ``removed_retention``
+
+        Deltas from before a forgotten removal would miss it, so
+        ``base_revision`` moves up to it and older revisions get a full listing.
+        """
+        cutoff = (now if now is not None else time.monotonic()) - self.removed_retention
+        while self._removed_revisions:
+            agent_id, (revision, removed_at) = next(
+                iter(self._removed_revisions.items())
+            )
+            if removed_at >= cutoff:
+                break
+            del self._removed_revisions[agent_id]
+            self.base_revision = max(self.base_revision, revision)
+
+    def changes_since(self, revision: int) -> Optional[Tuple[List[str], List[str]]]:
+        """(changed agent IDs, removed agent IDs) after ``revision``
+
+        Returns None when the revision predates this process (or is from the
+        future, or from before the oldest removal still remembered), in which
+        case the caller needs a full listing.
+        """
+        self._prune_removed()
+        if revision < self.base_revision or revision > self.revision:
+            return None
+        changed = [
+            agent_id
+            for agent_id, agent_revision in self._agent_revisions.items()
+            if agent_revision > revision
+        ]
+        removed = [
+            agent_id
+            for agent_id, (agent_revision, _) in self._removed_revisions.items()
+            if agent_revision > revision
+        ]
+        return changed, removed
+
+    def revision_token(self, revision: Optional[int] = None) -> str:
+        """``revision`` tagged with the worker that numbered it
+
+        Each worker numbers its own changes, so a token handed out by another
+        worker behind the same port can't be compared with this one's.
+        """
+        revision = self.revision if revision is None else revision
+        return f"{self.bus.worker_id}:{revision}"
+
+    def parse_revision_token(self, token: str) -> Optional[int]:
+        """The revision in a token from this worker; None for any other"""
+        worker_id, _, revision = token.rpartition(":")
+        if worker_id != self.bus.worker_id or not revision.isdigit():
+            return None
+        return int(revision)
+
+    def etag(self) -> str:
+        return f'W/"{self.revision_token()}"'
+
+    def on_presence_change(self, agent_id: str):
+        """An agent's first socket opened or its last socket closed"""
+        self.mark_changed(agent_id)
+        if not manager.is_agent_connected(agent_id):
+            # Losing the WebSocket is as good as a missed heartbeat
+            self._mark_offline(agent_id)
+            return
+        # ...and opening one as good as a heartbeat, so a reconnecting agent
+        # doesn't stay offline until its next heartbeat is due
+        record = self.registry.get(agent_id)
+        if record is not None:
+            status = "online" if record.status == "offline" else record.status
+            self._record_heartbeat(record, status)
+
+    def _mark_offline(self, agent_id: str) -> bool:
+        """Flip an agent to offline in memory and queue the row update"""
+        self.deadlines.remove(agent_id)
+        record = self.registry.get(agent_id)
+        if record is None or record.status == "offline":
+            return False
+        record.status = "offline"
+        self.heartbeats.mark_offline(agent_id)
+        self._offline_writes.add(agent_id)
+        self.mark_changed(agent_id)
+        return True
+
+    def _to_model(self, record: AgentRecord) -> RegisteredAgent:
+        return RegisteredAgent(
+            **record.to_dict(),
+            websocket_connected=manager.is_agent_connected(record.agent_id),
+        )
+
+    def _online_since(self) -> datetime:
+        return datetime.utcnow() - timedelta(minutes=ONLINE_TIMEOUT_MINUTES)
+
+    def _count_online(self, records: List[AgentRecord]) -> int:
+        online_since = self._online_since()
+        return sum(1 for record in records if record.last_heartbeat >= online_since)
+
     async def register_agent(self, registration: AgentRegistration) -> str:
         # Check if agent with same hostname already exists
-        existing_agent = self.db.get_agent_by_hostname(registration.hostname)
+        existing_agent = self.registry.get_by_hostname(registration.hostname)
         if existing_agent:
             # Remove old registration
-            self.db.delete_agent(existing_agent["agent_id"])
+            await self.db.delete_agent(existing_agent.agent_id)
+            self.registry.remove(existing_agent.agent_id)
+            self.heartbeats.forget(existing_agent.agent_id)
+            self.deadlines.remove(existing_agent.agent_id)
+            manager.drop_pending_commands(existing_agent.agent_id)
+            self.mark_changed(existing_agent.agent_id, removed=True)
+            self._publish_removed(existing_agent.agent_id)
             self.logger.info(
                 f"🗑️ Removed old registration for hostname: {registration.hostname}"
             )
@@ -226,93 +1037,222 @@ class AgentManager:
         }
 
         # Save to database
-        saved_agent_id = self.db.register_agent(agent_data)
+        saved_agent_id = await self.db.register_agent(agent_data)
+
+        customer_name = None
+        if registration.customer_uuid:
+            siblings = self.registry.for_customer(registration.customer_uuid)
+            if siblings:
+                customer_name = siblings[0].customer_name
+            else:
+                customer = await self.db.get_customer(registration.customer_uuid)
+                customer_name = customer["name"] if customer else None
+
+        now = datetime.utcnow()
+        record = AgentRecord(
+            agent_id=saved_agent_id,
+            hostname=registration.hostname,
+            ip_address=registration.ip_address,
+            port=registration.port,
+            capabilities=list(registration.capabilities),
+            version=registration.version,
+            registered_at=now,
+            last_heartbeat=now,
+            status="online",
+            customer_uuid=registration.customer_uuid,
+            customer_name=customer_name,
+        )
+        self.registry.add(record)
+        self.deadlines.touch(saved_agent_id)
+        self.mark_changed(saved_agent_id)
+        self.bus.publish(
+            "agent_upsert", {"agent": record.to_dict(), "revision": self.revision}
+        )
         self.logger.info(
             f"🔗 Agent registered in database: {registration.hostname} ({saved_agent_id})"
         )
         return saved_agent_id
 
     async def update_heartbeat(self, agent_id: str, heartbeat: HeartbeatRequest):
-        success = self.db.update_heartbeat(agent_id, heartbeat.status)
-        if success:
-            agent = self.db.get_agent(agent_id)
-            if agent:
-                self.logger.info(f"💓 Heartbeat from {agent['hostname']}")
-        else:
+        record = self.registry.get(agent_id)
+        if record is None:
             raise HTTPException(status_code=404, detail="Agent not found")
 
-    def get_agent(self, agent_id: str) -> Optional[RegisteredAgent]:
-        agent_data = self.db.get_agent(agent_id)
-        if agent_data:
-            # Get customer name if customer_uuid exists
-            customer_name = None
-            if agent_data.get("customer_uuid"):
-                customer = self.db.get_customer(agent_data["customer_uuid"])
-                if customer:
-                    customer_name = customer["name"]
-
-            # Check if agent is connected via WebSocket
-            websocket_connected = manager.is_agent_connected(agent_id)
-
-            return RegisteredAgent(
-                **agent_data,
-                customer_name=customer_name,
-                websocket_connected=websocket_connected,
-            )
-        return None
+        self._record_heartbeat(record, heartbeat.status)
+        self.logger.info(f"💓 Heartbeat from {record.hostname}")
+
+    def _record_heartbeat(self, record: AgentRecord, status: str):
+        # The registry is updated now; the agents table on the next flush
+        self.heartbeats.record(record.agent_id, status)
+        record.last_heartbeat = datetime.utcnow()
+        self.deadlines.touch(record.agent_id)
+        self._offline_writes.discard(record.agent_id)
+        if record.status != status:
+            record.status = status
+            self.mark_changed(record.agent_id)
+
+    async def get_agent(self, agent_id: str) -> Optional[RegisteredAgent]:
+        record = self.registry.get(agent_id)
+        return self._to_model(record) if record else None
+
+    async def get_all_agents(self) -> List[RegisteredAgent]:
+        return [self._to_model(record) for record in self.registry.all()]
+
+    async def get_agents_with_counts(self) -> Tuple[List[RegisteredAgent], int]:
+        """All active agents plus how many of them are online
+
+        The online count uses the same heartbeat window as
+        ``get_online_agents``.
+        """
+        records = self.registry.all()
+        return [self._to_model(record) for record in records], self._count_online(
+            records
+        )
 
-    def get_all_agents(self) -> List[RegisteredAgent]:
-        agents_data = self.db.get_all_agents()
+    async def get_agents_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        sort: str = "hostname",
+        descending: bool = False,
+        **filters,
+    ) -> dict:
+        """One keyset page of agents with filtered total/online counts
+
+        Filtering and ordering run on the indexed agents table; the rows are
+        then taken from the registry so they carry the latest heartbeat.
+        """
+        page = await self.db.get_agents_page(
+            limit,
+            cursor,
+            sort,
+            descending,
+            online_timeout_minutes=ONLINE_TIMEOUT_MINUTES,
+            **filters,
+        )
         agents = []
-        for agent_data in agents_data:
-            customer_name = None
-            if agent_data.get("customer_uuid"):
-                customer = self.db.get_customer(agent_data["customer_uuid"])
-                if customer:
-                    customer_name = customer["name"]
-
-            # Check if agent is connected via WebSocket
-            websocket_connected = manager.is_agent_connected(agent_data["agent_id"])
-
+        for agent_data in page["agents"]:
+            record = self.registry.get(agent_data["agent_id"])
             agents.append(
-                RegisteredAgent(
-                    **agent_data,
-                    customer_name=customer_name,
-                    websocket_connected=websocket_connected,
-                )
+                self._to_model(record if record else AgentRecord(**agent_data))
             )
-        return agents
+        page["agents"] = agents
+        return page
+
+    async def get_agents_since(self, token: str) -> Optional[dict]:
+        """Agents changed after the revision in ``token``
+
+        None when the token is too old or was handed out by another worker.
+        """
+        revision = self.parse_revision_token(token)
+        changes = None if revision is None else self.changes_since(revision)
+        if changes is None:
+            return None
+        changed, removed = changes
+        records = self.registry.all()
+        return {
+            "revision": self.revision_token(),
+            "agents": [
+                self._to_model(self.registry.by_id[agent_id])
+                for agent_id in changed
+                if agent_id in self.registry.by_id
+            ],
+            "removed": removed,
+            "total": len(records),
+            "online": self._count_online(records),
+        }
 
-    def get_online_agents(self) -> List[RegisteredAgent]:
-        agents_data = self.db.get_online_agents()
-        agents = []
-        for agent_data in agents_data:
-            websocket_connected = manager.is_agent_connected(agent_data["agent_id"])
-            agents.append(
-                RegisteredAgent(**agent_data, websocket_connected=websocket_connected)
-            )
-        return agents
+    async def get_online_agents(self) -> List[RegisteredAgent]:
+        online_since = self._online_since()
+        return [
+            self._to_model(record)
+            for record in self.registry.all()
+            if record.last_heartbeat >= online_since
+        ]
+
+    def update_customer_name(self, customer_uuid: str, name: Optional[str]):
+        """Reflect a renamed or deleted customer on its agents"""
+        self._rename_customer(customer_uuid, name)
+        self.bus.publish(
+            "customer_renamed",
+            {"customer_uuid": customer_uuid, "name": name, "revision": self.revision},
+        )
+
+    def _rename_customer(self, customer_uuid: str, name: Optional[str]):
+        for record in self.registry.for_customer(customer_uuid):
+            if record.customer_name != name:
+                record.customer_name = name
+                self.mark_changed(record.agent_id)
 
-    async def cleanup_offline_agents(self):
-        """Background task to mark agents as offline if they haven't sent heartbeat"""
+    async def detect_offline_agents(self, interval: float = OFFLINE_CHECK_INTERVAL):
+        """Background task marking agents offline once their deadline passes"""
         while True:
+            await asyncio.sleep(interval)
             try:
-                offline_count = self.db.cleanup_offline_agents()
-                if offline_count > 0:
-                    self.logger.info(f"🔄 Marked {offline_count} agents as offline")
-                await asyncio.sleep(60)  # Check every minute
+                await self.expire_deadlines()
             except Exception as e:
-                self.logger.error(f"❌ Error in cleanup_offline_agents: {e}")
-                await asyncio.sleep(60)
+                self.logger.error(f"❌ Error in detect_offline_agents: {e}")
+
+    async def expire_deadlines(self) -> int:
+        """Mark agents past their heartbeat deadline offline (one UPDATE)"""
+        expired = [
+            agent_id
+            for agent_id in self.deadlines.pop_expired()
+            if self._mark_offline(agent_id)
+        ]
+        if not self._offline_writes:
+            return 0
+
+        batch = list(self._offline_writes)
+        self._offline_writes.clear()
+        try:
+            await self.db.mark_agents_offline(batch)
+        except Exception:
+            # Retry on the next tick unless the agent came back meanwhile
+            self._offline_writes.update(
+                agent_id
+                for agent_id in batch
+                if agent_id not in self.deadlines and agent_id in self.registry.by_id
+            )
+            raise
+        if expired:
+            self.logger.info(f"🔄 Marked {len(expired)} agents as offline")
+        return len(batch)
 
     async def unregister_agent(self, agent_id: str) -> bool:
-        return self.db.delete_agent(agent_id)
+        self.heartbeats.forget(agent_id)
+        self.deadlines.remove(agent_id)
+        self._offline_writes.discard(agent_id)
+        deleted = await self.db.delete_agent(agent_id)
+        if deleted:
+            self.registry.remove(agent_id)
+            manager.drop_pending_commands(agent_id)
+            self.mark_changed(agent_id, removed=True)
+            self._publish_removed(agent_id)
+        return deleted
+
+    def _publish_removed(self, agent_id: str):
+        self.bus.publish(
+            "agent_removed", {"agent_id": agent_id, "revision": self.revision}
+        )
+
+    @staticmethod
+    def _build_command(task_id: str, command_request: CommandRequest) -> dict:
+        return {
+            "type": "command",
+            "task_id": task_id,
+            "command": command_request.command,
+            "shell_type": command_request.shell_type,
+            "timeout": command_request.timeout,
+            "working_directory": command_request.working_directory,
+            "environment": command_request.environment,
+        }
 
     async def send_command_to_agent(
         self, agent_id: str, command_request: CommandRequest
     ):
 
-        agent = self.get_agent(agent_id)
+        agent = self.registry.get(agent_id)
         if not agent:
             raise ValueError(f"Agent {agent_id} not found")
 
@@ -321,24 +1261,17 @@ class AgentManager:
 
         # Generate task ID
         task_id = str(uuid.uuid4())
-
-        # Prepare command data
-        command_data = {
-            "type": "command",
-            "task_id": task_id,
-            "command": command_request.command,
-            "shell_type": command_request.shell_type,
-            "timeout": command_request.timeout,
-            "working_directory": command_request.working_directory,
-            "environment": command_request.environment,
-        }
+        command_data = self._build_command(task_id, command_request)
+        # Registered before sending: a fast agent may answer before send returns
+        manager.task_futures.track(agent_id, task_id)
 
         # Try to send via WebSocket first
         if manager.is_agent_connected(agent_id):
             success = await manager.send_command_to_agent(agent_id, command_data)
             if success:
-                # Store recent command for this agent
-                manager.recent_commands[agent_id] = task_id
+                manager.task_writer.record_dispatch(
+                    task_id, agent_id, command_request.command, "accepted"
+                )
                 return {
                     "task_id": task_id,
                     "status": "accepted",
@@ -347,7 +1280,16 @@ class AgentManager:
 
         # Fallback to HTTP (if agent supports it)
         # Store the command for HTTP agents to poll
-        manager.store_pending_command(agent_id, task_id, command_data)
+        try:
+            manager.store_pending_command(
+                agent_id, task_id, command_data, command_request.priority
+            )
+        except CommandQueueFull:
+            manager.task_futures.discard(task_id)
+            raise
+        manager.task_writer.record_dispatch(
+            task_id, agent_id, command_request.command, "pending"
+        )
 
         return {
             "task_id": task_id,
@@ -355,7 +1297,121 @@ class AgentManager:
             "message": "Command queued for HTTP agent",
         }
 
+    async def dispatch_bulk(
+        self,
+        command_request: CommandRequest,
+        selector: BulkTargetSelector,
+        concurrency: int = BULK_DISPATCH_CONCURRENCY,
+    ) -> dict:
+        """Send one command to every agent matching ``selector``
+
+        Targets are resolved from the registry. Connected agents are sent
+        the command concurrently (at most ``concurrency`` sockets at a time);
+        the rest get it queued for HTTP polling. Returns the job summary.
+        """
+        job = manager.jobs.create(command_request.command, selector.describe())
+
+        if selector.agent_ids is not None:
+            targets = []
+            for agent_id in selector.agent_ids:
+                record = self.registry.get(agent_id)
+                if record is None:
+                    manager.jobs.skip(job, agent_id, "not_found")
+                else:
+                    targets.append(record)
+        elif selector.customer_uuid:
+            targets = self.registry.for_customer(selector.customer_uuid)
+        else:
+            targets = self.registry.all()
+
+        websocket_targets = []
+        for record in targets:
+            agent_id = record.agent_id
+            if (
+                selector.customer_uuid
+                and record.customer_uuid != selector.customer_uuid
+            ):
+                continue
+            if selector.capability and selector.capability not in record.capabilities:
+                continue
+            if record.status != "online":
+                manager.jobs.skip(job, agent_id, "offline")
+                continue
+            task_id = str(uuid.uuid4())
+            command_data = self._build_command(task_id, command_request)
+            manager.task_futures.track(agent_id, task_id)
+            if manager.is_agent_connected(agent_id):
+                # Registered before sending: a fast agent may answer while the
+                # other sockets are still being written to
+                manager.jobs.add_task(job, agent_id, task_id, "accepted")
+                manager.task_writer.record_dispatch(
+                    task_id, agent_id, command_request.command, "accepted"
+                )
+                websocket_targets.append((agent_id, task_id, command_data))
+            else:
+                self._queue_bulk_command(
+                    job, agent_id, task_id, command_data, command_request.priority
+                )
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send(agent_id: str, command_data: dict) -> bool:
+            async with semaphore:
+                return await manager.send_command_to_agent(agent_id, command_data)
+
+        sent = await asyncio.gather(
+            *(send(agent_id, data) for agent_id, _, data in websocket_targets),
+            return_exceptions=True,
+        )
+        for (agent_id, task_id, command_data), success in zip(websocket_targets, sent):
+            if success is not True:
+                # The socket went away mid-dispatch; let the agent poll for it
+                self._requeue_bulk_command(
+                    job, agent_id, task_id, command_data, command_request.priority
+                )
+
+        progress = job.progress()
+        self.logger.info(
+            f"📦 Job {job.job_id}: dispatched to {progress['total']} agents, "
+            f"skipped {progress['skipped']}"
+        )
+        return job.to_dict()
+
+    def _queue_bulk_command(
+        self, job, agent_id: str, task_id: str, command_data: dict, priority: int
+    ):
+        try:
+            manager.store_pending_command(agent_id, task_id, command_data, priority)
+        except CommandQueueFull:
+            # Shed load rather than grow a backlog the agent can't keep up with
+            manager.task_futures.discard(task_id)
+            manager.jobs.skip(job, agent_id, "queue_full")
+            return
+        manager.jobs.add_task(job, agent_id, task_id, "pending")
+        manager.task_writer.record_dispatch(
+            task_id, agent_id, command_data["command"], "pending"
+        )
+
+    def _requeue_bulk_command(
+        self, job, agent_id: str, task_id: str, command_data: dict, priority: int
+    ):
+        """Move a task whose WebSocket send failed onto the agent's queue"""
+        try:
+            manager.store_pending_command(agent_id, task_id, command_data, priority)
+        except CommandQueueFull:
+            manager.task_futures.discard(task_id)
+            manager.jobs.remove_task(job, agent_id)
+            manager.jobs.skip(job, agent_id, "queue_full")
+            manager.task_writer.record_status(
+                task_id, agent_id, {"status": "failed", "error": "Command queue full"}
+            )
+            return
+        manager.jobs.update_task(task_id, "pending")
+        manager.task_writer.record_status(task_id, agent_id, {"status": "pending"})
+
 
 # Create global instances
 manager = ConnectionManager()
 agent_manager = AgentManager()
+manager.on_presence_change = agent_manager.on_presence_change
+agent_manager.attach_bus(manager.bus)
@@ -0,0 +1,217 @@
+"""
+Task event fan-out for browser clients (Server-Sent Events)
+"""
+
+import asyncio
+import json
+import logging
+from typing import Dict, Iterable, Optional, Set
+
+# Events buffered per subscriber before the oldest ones are dropped
+SUBSCRIBER_QUEUE_SIZE = 256
+# Idle SSE streams get a comment line this often so proxies keep them open
+SSE_KEEPALIVE_INTERVAL = 15  # seconds
+
+FINAL_TASK_STATUSES = {"completed", "failed", "timeout", "cancelled"}
+
+
+class TaskSubscription:
+    """One subscriber's queue of task events"""
+
+    def __init__(self, task_ids: Optional[Iterable[str]] = None):
+        # None means "every task"
+        self.task_ids: Optional[Set[str]] = set(task_ids) if task_ids else None
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = 0
+
+    def push(self, event: dict):
+        if self.queue.full():
+            # A slow browser loses its oldest events rather than blocking agents
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+
+class TaskEventBroker:
+    """Publishes task status transitions and results to subscribers
+
+    Publishing is synchronous and never waits on a subscriber, so it is safe
+    to call from the agent WebSocket receive loop.
+    """
+
+    def __init__(self):
+        self._by_task: Dict[str, Set[TaskSubscription]] = {}
+        self._all_tasks: Set[TaskSubscription] = set()
+        self.logger = logging.getLogger(__name__)
+
+    def subscribe(self, task_ids: Optional[Iterable[str]] = None) -> TaskSubscription:
+        subscription = TaskSubscription(task_ids)
+        if subscription.task_ids is None:
+            self._all_tasks.add(subscription)
+        else:
+            for task_id in subscription.task_ids:
+                self._by_task.setdefault(task_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: TaskSubscription):
+        if subscription.task_ids is None:
+            self._all_tasks.discard(subscription)
+            return
+        for task_id in subscription.task_ids:
+            subscribers = self._by_task.get(task_id)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._by_task[task_id]
+
+    def publish(self, event_type: str, task_id: str, data: dict):
+        """Send an event to everybody watching this task"""
+        subscribers = self._by_task.get(task_id, ())
+        if not subscribers and not self._all_tasks:
+            return
+
+        event = {"event": event_type, "task_id": task_id, "data": data}
+        for subscription in (*subscribers, *self._all_tasks):
+            subscription.push(event)
+
+    def subscriber_count(self) -> int:
+        watching = set(self._all_tasks)
+        for subscribers in self._by_task.values():
+            watching.update(subscribers)
+        return len(watching)
+
+
+def format_sse(event: dict) -> str:
+    """Render an event in text/event-stream framing"""
+    payload = json.dumps({"task_id": event["task_id"], **event["data"]}, default=str)
+    frame = f"event: {event['event']}\ndata: {payload}\n\n"
+    if "id" in event:
+        frame = f"id: {event['id']}\n" + frame
+    return frame
+
+
+async def stream_task_events(
+    broker: TaskEventBroker,
+    request,
+    task_ids: Optional[Iterable[str]] = None,
+    initial_events: Iterable[dict] = (),
+):
+    """Yield SSE frames for a subscription until the client goes away
+
+    ``initial_events`` are sent first (e.g. results that arrived before the
+    browser subscribed). When watching specific tasks the stream ends once
+    all of them have reached a final status.
+    """
+    subscription = broker.subscribe(task_ids)
+    pending = set(subscription.task_ids) if subscription.task_ids else None
+
+    def settle(event: dict):
+        if pending is not None and event["data"].get("status") in FINAL_TASK_STATUSES:
+            pending.discard(event["task_id"])
+
+    try:
+        yield "retry: 3000\n\n"
+        for event in initial_events:
+            settle(event)
+            yield format_sse(event)
+
+        while pending is None or pending:
+            try:
+                event = await asyncio.wait_for(
+                    subscription.queue.get(), timeout=SSE_KEEPALIVE_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+                continue
+
+            settle(event)
+            yield format_sse(event)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def stream_task_output(
+    broker: TaskEventBroker,
+    output_store,
+    request,
+    task_id: str,
+    from_seq: int = 0,
+    final_result: Optional[dict] = None,
+):
+    """Yield SSE frames tailing a task's output from ``from_seq`` onwards
+
+    Buffered chunks are replayed first, then live ``task_output`` events
+    follow until the task's result arrives. Each chunk carries its sequence
+    number as the SSE id, so a reconnecting EventSource resumes where it left
+    off via ``Last-Event-ID``. ``final_result`` is the task's result if it has
+    already finished; its output is sent as one chunk when nothing was
+    streamed.
+    """
+    # Subscribe before reading the buffer so no chunk falls in between
+    subscription = broker.subscribe([task_id])
+    next_seq = from_seq
+
+    finished = final_result is not None
+
+    def output_event(chunk: dict) -> dict:
+        return {
+            "event": "task_output",
+            "task_id": task_id,
+            "id": chunk["seq"],
+            "data": chunk,
+        }
+
+    try:
+        yield "retry: 3000\n\n"
+        buffer = output_store.get(task_id)
+        if buffer is not None:
+            chunks = buffer.read(from_seq)
+            if chunks and chunks[0]["seq"] > from_seq:
+                # Part of the requested range fell out of the capped buffer
+                yield format_sse(
+                    {
+                        "event": "task_output_truncated",
+                        "task_id": task_id,
+                        "data": buffer.info(),
+                    }
+                )
+            for chunk in chunks:
+                next_seq = chunk["seq"] + 1
+                yield format_sse(output_event(chunk))
+            finished = finished or buffer.finished
+        elif finished and from_seq == 0 and final_result.get("output"):
+            # The agent didn't stream; hand over the whole output at once
+            chunk = {"seq": 0, "stream": "stdout", "data": final_result["output"]}
+            yield format_sse(output_event(chunk))
+
+        if finished:
+            yield format_sse(
+                {"event": "task_output_end", "task_id": task_id, "data": {}}
+            )
+
+        while not finished:
+            try:
+                event = await asyncio.wait_for(
+                    subscription.queue.get(), timeout=SSE_KEEPALIVE_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+                continue
+
+            if event["event"] == "task_output":
+                if event["data"]["seq"] < next_seq:
+                    continue
+                next_seq = event["data"]["seq"] + 1
+                yield format_sse({**event, "id": event["data"]["seq"]})
+            elif event["event"] == "task_result":
+                finished = True
+                yield format_sse(
+                    {"event": "task_output_end", "task_id": task_id, "data": {}}
+                )
+    finally:
+        broker.unsubscribe(subscription)
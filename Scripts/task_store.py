@@ -0,0 +1,498 @@
+"""
+Task result storage: a bounded in-memory store for results reported by
+agents, per-task buffers for streamed output, futures for callers waiting on
+a result and a write-behind queue that persists task lifecycle rows
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Limits for results kept in memory; whichever is hit first evicts
+TASK_RESULT_MAX_ENTRIES = 10_000
+TASK_RESULT_MAX_BYTES = 64 * 1024 * 1024  # 64 MiB
+# Results not stored or read for this long are evicted
+TASK_RESULT_TTL = 60 * 60  # seconds
+
+# Streamed output kept per task; older chunks are dropped past the cap
+TASK_OUTPUT_MAX_BYTES = 1024 * 1024  # 1 MiB
+# Across all tasks; least recently written buffers are dropped past these
+TASK_OUTPUT_TOTAL_MAX_BYTES = 64 * 1024 * 1024  # 64 MiB
+TASK_OUTPUT_MAX_TASKS = 1_000
+
+# Outstanding tasks remembered per agent; the oldest are forgotten past this
+TASK_IN_FLIGHT_PER_AGENT = 1_000
+
+# Task writes are grouped for this long before being committed together
+TASK_WRITE_BATCH_DELAY = 0.005  # seconds
+TASK_WRITE_MAX_BATCH = 500
+
+
+class _StoredResult:
+    __slots__ = ("agent_id", "result", "size", "touched_at")
+
+    def __init__(self, agent_id: Optional[str], result: dict, size: int):
+        self.agent_id = agent_id
+        self.result = result
+        self.size = size
+        self.touched_at = time.monotonic()
+
+
+def estimate_result_size(result: dict) -> int:
+    """Approximate memory cost of a result by its serialized size"""
+    try:
+        return len(json.dumps(result, default=str))
+    except (TypeError, ValueError):
+        return len(str(result))
+
+
+class TaskResultStore:
+    """LRU task result store bounded by entry count, bytes and idle TTL
+
+    Entries are kept in least-recently-used order; storing or reading a
+    result moves it to the back, so expired entries are always at the front
+    and the TTL sweep stops at the first live entry. Evicted results are
+    still in the tasks table, which the task writer keeps up to date.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = TASK_RESULT_MAX_ENTRIES,
+        max_bytes: int = TASK_RESULT_MAX_BYTES,
+        ttl: float = TASK_RESULT_TTL,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, _StoredResult]" = OrderedDict()
+        self.total_bytes = 0
+        self.counters: Dict[str, int] = {
+            "stores": 0,
+            "hits": 0,
+            "misses": 0,
+            "evicted_lru": 0,
+            "evicted_ttl": 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._entries
+
+    def put(self, task_id: str, result: dict, agent_id: Optional[str] = None):
+        """Store (or replace) the latest result for a task"""
+        previous = self._entries.pop(task_id, None)
+        if previous is not None:
+            self.total_bytes -= previous.size
+            if agent_id is None:
+                agent_id = previous.agent_id
+
+        entry = _StoredResult(agent_id, result, estimate_result_size(result))
+        self._entries[task_id] = entry
+        self.total_bytes += entry.size
+        self.counters["stores"] += 1
+
+        self._evict()
+
+    def get(self, task_id: str) -> Optional[dict]:
+        """Get a stored result, counting it as read"""
+        self.purge_expired()
+        entry = self._entries.get(task_id)
+        if entry is None:
+            self.counters["misses"] += 1
+            return None
+
+        self._entries.move_to_end(task_id)
+        entry.touched_at = time.monotonic()
+        self.counters["hits"] += 1
+        return entry.result
+
+    def purge_expired(self) -> int:
+        """Evict results idle for longer than the TTL"""
+        deadline = time.monotonic() - self.ttl
+        expired = 0
+        while self._entries:
+            entry = next(iter(self._entries.values()))
+            if entry.touched_at > deadline:
+                break
+            self._entries.popitem(last=False)
+            self.total_bytes -= entry.size
+            expired += 1
+
+        self.counters["evicted_ttl"] += expired
+        return expired
+
+    def _evict(self):
+        self.purge_expired()
+
+        # Always keep the newest entry, even if it alone exceeds the byte cap
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes
+        ):
+            _, entry = self._entries.popitem(last=False)
+            self.total_bytes -= entry.size
+            self.counters["evicted_lru"] += 1
+
+    def metrics(self) -> dict:
+        """Snapshot of store size and hit/eviction counters"""
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            **self.counters,
+        }
+
+
+class TaskOutputBuffer:
+    """Append-only output of one task, capped in bytes
+
+    Chunks carry the agent's sequence numbers. Duplicates (e.g. resent after
+    a reconnect) are ignored; when the cap is exceeded the oldest chunks are
+    dropped and counted in ``dropped_bytes``.
+    """
+
+    def __init__(self, agent_id: Optional[str], max_bytes: int = TASK_OUTPUT_MAX_BYTES):
+        self.agent_id = agent_id
+        self.max_bytes = max_bytes
+        # (chunk, size in bytes) in sequence order
+        self.chunks: "deque[tuple]" = deque()
+        self.size = 0
+        self.last_seq = -1
+        self.dropped_bytes = 0
+        self.missing_chunks = 0
+        self.finished = False
+
+    def append(self, seq: int, data: str, stream: str = "stdout") -> Optional[dict]:
+        """Add a chunk; returns it, or None if it was a duplicate"""
+        if seq <= self.last_seq:
+            return None
+        if seq > self.last_seq + 1:
+            self.missing_chunks += seq - self.last_seq - 1
+        self.last_seq = seq
+
+        chunk = {"seq": seq, "stream": stream, "data": data}
+        chunk_size = len(data.encode("utf-8"))
+        self.chunks.append((chunk, chunk_size))
+        self.size += chunk_size
+
+        while self.size > self.max_bytes and len(self.chunks) > 1:
+            _, dropped_size = self.chunks.popleft()
+            self.size -= dropped_size
+            self.dropped_bytes += dropped_size
+        return chunk
+
+    def read(self, from_seq: int = 0) -> List[dict]:
+        """Chunks still buffered with a sequence number >= ``from_seq``"""
+        return [chunk for chunk, _ in self.chunks if chunk["seq"] >= from_seq]
+
+    def text(self, stream: Optional[str] = None) -> str:
+        return "".join(
+            chunk["data"]
+            for chunk, _ in self.chunks
+            if stream is None or chunk["stream"] == stream
+        )
+
+    def info(self) -> dict:
+        return {
+            "agent_id": self.agent_id,
+            "bytes": self.size,
+            "last_seq": self.last_seq,
+            "first_seq": self.chunks[0][0]["seq"] if self.chunks else None,
+            "dropped_bytes": self.dropped_bytes,
+            "missing_chunks": self.missing_chunks,
+            "finished": self.finished,
+        }
+
+
+def parse_output_chunk(data) -> Optional[dict]:
+    """Fields of a ``task_output_chunk`` message's data, None if malformed"""
+    if not isinstance(data, dict) or not isinstance(data.get("task_id"), str):
+        return None
+    seq = data.get("seq")
+    if isinstance(seq, bool):
+        return None
+    try:
+        seq = int(seq)
+    except (TypeError, ValueError):
+        return None
+    text = data.get("data", "")
+    stream = data.get("stream", "stdout")
+    if not isinstance(text, str) or not isinstance(stream, str):
+        return None
+    return {"task_id": data["task_id"], "seq": seq, "data": text, "stream": stream}
+
+
+class TaskOutputStore:
+    """Output buffers for running tasks, bounded in task count and total bytes"""
+
+    def __init__(
+        self,
+        max_tasks: int = TASK_OUTPUT_MAX_TASKS,
+        max_total_bytes: int = TASK_OUTPUT_TOTAL_MAX_BYTES,
+        max_bytes_per_task: int = TASK_OUTPUT_MAX_BYTES,
+    ):
+        self.max_tasks = max_tasks
+        self.max_total_bytes = max_total_bytes
+        self.max_bytes_per_task = max_bytes_per_task
+        self._buffers: "OrderedDict[str, TaskOutputBuffer]" = OrderedDict()
+        self.total_bytes = 0
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._buffers
+
+    def get(self, task_id: str) -> Optional[TaskOutputBuffer]:
+        return self._buffers.get(task_id)
+
+    def append(
+        self,
+        task_id: str,
+        agent_id: Optional[str],
+        seq: int,
+        data: str,
+        stream: str = "stdout",
+    ) -> Optional[dict]:
+        buffer = self._buffers.get(task_id)
+        if buffer is None:
+            buffer = TaskOutputBuffer(agent_id, self.max_bytes_per_task)
+            self._buffers[task_id] = buffer
+        else:
+            self._buffers.move_to_end(task_id)
+
+        size_before = buffer.size
+        chunk = buffer.append(seq, data, stream)
+        self.total_bytes += buffer.size - size_before
+        self._evict()
+        return chunk
+
+    def finish(self, task_id: str):
+        """Mark a task's output as complete (no more chunks expected)"""
+        buffer = self._buffers.get(task_id)
+        if buffer is not None:
+            buffer.finished = True
+
+    def _evict(self):
+        while len(self._buffers) > 1 and (
+            len(self._buffers) > self.max_tasks
+            or self.total_bytes > self.max_total_bytes
+        ):
+            _, buffer = self._buffers.popitem(last=False)
+            self.total_bytes -= buffer.size
+
+    def metrics(self) -> dict:
+        return {
+            "tasks": len(self._buffers),
+            "bytes": self.total_bytes,
+            "max_tasks": self.max_tasks,
+            "max_total_bytes": self.max_total_bytes,
+            "max_bytes_per_task": self.max_bytes_per_task,
+        }
+
+
+class TaskFutures:
+    """Futures for dispatched tasks, resolved when their result arrives
+
+    Tasks are tracked per agent in the order they were sent, so a result an
+    agent reports without a ``task_id`` is matched to its oldest outstanding
+    task rather than guessed.
+    """
+
+    def __init__(self, max_per_agent: int = TASK_IN_FLIGHT_PER_AGENT):
+        self.max_per_agent = max_per_agent
+        self._futures: Dict[str, asyncio.Future] = {}
+        self._agent_of: Dict[str, str] = {}
+        self._by_agent: Dict[str, "OrderedDict[str, None]"] = {}
+
+    def track(self, agent_id: str, task_id: str) -> asyncio.Future:
+        """Start waiting for a task sent to ``agent_id`` (idempotent)"""
+        future = self._futures.get(task_id)
+        if future is not None:
+            return future
+
+        future = asyncio.get_running_loop().create_future()
+        self._futures[task_id] = future
+        self._agent_of[task_id] = agent_id
+        in_flight = self._by_agent.setdefault(agent_id, OrderedDict())
+        in_flight[task_id] = None
+        while len(in_flight) > self.max_per_agent:
+            # Never answered; anyone still waiting simply times out
+            oldest, _ = in_flight.popitem(last=False)
+            self._futures.pop(oldest, None)
+            self._agent_of.pop(oldest, None)
+        return future
+
+    def resolve(self, task_id: str, result: dict) -> bool:
+        """Hand a task's final result to whoever is waiting for it"""
+        future = self.discard(task_id)
+        if future is None:
+            return False
+        if not future.done():
+            future.set_result(result)
+        return True
+
+    def discard(self, task_id: str) -> Optional[asyncio.Future]:
+        """Stop tracking a task (e.g. it could not be dispatched after all)"""
+        future = self._futures.pop(task_id, None)
+        if future is None:
+            return None
+        agent_id = self._agent_of.pop(task_id)
+        in_flight = self._by_agent[agent_id]
+        del in_flight[task_id]
+        if not in_flight:
+            del self._by_agent[agent_id]
+        return future
+
+    def oldest(self, agent_id: str) -> Optional[str]:
+        """The agent's longest-outstanding task, if any"""
+        in_flight = self._by_agent.get(agent_id)
+        return next(iter(in_flight)) if in_flight else None
+
+    def get(self, task_id: str) -> Optional[asyncio.Future]:
+        return self._futures.get(task_id)
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._futures
+
+    def __len__(self) -> int:
+        return len(self._futures)
+
+
+class TaskWriter:
+    """Write-behind queue for task lifecycle rows
+
+    Dispatch, status updates and results only append to an in-memory queue;
+    a background task waits a few milliseconds for more writes to arrive and
+    commits everything queued in one transaction, so recording a task never
+    adds a synchronous commit to the dispatch path.
+    """
+
+    def __init__(
+        self,
+        db,
+        batch_delay: float = TASK_WRITE_BATCH_DELAY,
+        max_batch: int = TASK_WRITE_MAX_BATCH,
+    ):
+        self.db = db
+        self.batch_delay = batch_delay
+        self.max_batch = max_batch
+        self._queue: List[dict] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self.counters: Dict[str, int] = {"written": 0, "batches": 0, "dropped": 0}
+        self.logger = logging.getLogger(__name__)
+
+    def _enqueue(self, write: dict):
+        self._queue.append(write)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def record_dispatch(self, task_id: str, agent_id: str, command: str, status: str):
+        """Queue a new task row for a dispatched command"""
+        self._enqueue(
+            {
+                "op": "create",
+                "task_id": task_id,
+                "agent_id": agent_id,
+                "command": command,
+                "status": status,
+                "created_at": datetime.utcnow(),
+            }
+        )
+
+    def record_status(self, task_id: str, agent_id: str, payload: dict):
+        """Queue a progress update reported by an agent"""
+        self._enqueue(
+            {
+                "op": "status",
+                "task_id": task_id,
+                "agent_id": agent_id,
+                "result": payload,
+            }
+        )
+
+    def record_result(self, task_id: str, agent_id: str, payload: dict):
+        """Queue the final result reported by an agent"""
+        self._enqueue(
+            {
+                "op": "result",
+                "task_id": task_id,
+                "agent_id": agent_id,
+                "result": payload,
+            }
+        )
+
+    def record_enqueue(
+        self, task_id: str, agent_id: str, command: dict, priority: int = 0
+    ):
+        """Queue the row keeping an undelivered command across restarts"""
+        self._enqueue(
+            {
+                "op": "enqueue",
+                "task_id": task_id,
+                "agent_id": agent_id,
+                "command": command,
+                "priority": priority,
+                "queued_at": datetime.utcnow(),
+            }
+        )
+
+    def record_dequeue(self, task_id: str):
+        """Queue removal of a delivered command's row"""
+        self._enqueue({"op": "dequeue", "task_id": task_id})
+
+    def pending(self) -> int:
+        return len(self._queue)
+
+    async def flush(self) -> int:
+        """Commit everything queued so far"""
+        written = 0
+        while self._queue:
+            batch = self._queue[: self.max_batch]
+            del self._queue[: self.max_batch]
+            written += await self._write(batch)
+        return written
+
+    async def _write(self, batch: List[dict]) -> int:
+        try:
+            written = await self.db.apply_task_writes(batch)
+        except Exception as e:
+            # Don't let one bad write sink the whole group: retry one by one
+            self.logger.error(f"❌ Task batch of {len(batch)} failed, retrying: {e}")
+            written = 0
+            for write in batch:
+                try:
+                    written += await self.db.apply_task_writes([write])
+                except Exception as write_error:
+                    self.counters["dropped"] += 1
+                    self.logger.error(
+                        f"❌ Dropping {write['op']} for task {write['task_id']}: "
+                        f"{write_error}"
+                    )
+        self.counters["written"] += written
+        self.counters["batches"] += 1
+        return written
+
+    async def run(self):
+        """Background task that group-commits queued task writes"""
+        self._wakeup = asyncio.Event()
+        try:
+            while True:
+                if not self._queue:
+                    await self._wakeup.wait()
+                self._wakeup.clear()
+                # Give concurrent writers a moment to join this group
+                await asyncio.sleep(self.batch_delay)
+                try:
+                    await self.flush()
+                except Exception as e:
+                    self.logger.error(f"❌ Error writing task batch: {e}")
+        finally:
+            self._wakeup = None
+
+    def metrics(self) -> dict:
+        return {"queued": len(self._queue), **self.counters}
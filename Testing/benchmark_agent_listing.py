@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark Agent Listing - Time GET /api/agents with and without FAST_JSON
+
+Fills the in-memory registry with fake agents (nothing is written to the
+database) and times the full listing through the app:
+
+    python Testing/benchmark_agent_listing.py [--agents 10000] [--rounds 20]
+"""
+
+import argparse
+import logging
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+# Add project root and Scripts directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / "Scripts"))
+
+import main
+from fastapi.testclient import TestClient
+from shared import AgentRecord, agent_manager
+
+from routes import api
+from Scripts.json_responses import orjson
+
+
+def fill_registry(count: int):
+    now = datetime.utcnow()
+    for index in range(count):
+        agent_manager.registry.add(
+            AgentRecord(
+                agent_id=str(uuid.uuid4()),
+                hostname=f"bench-{index:05d}",
+                ip_address=f"10.0.{index // 256 % 256}.{index % 256}",
+                port=8080,
+                capabilities=["cmd", "powershell", "bash"],
+                version="1.2.3",
+                registered_at=now,
+                last_heartbeat=now,
+                customer_uuid=str(uuid.uuid4()),
+                customer_name="Benchmark Customer",
+            )
+        )
+
+
+def time_listing(client: TestClient, rounds: int, change_each_round: bool) -> list:
+    timings = []
+    for _ in range(rounds):
+        if change_each_round:
+            # Defeats the body cache, so serialization is timed every round
+            agent_manager.revision += 1
+        started = time.perf_counter()
+        response = client.get("/api/agents")
+        timings.append(time.perf_counter() - started)
+        assert response.status_code == 200
+    return timings
+
+
+def report(label: str, timings: list):
+    print(
+        f"{label:<28} median {statistics.median(timings) * 1000:8.1f} ms"
+        f"   min {min(timings) * 1000:8.1f} ms"
+    )
+
+
+def main_benchmark(agents: int, rounds: int):
+    logging.disable(logging.INFO)
+    fill_registry(agents)
+    client = TestClient(main.app)
+    print(f"⏱️ GET /api/agents with {len(agent_manager.registry)} agents")
+
+    api.FAST_JSON = False
+    before = time_listing(client, rounds, change_each_round=True)
+    body = client.get("/api/agents").json()
+    report("stdlib (jsonable_encoder)", before)
+
+    if orjson is None:
+        print("⏭️ orjson not installed, FAST_JSON unavailable")
+        return
+    api.FAST_JSON = True
+    fast = time_listing(client, rounds, change_each_round=True)
+    report("FAST_JSON, changed fleet", fast)
+    cached = time_listing(client, rounds, change_each_round=False)
+    report("FAST_JSON, unchanged fleet", cached)
+
+    fast_body = client.get("/api/agents").json()
+    assert fast_body["agents"] == body["agents"], "fast path changed the body"
+    print(
+        f"📈 {statistics.median(before) / statistics.median(fast):.1f}x uncached, "
+        f"{statistics.median(before) / statistics.median(cached):.1f}x cached"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--agents", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    main_benchmark(args.agents, args.rounds)
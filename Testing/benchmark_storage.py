@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark Storage - Compare write throughput across storage profiles
+
+Each profile gets a fresh database. Writer threads create and complete tasks
+(two writes per task, like the task writer without batching) while a reader
+thread lists the agent's tasks:
+
+    python Testing/benchmark_storage.py [--seconds 5] [--writers 4]
+    python Testing/benchmark_storage.py --url postgresql://user:pw@host/bench
+"""
+
+import argparse
+import logging
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from Scripts.database import (
+    DB_EXECUTOR_WORKERS,
+    DatabaseManager,
+    SQLiteBackend,
+    StorageBackend,
+    TunedSQLiteBackend,
+)
+
+
+def run_profile(backend: StorageBackend, seconds: float, writers: int) -> dict:
+    db = DatabaseManager(backend)
+    agent_id = f"bench-{uuid.uuid4()}"
+    deadline = time.monotonic() + seconds
+    counts = {"writes": 0, "reads": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def write():
+        done = errors = 0
+        while time.monotonic() < deadline:
+            task_id = str(uuid.uuid4())
+            try:
+                db.create_task(
+                    {
+                        "id": task_id,
+                        "agent_id": agent_id,
+                        "task_id": task_id,
+                        "command": "hostname",
+                        "status": "pending",
+                    }
+                )
+                db.update_task(
+                    task_id,
+                    {
+                        "status": "completed",
+                        "completed_at": datetime.utcnow(),
+                        "output": "bench-host",
+                        "exit_code": 0,
+                    },
+                )
+                done += 2
+            except Exception:
+                # "database is locked" and friends
+                errors += 1
+        with lock:
+            counts["writes"] += done
+            counts["errors"] += errors
+
+    def read():
+        done = 0
+        while time.monotonic() < deadline:
+            db.get_task(str(uuid.uuid4()))
+            done += 1
+        with lock:
+            counts["reads"] += done
+
+    threads = [threading.Thread(target=write) for _ in range(writers)]
+    threads.append(threading.Thread(target=read))
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    db.close()
+    rates = {name: count / elapsed for name, count in counts.items()}
+    rates["per_commit"] = db.writer.writes / max(db.writer.groups, 1)
+    return rates
+
+
+def main(seconds: float, writers: int, url: str = None):
+    logging.disable(logging.WARNING)
+    print(f"⏱️ {writers} writer threads + 1 reader, {seconds:g}s per profile")
+    with tempfile.TemporaryDirectory() as directory:
+        backends = [
+            SQLiteBackend(f"sqlite:///{directory}/default.db"),
+            TunedSQLiteBackend(f"sqlite:///{directory}/production.db"),
+        ]
+        if url:
+            backends.append(StorageBackend(url))
+        results = {}
+        for backend in backends:
+            results[backend.name] = rates = run_profile(backend, seconds, writers)
+            print(
+                f"{backend.name:<20} {rates['writes']:9.0f} writes/s"
+                f"   {rates['reads']:9.0f} reads/s   {rates['errors']:6.1f} errors/s"
+                f"   {rates['per_commit']:5.1f} writes/commit"
+            )
+    baseline = results["sqlite"]["writes"]
+    if baseline:
+        for name, rates in results.items():
+            if name != "sqlite":
+                print(f"📈 {name}: {rates['writes'] / baseline:.1f}x writes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--writers", type=int, default=DB_EXECUTOR_WORKERS)
+    parser.add_argument("--url", help="Also benchmark this server database")
+    args = parser.parse_args()
+    main(args.seconds, args.writers, args.url)
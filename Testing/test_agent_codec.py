@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test Agent Codec - Verify WebSocket encoding negotiation and framing
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+# Add project root and Scripts directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / "Scripts"))
+
+from agent_codec import (
+    JSON_CODEC,
+    UnsupportedEncoding,
+    msgpack,
+    negotiate_codec,
+)
+from shared import ConnectionManager
+
+
+class FakeWebSocket:
+    """Minimal stand-in for a Starlette WebSocket"""
+
+    def __init__(self, query=None, subprotocols=None, incoming=None):
+        self.query_params = query or {}
+        self.scope = {"subprotocols": subprotocols or []}
+        self.incoming = list(incoming or [])
+        self.text = []
+        self.binary = []
+
+    async def receive_text(self) -> str:
+        return self.incoming.pop(0)
+
+    async def receive_bytes(self) -> bytes:
+        return self.incoming.pop(0)
+
+    async def send_text(self, data: str):
+        self.text.append(data)
+
+    async def send_bytes(self, data: bytes):
+        self.binary.append(data)
+
+
+def test_json_is_the_default():
+    """Agents that ask for nothing (or something unknown) get JSON"""
+    assert negotiate_codec(FakeWebSocket()) == (JSON_CODEC, None)
+    websocket = FakeWebSocket(subprotocols=["cbor"])
+    assert negotiate_codec(websocket) == (JSON_CODEC, None)
+
+    try:
+        negotiate_codec(FakeWebSocket(query={"encoding": "cbor"}))
+        assert False, "an explicit unknown encoding should be rejected"
+    except UnsupportedEncoding:
+        pass
+    print("✅ JSON is the default encoding")
+
+
+def test_commands_use_the_connection_codec():
+    """Commands go out as JSON text frames on default connections"""
+
+    async def run():
+        manager = ConnectionManager()
+        websocket = FakeWebSocket()
+        await manager.connect(websocket, "agent-1")
+        assert await manager._send_local("agent-1", {"task_id": "task-1"})
+        assert json.loads(websocket.text[0]) == {"task_id": "task-1"}
+        assert websocket.binary == []
+
+    asyncio.run(run())
+    print("✅ Commands use the connection's codec")
+
+
+def test_msgpack_round_trip():
+    """MessagePack agents get binary frames and may send output as bytes"""
+    if msgpack is None:
+        print("⏭️ msgpack not installed, skipping")
+        return
+
+    async def run():
+        codec, subprotocol = negotiate_codec(FakeWebSocket(subprotocols=["msgpack"]))
+        assert (codec.name, subprotocol) == ("msgpack", "msgpack")
+        codec, subprotocol = negotiate_codec(
+            FakeWebSocket(query={"encoding": "msgpack"})
+        )
+        assert (codec.name, subprotocol) == ("msgpack", None)
+
+        frame = msgpack.packb(
+            {
+                "type": "task_result",
+                "data": {"task_id": "task-1", "output": b"caf\xc3\xa9\xff"},
+            },
+            use_bin_type=True,
+        )
+        message = await codec.receive(FakeWebSocket(incoming=[frame]))
+        assert message["data"]["output"] == "café�"
+
+        manager = ConnectionManager()
+        websocket = FakeWebSocket()
+        await manager.connect(websocket, "agent-1", codec)
+        assert await manager._send_local("agent-1", {"task_id": "task-1"})
+        assert msgpack.unpackb(websocket.binary[0]) == {"task_id": "task-1"}
+        assert websocket.text == []
+
+    asyncio.run(run())
+    print("✅ MessagePack frames round-trip")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Agent Codec")
+    print("=" * 50)
+    test_json_is_the_default()
+    test_commands_use_the_connection_codec()
+    test_msgpack_round_trip()
+    print("=" * 50)
+    print("🎉 All agent codec tests passed!")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test Agent Customer Join - Verify joined customer names match per-agent lookups
+"""
+
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from Scripts.database import DatabaseManager, TunedSQLiteBackend
+
+
+def register(db: DatabaseManager, agent_id: str, customer_uuid: str = None):
+    db.register_agent(
+        {
+            "id": str(uuid.uuid4()),
+            "agent_id": agent_id,
+            "hostname": agent_id,
+            "ip_address": "10.0.0.1",
+            "port": 8080,
+            "capabilities": ["shell"],
+            "version": "1.0",
+            "customer_uuid": customer_uuid,
+        }
+    )
+
+
+def looked_up_name(db: DatabaseManager, agent: dict):
+    """How the customer name was found before the join: one query per agent"""
+    if not agent.get("customer_uuid"):
+        return None
+    customer = db.get_customer(agent["customer_uuid"])
+    return customer["name"] if customer else None
+
+
+def test_join_matches_per_agent_lookup():
+    """Agents with, without and with a missing customer all agree"""
+    with tempfile.TemporaryDirectory() as directory:
+        db = DatabaseManager(TunedSQLiteBackend(f"sqlite:///{directory}/test.db"))
+        acme, globex = str(uuid.uuid4()), str(uuid.uuid4())
+        for customer_uuid, name in ((acme, "Acme"), (globex, "Globex")):
+            db.create_customer(
+                {"id": str(uuid.uuid4()), "uuid": customer_uuid, "name": name}
+            )
+        register(db, "agent-acme-1", acme)
+        register(db, "agent-acme-2", acme)
+        register(db, "agent-globex", globex)
+        register(db, "agent-none")
+        register(db, "agent-orphan", str(uuid.uuid4()))
+
+        agents = {agent["agent_id"]: agent for agent in db.get_all_agents()}
+        assert len(agents) == 5
+        for agent_id, agent in agents.items():
+            assert agent["customer_name"] == looked_up_name(db, agent), agent_id
+            assert db.get_agent(agent_id) == agent
+        assert agents["agent-acme-2"]["customer_name"] == "Acme"
+        assert agents["agent-none"]["customer_name"] is None
+        assert agents["agent-orphan"]["customer_name"] is None
+
+        # Renaming the customer shows up through the join at once
+        db.update_customer(acme, {"name": "Acme Ltd"})
+        assert db.get_agent("agent-acme-1")["customer_name"] == "Acme Ltd"
+        db.close()
+    print("✅ Joined customer names match per-agent lookups")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Agent Customer Join")
+    print("=" * 50)
+    test_join_matches_per_agent_lookup()
+    print("=" * 50)
+    print("🎉 All agent customer join tests passed!")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test Agent Registry - Verify the in-memory agent indexes
+"""
+
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add project root and Scripts directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / "Scripts"))
+
+from shared import AgentManager, AgentRecord, AgentRegistry
+
+
+def make_record(agent_id: str, hostname: str, customer_uuid=None) -> AgentRecord:
+    now = datetime.utcnow()
+    return AgentRecord(
+        agent_id=agent_id,
+        hostname=hostname,
+        ip_address="10.0.0.1",
+        port=8080,
+        capabilities=["bash"],
+        version="1.0",
+        registered_at=now,
+        last_heartbeat=now,
+        customer_uuid=customer_uuid,
+        customer_name="Acme" if customer_uuid else None,
+    )
+
+
+def test_indexes_follow_add_and_remove():
+    """Lookups by id, hostname and customer stay in step"""
+    registry = AgentRegistry()
+    registry.add(make_record("agent-1", "web-1", "cust-1"))
+    registry.add(make_record("agent-2", "web-2", "cust-1"))
+
+    assert registry.get_by_hostname("web-1").agent_id == "agent-1"
+    assert {r.agent_id for r in registry.for_customer("cust-1")} == {
+        "agent-1",
+        "agent-2",
+    }
+
+    registry.remove("agent-1")
+    assert registry.get("agent-1") is None
+    assert registry.get_by_hostname("web-1") is None
+    assert [r.agent_id for r in registry.for_customer("cust-1")] == ["agent-2"]
+
+    registry.remove("agent-2")
+    assert "cust-1" not in registry.by_customer
+    assert len(registry) == 0
+    print("✅ Indexes follow add/remove")
+
+
+def test_customer_rename_reaches_agents():
+    """Renaming a customer updates its agents and bumps the revision"""
+    agents = AgentManager()
+    agents.registry.add(make_record("agent-1", "web-1", "cust-1"))
+    revision = agents.revision
+
+    agents.update_customer_name("cust-1", "Acme Corp")
+
+    assert agents.registry.get("agent-1").customer_name == "Acme Corp"
+    assert agents.changes_since(revision) == (["agent-1"], [])
+    print("✅ Customer renames reach agents")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Agent Registry")
+    print("=" * 50)
+    test_indexes_follow_add_and_remove()
+    test_customer_rename_reaches_agents()
+    print("\n🎉 All agent registry tests passed!")
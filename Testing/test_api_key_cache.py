@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test API Key Cache - Verify cached key lookups, invalidation and batched last-used writes
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from Scripts.customer_auth import ApiKeyCache, ApiKeyUsageBuffer, hash_api_key
+from Scripts.database import AsyncDatabaseManager, DatabaseManager, TunedSQLiteBackend
+
+
+def customer(customer_uuid: str = "customer-1") -> dict:
+    return {"uuid": customer_uuid, "name": "Acme", "api_key": "sk_secret"}
+
+
+def open_database(directory: str) -> DatabaseManager:
+    return DatabaseManager(TunedSQLiteBackend(f"sqlite:///{directory}/test.db"))
+
+
+def create_customer(db: DatabaseManager) -> str:
+    customer_uuid = str(uuid.uuid4())
+    db.create_customer({"id": str(uuid.uuid4()), "uuid": customer_uuid, "name": "Acme"})
+    return customer_uuid
+
+
+def test_cache_keeps_hashes_not_keys():
+    """Entries are keyed by the key's digest and never hold the key"""
+    cache = ApiKeyCache(ttl=0.05)
+    key_hash = hash_api_key("sk_secret")
+    assert key_hash != "sk_secret" and len(key_hash) == 64
+    cache.put(key_hash, customer(), cache.generation)
+    assert cache.get(key_hash) == {"uuid": "customer-1", "name": "Acme"}
+    assert "sk_secret" not in repr(cache._entries)
+
+    time.sleep(0.06)
+    assert cache.get(key_hash) is None and len(cache) == 0
+    print("✅ The cache keeps hashes, not keys")
+
+
+def test_invalidation_drops_a_customers_keys():
+    """A changed customer loses its cached keys; stale lookups aren't cached"""
+    cache = ApiKeyCache(max_size=2)
+    cache.put("hash-1", customer("customer-1"), cache.generation)
+    cache.put("hash-2", customer("customer-2"), cache.generation)
+
+    cache.invalidate_customer("customer-1")
+    assert cache.get("hash-1") is None
+    assert cache.get("hash-2")["uuid"] == "customer-2"
+
+    stale_generation = cache.generation
+    cache.invalidate_customer("customer-2")
+    cache.put("hash-2", customer("customer-2"), stale_generation)
+    assert cache.get("hash-2") is None
+
+    for index in range(3):
+        cache.put(f"extra-{index}", customer(), cache.generation)
+    assert len(cache) == 2 and cache.get("extra-0") is None
+    print("✅ Invalidation drops a customer's keys")
+
+
+def test_key_changes_evict_cached_customers():
+    """generate_api_key and revoke_api_key evict the customer once committed"""
+    with tempfile.TemporaryDirectory() as directory:
+        db = open_database(directory)
+        customer_uuid = create_customer(db)
+        cache = ApiKeyCache()
+        cache.attach(db)
+        cache.attach(db)
+        assert db.customer_listeners == [cache.invalidate_customer]
+
+        for change in (
+            lambda: db.generate_api_key(customer_uuid),
+            lambda: db.update_customer(customer_uuid, {"name": "Acme Ltd"}),
+            lambda: db.revoke_api_key(customer_uuid),
+        ):
+            cache.put("hash", {"uuid": customer_uuid}, cache.generation)
+            assert change()
+            assert cache.get("hash") is None
+        db.close()
+    print("✅ Key changes evict cached customers")
+
+
+def test_uses_are_written_in_one_batch():
+    """Buffered uses reach the database in one write, skipping revoked keys"""
+
+    async def run(db: DatabaseManager, usage: ApiKeyUsageBuffer):
+        first, second, revoked = (create_customer(db) for _ in range(3))
+        for customer_uuid in (first, second, revoked):
+            api_key = db.generate_api_key(customer_uuid)
+        assert db.find_customer_by_api_key(api_key)["uuid"] == revoked
+
+        for customer_uuid in (first, second, first):
+            usage.record(customer_uuid)
+        writes = db.writer.writes
+        assert await usage.flush() == 2
+        assert db.writer.writes == writes + 1
+        assert db.get_customer(first)["api_key_last_used"] is not None
+        assert await usage.flush() == 0
+
+        # A use buffered before its key is revoked is never written
+        usage.record(revoked)
+        db.revoke_api_key(revoked)
+        assert usage.pending == {}
+        db.update_api_key_usage({revoked: datetime.utcnow()})
+        assert db.get_customer(revoked)["api_key_last_used"] is None
+        assert db.find_customer_by_api_key(api_key) is None
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = open_database(directory)
+        usage = ApiKeyUsageBuffer(AsyncDatabaseManager(db))
+        usage.attach(db)
+        asyncio.run(run(db, usage))
+        db.close()
+    print("✅ Uses are written in one batch")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing API Key Cache")
+    print("=" * 50)
+    test_cache_keeps_hashes_not_keys()
+    test_invalidation_drops_a_customers_keys()
+    test_key_changes_evict_cached_customers()
+    test_uses_are_written_in_one_batch()
+    print("=" * 50)
+    print("🎉 All API key cache tests passed!")
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test Async Database - Verify reads run on the pool and writes on the writer thread
+"""
+
+import asyncio
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from Scripts.database import (
+    AsyncDatabaseManager,
+    DatabaseManager,
+    TunedSQLiteBackend,
+    writes,
+)
+
+
+class ProbeDatabase(DatabaseManager):
+    """Reports which thread each kind of call runs on"""
+
+    def read_probe(self) -> str:
+        return threading.current_thread().name
+
+    @writes
+    def write_probe(self, release: threading.Event = None) -> str:
+        if release is not None:
+            release.wait(5)
+        return threading.current_thread().name
+
+
+def open_database(directory: str) -> ProbeDatabase:
+    return ProbeDatabase(TunedSQLiteBackend(f"sqlite:///{directory}/test.db"))
+
+
+def test_reads_and_writes_are_routed():
+    """Reads use the db pool, @writes methods the writer, neither the loop"""
+
+    async def run(async_db: AsyncDatabaseManager):
+        loop_thread = threading.current_thread().name
+        read_thread = await async_db.read_probe()
+        write_thread = await async_db.write_probe()
+        assert read_thread.startswith("db_") and read_thread != loop_thread
+        assert write_thread == "db-writer"
+        assert async_db.write_probe.__name__ == "write_probe"
+        # Plain attributes are passed through unchanged
+        assert async_db.backend is async_db.db.backend
+        assert await async_db.run(lambda: 42) == 42
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = open_database(directory)
+        asyncio.run(run(AsyncDatabaseManager(db)))
+        db.close()
+    print("✅ Reads and writes are routed to their threads")
+
+
+def test_calls_do_not_block_the_loop():
+    """The event loop keeps running while a call waits on the database"""
+
+    async def run(async_db: AsyncDatabaseManager):
+        release = threading.Event()
+        write = asyncio.ensure_future(async_db.write_probe(release))
+        ticks = 0
+        while ticks < 5:
+            await asyncio.sleep(0.01)
+            ticks += 1
+        assert not write.done()
+        release.set()
+        assert await write == "db-writer"
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = open_database(directory)
+        asyncio.run(run(AsyncDatabaseManager(db)))
+        db.close()
+    print("✅ Database calls don't block the event loop")
+
+
+def test_cancelled_write_still_runs():
+    """Cancelling the awaiting caller doesn't drop a queued write"""
+
+    async def run(async_db: AsyncDatabaseManager, db: ProbeDatabase):
+        release = threading.Event()
+        write = asyncio.ensure_future(async_db.write_probe(release))
+        await asyncio.sleep(0.01)
+        write.cancel()
+        await asyncio.gather(write, return_exceptions=True)
+        writes = db.writer.writes
+        release.set()
+        await async_db.flush_writes()
+        assert db.writer.writes >= writes + 1
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = open_database(directory)
+        asyncio.run(run(AsyncDatabaseManager(db), db))
+        db.close()
+    print("✅ A cancelled write still runs")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Async Database")
+    print("=" * 50)
+    test_reads_and_writes_are_routed()
+    test_calls_do_not_block_the_loop()
+    test_cancelled_write_still_runs()
+    print("=" * 50)
+    print("🎉 All async database tests passed!")
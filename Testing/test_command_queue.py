@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Test Command Queue - Verify leases, priorities, limits and long polls
+"""
+
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add project root and Scripts directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / "Scripts"))
+
+from command_queue import CommandQueue, CommandQueueFull
+from shared import ConnectionManager
+
+
+def command(task_id: str) -> dict:
+    return {"type": "command", "task_id": task_id, "command": "hostname"}
+
+
+def test_lease_hides_command_until_it_expires():
+    """A polled command is not returned again until its lease runs out"""
+    queue = CommandQueue(lease_timeout=30)
+    queue.put("agent-1", "task-1", command("task-1"))
+    queue.put("agent-1", "task-2", command("task-2"))
+
+    now = time.monotonic()
+    first = queue.lease("agent-1", now)
+    assert [c["task_id"] for c in first] == ["task-1", "task-2"]
+    assert all(c["delivery"] == 1 for c in first)
+    assert queue.lease("agent-1", now + 1) == []
+
+    # Not acknowledged in time: delivered again
+    queue.ack("agent-1", "task-1")
+    again = queue.lease("agent-1", now + 31)
+    assert [(c["task_id"], c["delivery"]) for c in again] == [("task-2", 2)]
+    print("✅ Leases hide commands until they expire")
+
+
+def test_ack_removes_command():
+    """Acknowledged commands are gone; acknowledging twice fails"""
+    queue = CommandQueue()
+    queue.put("agent-1", "task-1", command("task-1"))
+    assert queue.ack("agent-1", "task-1")
+    assert not queue.ack("agent-1", "task-1")
+    assert queue.pending("agent-1") == []
+    assert len(queue) == 0
+    print("✅ Acknowledgements remove commands")
+
+
+def test_long_poll_wakes_on_new_command():
+    """A waiting poll returns as soon as a command is queued"""
+
+    async def run():
+        queue = CommandQueue()
+        poll = asyncio.create_task(queue.wait("agent-1", timeout=10))
+        await asyncio.sleep(0.05)
+        assert not poll.done()
+
+        started = time.monotonic()
+        queue.put("agent-1", "task-1", command("task-1"))
+        commands = await asyncio.wait_for(poll, 1)
+        assert [c["task_id"] for c in commands] == ["task-1"]
+        assert time.monotonic() - started < 0.5
+        # Nobody is waiting any more
+        assert not queue._events
+
+    asyncio.run(run())
+    print("✅ Long polls wake on new commands")
+
+
+def test_long_poll_times_out_or_picks_up_expired_lease():
+    """An idle poll returns empty; an expiring lease ends the wait early"""
+
+    async def run():
+        queue = CommandQueue(lease_timeout=0.2)
+        assert await queue.wait("agent-1", timeout=0.1) == []
+
+        queue.put("agent-1", "task-1", command("task-1"))
+        assert len(queue.lease("agent-1")) == 1
+        commands = await asyncio.wait_for(queue.wait("agent-1", timeout=5), 1)
+        assert [(c["task_id"], c["delivery"]) for c in commands] == [("task-1", 2)]
+
+    asyncio.run(run())
+    print("✅ Long polls time out or pick up expired leases")
+
+
+def test_priority_order_and_limit():
+    """Higher priorities go first; a full queue rejects new commands"""
+    queue = CommandQueue(max_per_agent=3)
+    queue.put("agent-1", "low", command("low"))
+    queue.put("agent-1", "high", command("high"), priority=5)
+    queue.put("agent-1", "low-2", command("low-2"))
+    assert [c["task_id"] for c in queue.lease("agent-1")] == ["high", "low", "low-2"]
+
+    try:
+        queue.put("agent-1", "extra", command("extra"))
+        assert False, "a full queue should reject commands"
+    except CommandQueueFull:
+        pass
+    # Other agents have their own limit
+    queue.put("agent-2", "other", command("other"))
+
+    # A rejected command leaves no empty queue behind
+    closed = CommandQueue(max_per_agent=0)
+    try:
+        closed.put("agent-3", "rejected", command("rejected"))
+        assert False, "a zero limit should reject commands"
+    except CommandQueueFull:
+        pass
+    assert "agent-3" not in closed._queues
+    print("✅ Priorities order delivery and the limit is enforced")
+
+
+class FakeWebSocket:
+    """Minimal stand-in for a Starlette WebSocket"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, data: str):
+        self.sent.append(data)
+
+
+def test_queue_drains_when_websocket_connects():
+    """Queued commands go out over the socket and their rows are dropped"""
+
+    async def run():
+        manager = ConnectionManager()
+        manager.store_pending_command("agent-1", "task-1", command("task-1"))
+        manager.store_pending_command("agent-1", "task-2", command("task-2"), 9)
+
+        websocket = FakeWebSocket()
+        await manager.connect(websocket, "agent-1")
+        assert await manager.drain_pending_commands("agent-1") == 2
+        assert [json.loads(sent)["task_id"] for sent in websocket.sent] == [
+            "task-2",
+            "task-1",
+        ]
+        assert manager.get_pending_commands("agent-1") == []
+        ops = [write["op"] for write in manager.task_writer._queue]
+        assert ops.count("enqueue") == 2 and ops.count("dequeue") == 2
+
+    asyncio.run(run())
+    print("✅ Queued commands drain onto the WebSocket")
+
+
+def test_result_acknowledges_command_once():
+    """A result removes its queued command with a single ack and row delete"""
+
+    async def run():
+        manager = ConnectionManager()
+        manager.store_pending_command("agent-1", "task-1", command("task-1"))
+        acks = []
+        ack = manager.pending_commands.ack
+        manager.pending_commands.ack = lambda *args: acks.append(args) or ack(*args)
+
+        manager.store_task_result(
+            "task-1", {"task_id": "task-1", "output": "host"}, "agent-1"
+        )
+        assert acks == [("agent-1", "task-1")]
+        assert manager.get_pending_commands("agent-1") == []
+        ops = [write["op"] for write in manager.task_writer._queue]
+        assert ops == ["enqueue", "dequeue", "result"]
+
+    asyncio.run(run())
+    print("✅ A result acknowledges its command once")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Command Queue")
+    print("=" * 50)
+    test_lease_hides_command_until_it_expires()
+    test_ack_removes_command()
+    test_long_poll_wakes_on_new_command()
+    test_long_poll_times_out_or_picks_up_expired_lease()
+    test_priority_order_and_limit()
+    test_queue_drains_when_websocket_connects()
+    test_result_acknowledges_command_once()
+    print("=" * 50)
+    print("🎉 All command queue tests passed!")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Test Connection Manager - Verify the agent -> socket index used for dispatch
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add project root and Scripts directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / "Scripts"))
+
+from shared import ConnectionManager
+
+
+class FakeWebSocket:
+    """Minimal stand-in for a Starlette WebSocket"""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.sent = []
+
+    async def send_text(self, data: str):
+        if self.fail:
+            raise RuntimeError("socket closed")
+        self.sent.append(data)
+
+
+def test_connect_and_disconnect_maintain_index():
+    """Presence lookups follow connect/disconnect"""
+
+    async def run():
+        manager = ConnectionManager()
+        first = await manager.connect(FakeWebSocket(), "agent-1")
+        second = await manager.connect(FakeWebSocket(), "agent-1")
+
+        assert manager.is_agent_connected("agent-1")
+        assert manager.agent_connections["agent-1"] == {first, second}
+
+        manager.disconnect(first)
+        assert manager.is_agent_connected("agent-1")
+        manager.disconnect(second)
+        assert not manager.is_agent_connected("agent-1")
+        assert "agent-1" not in manager.preferred_connections
+
+        # Disconnecting twice is harmless
+        manager.disconnect(second)
+
+    asyncio.run(run())
+    print("✅ Index follows connect/disconnect")
+
+
+def test_dispatch_prefers_newest_socket():
+    """Commands go to the most recently connected socket"""
+
+    async def run():
+        manager = ConnectionManager()
+        old_socket = FakeWebSocket()
+        new_socket = FakeWebSocket()
+        await manager.connect(old_socket, "agent-1")
+        new_id = await manager.connect(new_socket, "agent-1")
+
+        assert await manager.send_command_to_agent("agent-1", {"type": "command"})
+        assert len(new_socket.sent) == 1
+        assert not old_socket.sent
+
+        # Once the newest socket goes away, the older one takes over
+        manager.disconnect(new_id)
+        assert await manager.send_command_to_agent("agent-1", {"type": "command"})
+        assert len(old_socket.sent) == 1
+
+    asyncio.run(run())
+    print("✅ Dispatch prefers the newest socket")
+
+
+def test_dispatch_skips_dead_socket():
+    """A failing socket is dropped and the next one is tried"""
+
+    async def run():
+        manager = ConnectionManager()
+        healthy = FakeWebSocket()
+        await manager.connect(healthy, "agent-1")
+        await manager.connect(FakeWebSocket(fail=True), "agent-1")
+
+        assert await manager.send_command_to_agent("agent-1", {"type": "command"})
+        assert len(healthy.sent) == 1
+        assert len(manager.agent_connections["agent-1"]) == 1
+
+        assert not await manager.send_command_to_agent("agent-2", {"type": "command"})
+
+    asyncio.run(run())
+    print("✅ Dead sockets are skipped")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Connection Manager")
+    print("=" * 50)
+    test_connect_and_disconnect_maintain_index()
+    test_dispatch_prefers_newest_socket()
+    test_dispatch_skips_dead_socket()
+    print("\n🎉 All connection manager tests passed!")
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test Database Writer - Verify group commit, failure isolation and read-only readers
+"""
+
+import asyncio
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from Scripts.database import (
+    AsyncDatabaseManager,
+    DatabaseManager,
+    Task,
+    TunedSQLiteBackend,
+)
+
+
+def task(task_id: str) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "agent_id": "agent-1",
+        "task_id": task_id,
+        "command": "hostname",
+        "status": "pending",
+    }
+
+
+def open_database(directory: str) -> DatabaseManager:
+    return DatabaseManager(TunedSQLiteBackend(f"sqlite:///{directory}/test.db"))
+
+
+def test_writes_are_committed_in_groups():
+    """Writes queued together share one commit and all land"""
+    with tempfile.TemporaryDirectory() as directory:
+        db = open_database(directory)
+        db.writer.max_delay = 0.2
+        futures = [
+            db.writer.submit(db.create_task.__wrapped__, db, task(f"task-{index}"))
+            for index in range(10)
+        ]
+        assert [future.result(5) for future in futures] == [
+            f"task-{index}" for index in range(10)
+        ]
+        assert db.writer.writes == 10 and db.writer.groups == 1
+        assert db.get_task("task-9")["status"] == "pending"
+        db.close()
+    print("✅ Writes are committed in groups")
+
+
+def test_failed_write_leaves_its_group_alone():
+    """A write that fails is rolled back on its own"""
+    with tempfile.TemporaryDirectory() as directory:
+        db = open_database(directory)
+        db.create_task(task("task-1"))
+
+        db.writer.max_delay = 0.2
+        duplicate = db.writer.submit(db.create_task.__wrapped__, db, task("task-1"))
+        other = db.writer.submit(db.create_task.__wrapped__, db, task("task-2"))
+        try:
+            duplicate.result(5)
+            assert False, "a duplicate task_id should fail"
+        except IntegrityError:
+            pass
+        assert other.result(5) == "task-2"
+        assert db.get_task("task-2") is not None
+        db.close()
+    print("✅ A failed write leaves its group alone")
+
+
+def test_readers_are_read_only():
+    """Sessions outside the writer thread can't write"""
+    with tempfile.TemporaryDirectory() as directory:
+        db = open_database(directory)
+        session = db.get_session()
+        try:
+            session.add(Task(**task("task-1")))
+            session.commit()
+            assert False, "a reader session should not be able to write"
+        except OperationalError:
+            session.rollback()
+        finally:
+            session.close()
+        db.close()
+    print("✅ Readers are read-only")
+
+
+def test_async_writes_go_to_the_writer():
+    """Awaited writes run on the writer thread and resolve with its result"""
+
+    async def run(db: DatabaseManager):
+        async_db = AsyncDatabaseManager(db)
+        assert await async_db.create_task(task("task-1")) == "task-1"
+        assert await async_db.update_task("task-1", {"status": "completed"}) is None
+        assert (await async_db.get_task("task-1"))["status"] == "completed"
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = open_database(directory)
+        asyncio.run(run(db))
+        assert db.writer.writes == 2
+        db.close()
+    print("✅ Awaited writes go to the writer")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Database Writer")
+    print("=" * 50)
+    test_writes_are_committed_in_groups()
+    test_failed_write_leaves_its_group_alone()
+    test_readers_are_read_only()
+    test_async_writes_go_to_the_writer()
+    print("=" * 50)
+    print("🎉 All database writer tests passed!")
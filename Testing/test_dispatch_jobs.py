@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Test Dispatch Jobs - Verify bulk dispatch job progress tracking
+"""
+
+import asyncio
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add project root and Scripts directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / "Scripts"))
+
+import shared
+from shared import AgentManager, AgentRecord, BulkCommandRequest, ConnectionManager
+
+from Scripts.command_queue import CommandQueue
+from Scripts.dispatch_jobs import JobRegistry
+
+
+def test_task_updates_advance_job_progress():
+    """Statuses reported for a job's tasks show up in its progress"""
+    registry = JobRegistry()
+    job = registry.create("echo hi", {"capability": "patch"})
+    registry.add_task(job, "agent-1", "t1", "accepted")
+    registry.add_task(job, "agent-2", "t2", "pending")
+    registry.skip(job, "agent-3", "offline")
+
+    registry.update_task("t1", "completed")
+    registry.update_task("unrelated", "completed")
+
+    progress = job.progress()
+    assert progress["total"] == 2
+    assert progress["finished"] == 1
+    assert progress["skipped"] == 1
+    assert progress["by_status"] == {"completed": 1, "pending": 1}
+    assert not progress["done"]
+
+    registry.update_task("t2", "failed")
+    assert job.progress()["done"]
+    print("✅ Task updates advance job progress")
+
+
+def test_registry_forgets_oldest_jobs():
+    """Jobs past the cap are dropped along with their task index"""
+    registry = JobRegistry(max_entries=1)
+    first = registry.create("echo 1", {})
+    registry.add_task(first, "agent-1", "t1", "accepted")
+    second = registry.create("echo 2", {})
+
+    assert registry.get(first.job_id) is None
+    assert registry.get(second.job_id) is second
+    registry.update_task("t1", "completed")  # no longer tracked, no error
+    assert len(registry) == 1
+    print("✅ Oldest jobs are forgotten")
+
+
+class AnsweringWebSocket:
+    """Socket whose agent reports a result before the send returns"""
+
+    def __init__(self, agent_id: str):
+        self.agent_id = agent_id
+
+    async def send_text(self, data: str):
+        task_id = json.loads(data)["task_id"]
+        shared.manager.store_task_result(
+            task_id, {"status": "completed", "output": "ok"}, self.agent_id
+        )
+        await asyncio.sleep(0)
+
+
+class SlowWebSocket:
+    """Socket that is still being written to when the others have answered"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, data: str):
+        await asyncio.sleep(0.05)
+        self.sent.append(json.loads(data))
+
+
+class BrokenWebSocket:
+    """Socket that died without the server noticing yet"""
+
+    async def send_text(self, data: str):
+        raise ConnectionResetError("connection reset by peer")
+
+
+def fleet(*agent_ids: str) -> AgentManager:
+    agents = AgentManager()
+    now = datetime.utcnow()
+    for agent_id in agent_ids:
+        agents.registry.add(
+            AgentRecord(agent_id, agent_id, "10.0.0.1", 8080, [], "1.0", now, now)
+        )
+    return agents
+
+
+def run_with_manager(connections: ConnectionManager, scenario):
+    """Run ``scenario`` with ``connections`` as the module's connection manager"""
+    previous = shared.manager
+    shared.manager = connections
+    try:
+        asyncio.run(scenario())
+    finally:
+        shared.manager = previous
+
+
+def test_replies_during_dispatch_count_towards_the_job():
+    """A result that arrives before the other sends finish is not lost"""
+    connections = ConnectionManager()
+    agents = fleet("agent-fast", "agent-slow")
+    request = BulkCommandRequest(command="hostname")
+
+    async def run():
+        slow = SlowWebSocket()
+        await connections.connect(AnsweringWebSocket("agent-fast"), "agent-fast")
+        await connections.connect(slow, "agent-slow")
+        job = await agents.dispatch_bulk(request, request)
+        progress = job["progress"]
+        assert progress["by_status"] == {"completed": 1, "accepted": 1}
+        assert not progress["done"]
+
+        connections.store_task_result(
+            slow.sent[0]["task_id"], {"status": "completed"}, "agent-slow"
+        )
+        progress = connections.jobs.get(job["job_id"]).progress()
+        assert progress["finished"] == 2 and progress["done"]
+        creates = [w for w in connections.task_writer._queue if w["op"] == "create"]
+        assert [w["status"] for w in creates] == ["accepted", "accepted"]
+
+    run_with_manager(connections, run)
+    print("✅ Replies during dispatch count towards the job")
+
+
+def test_failed_sends_fall_back_to_the_queue():
+    """A send on a dead socket queues the command, or skips it when full"""
+    connections = ConnectionManager()
+    agents = fleet("agent-1")
+    request = BulkCommandRequest(command="hostname")
+
+    async def run():
+        await connections.connect(BrokenWebSocket(), "agent-1")
+        job = await agents.dispatch_bulk(request, request)
+        assert job["progress"]["by_status"] == {"pending": 1}
+        task_id = job["tasks"][0]["task_id"]
+        queued = connections.get_pending_commands("agent-1")
+        assert [command["task_id"] for command in queued] == [task_id]
+        ops = [
+            (w["op"], w.get("status") or w.get("result", {}).get("status"))
+            for w in connections.task_writer._queue
+            if w["task_id"] == task_id
+        ]
+        assert ops == [("create", "accepted"), ("enqueue", None), ("status", "pending")]
+
+        connections.pending_commands = CommandQueue(max_per_agent=0)
+        await connections.connect(BrokenWebSocket(), "agent-1")
+        job = await agents.dispatch_bulk(request, request)
+        assert job["tasks"] == []
+        assert job["skipped"] == [{"agent_id": "agent-1", "reason": "queue_full"}]
+        assert connections.task_writer._queue[-1]["result"]["status"] == "failed"
+        assert len(connections.task_futures) == 1
+
+    run_with_manager(connections, run)
+    print("✅ Failed sends fall back to the queue")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Dispatch Jobs")
+    print("=" * 50)
+    test_task_updates_advance_job_progress()
+    test_registry_forgets_oldest_jobs()
+    test_replies_during_dispatch_count_towards_the_job()
+    test_failed_sends_fall_back_to_the_queue()
+    print("\n🎉 All dispatch job tests passed!")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test Fleet Revision - Verify the agent change log behind delta listings
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add project root and Scripts directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / "Scripts"))
+
+from shared import AgentManager, ConnectionManager
+
+from Scripts.message_bus import MessageBus
+
+
+def test_changes_since_reports_changed_and_removed_agents():
+    """Only agents touched after the given revision are reported"""
+    agents = AgentManager()
+    start = agents.revision
+
+    agents.mark_changed("agent-1")
+    checkpoint = agents.revision
+    agents.mark_changed("agent-2")
+    agents.mark_changed("agent-1", removed=True)
+
+    assert agents.changes_since(start) == (["agent-2"], ["agent-1"])
+    assert agents.changes_since(checkpoint) == (["agent-2"], ["agent-1"])
+    assert agents.changes_since(agents.revision) == ([], [])
+    assert agents.etag() == f'W/"{agents.revision_token()}"'
+    print("✅ Changes since a revision are reported")
+
+
+def test_unknown_revisions_need_full_listing():
+    """Revisions from before this process or from the future are rejected"""
+    agents = AgentManager()
+    assert agents.changes_since(agents.base_revision - 1) is None
+    assert agents.changes_since(agents.revision + 1) is None
+    print("✅ Unknown revisions fall back to a full listing")
+
+
+def test_old_removals_are_forgotten():
+    """Removals past the retention window are pruned and need a full listing"""
+    agents = AgentManager()
+    start = agents.revision
+    for index in range(3):
+        agents.mark_changed(f"agent-{index}", removed=True)
+    removed_at = agents.revision
+    agents.mark_changed("agent-0")
+    assert len(agents._removed_revisions) == 2
+
+    agents._prune_removed(now=time.monotonic() + agents.removed_retention + 1)
+    assert agents._removed_revisions == {}
+    assert agents.base_revision == removed_at
+    assert agents.changes_since(start) is None
+    assert agents.changes_since(removed_at) == (["agent-0"], [])
+    print("✅ Old removals are forgotten")
+
+
+def test_revision_tokens_are_scoped_to_their_worker():
+    """A since= token from another worker gets a full listing, not a delta"""
+
+    async def run():
+        worker_a, worker_b = AgentManager(), AgentManager()
+        worker_a.bus = MessageBus(worker_id="worker-a")
+        worker_b.bus = MessageBus(worker_id="worker-b")
+        # Both happen to be at the same number for unrelated changes
+        worker_b.revision = worker_a.revision
+        token = worker_a.revision_token()
+        worker_b.mark_changed("agent-1")
+
+        assert worker_a.etag() == f'W/"{token}"' != worker_b.etag()
+        assert await worker_b.get_agents_since(token) is None
+        assert await worker_b.get_agents_since("worker-b:junk") is None
+        delta = await worker_a.get_agents_since(token)
+        assert delta["revision"] == token and delta["removed"] == []
+
+    asyncio.run(run())
+    print("✅ Revision tokens are scoped to their worker")
+
+
+def test_presence_changes_bump_revision():
+    """First socket opening and last socket closing count as changes"""
+
+    async def run():
+        connections = ConnectionManager()
+        agents = AgentManager()
+        connections.on_presence_change = agents.mark_changed
+        start = agents.revision
+
+        first = await connections.connect(object(), "agent-1")
+        second = await connections.connect(object(), "agent-1")
+        assert agents.revision == start + 1
+
+        connections.disconnect(first)
+        assert agents.revision == start + 1
+        connections.disconnect(second)
+        assert agents.revision == start + 2
+
+    asyncio.run(run())
+    print("✅ Connect/disconnect bump the revision")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Fleet Revision")
+    print("=" * 50)
+    test_changes_since_reports_changed_and_removed_agents()
+    test_unknown_revisions_need_full_listing()
+    test_old_removals_are_forgotten()
+    test_revision_tokens_are_scoped_to_their_worker()
+    test_presence_changes_bump_revision()
+    print("\n🎉 All fleet revision tests passed!")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test Heartbeat Buffer - Verify heartbeats are coalesced and flushed in one batch
+"""
+
+import asyncio
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+# Add project root and Scripts directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / "Scripts"))
+
+from shared import HeartbeatBuffer
+
+from Scripts.database import AsyncDatabaseManager, DatabaseManager, TunedSQLiteBackend
+
+
+def register(db: DatabaseManager, agent_id: str):
+    db.register_agent(
+        {
+            "id": str(uuid.uuid4()),
+            "agent_id": agent_id,
+            "hostname": agent_id,
+            "ip_address": "10.0.0.1",
+            "port": 8080,
+            "capabilities": [],
+            "version": "1.0",
+        }
+    )
+
+
+class FailingDatabase:
+    """Stand-in whose batch write fails once"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def update_heartbeats(self, rows):
+        self.calls += 1
+        if self.calls == 1:
+            raise RuntimeError("database is locked")
+        return len(rows)
+
+
+def test_heartbeats_are_coalesced_and_flushed_together():
+    """Repeated heartbeats keep only the latest; a flush is one write"""
+
+    async def run(db: DatabaseManager):
+        flushed = []
+        buffer = HeartbeatBuffer(AsyncDatabaseManager(db), on_flush=flushed.extend)
+        for agent_id in ("agent-1", "agent-2"):
+            register(db, agent_id)
+        db.mark_agents_offline(["agent-1", "agent-2"])
+
+        for _ in range(5):
+            buffer.record("agent-1")
+        buffer.record("agent-2", "busy")
+        assert len(buffer.pending) == 2
+
+        writes = db.writer.writes
+        assert await buffer.flush() == 2
+        assert db.writer.writes == writes + 1
+        assert buffer.pending == {} and await buffer.flush() == 0
+        assert sorted(row["agent_id"] for row in flushed) == ["agent-1", "agent-2"]
+        assert db.get_agent("agent-1")["status"] == "online"
+        assert db.get_agent("agent-2")["status"] == "busy"
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = DatabaseManager(TunedSQLiteBackend(f"sqlite:///{directory}/test.db"))
+        asyncio.run(run(db))
+        db.close()
+    print("✅ Heartbeats are coalesced and flushed together")
+
+
+def test_offline_and_forgotten_agents():
+    """mark_offline overrides a buffered heartbeat; forget drops it"""
+    buffer = HeartbeatBuffer(None)
+    buffer.record("agent-1")
+    buffer.record("agent-2")
+    buffer.mark_offline("agent-1")
+    buffer.mark_offline("agent-3")
+    buffer.forget("agent-2")
+    assert list(buffer.pending) == ["agent-1"]
+    assert buffer.pending["agent-1"]["status"] == "offline"
+    print("✅ Offline and forgotten agents are handled")
+
+
+def test_failed_flush_keeps_newer_heartbeats():
+    """A failed batch goes back into the buffer without replacing newer ones"""
+
+    async def run():
+        buffer = HeartbeatBuffer(FailingDatabase())
+        buffer.record("agent-1")
+        buffer.record("agent-2")
+        try:
+            await buffer.flush()
+            assert False, "the first flush should fail"
+        except RuntimeError:
+            pass
+        assert set(buffer.pending) == {"agent-1", "agent-2"}
+
+        buffer.record("agent-1", "busy")
+        assert await buffer.flush() == 2
+        assert buffer.pending == {}
+
+    asyncio.run(run())
+    print("✅ A failed flush keeps the buffered heartbeats")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Heartbeat Buffer")
+    print("=" * 50)
+    test_heartbeats_are_coalesced_and_flushed_together()
+    test_offline_and_forgotten_agents()
+    test_failed_flush_keeps_newer_heartbeats()
+    print("=" * 50)
+    print("🎉 All heartbeat buffer tests passed!")
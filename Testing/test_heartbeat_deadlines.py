@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test Heartbeat Deadlines - Verify deadline scheduling for offline detection
+"""
+
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add project root and Scripts directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / "Scripts"))
+
+import shared
+from shared import AgentManager, AgentRecord, ConnectionManager, HeartbeatDeadlines
+
+
+def test_only_expired_agents_are_popped():
+    """Agents come out once their deadline has passed, earliest first"""
+    deadlines = HeartbeatDeadlines(timeout=10)
+    deadlines.touch("agent-1", deadline=100)
+    deadlines.touch("agent-2", deadline=105)
+    deadlines.touch("agent-3", deadline=200)
+
+    assert deadlines.pop_expired(now=99) == []
+    assert deadlines.pop_expired(now=150) == ["agent-1", "agent-2"]
+    assert "agent-3" in deadlines and len(deadlines) == 1
+    print("✅ Only expired agents are popped")
+
+
+def test_newer_heartbeat_supersedes_old_deadline():
+    """A re-touched agent does not expire at its old deadline"""
+    deadlines = HeartbeatDeadlines(timeout=10)
+    deadlines.touch("agent-1", deadline=100)
+    deadlines.touch("agent-1", deadline=300)
+
+    assert deadlines.pop_expired(now=200) == []
+    assert deadlines.pop_expired(now=300) == ["agent-1"]
+    print("✅ Newer heartbeats supersede old deadlines")
+
+
+def test_removed_agents_never_expire():
+    """Unregistered or disconnected agents are dropped from the schedule"""
+    deadlines = HeartbeatDeadlines(timeout=10)
+    deadlines.touch("agent-1", deadline=100)
+    deadlines.remove("agent-1")
+
+    assert deadlines.pop_expired(now=1000) == []
+    assert len(deadlines) == 0
+    print("✅ Removed agents never expire")
+
+
+def test_reconnecting_agent_comes_back_online():
+    """Losing the last socket marks an agent offline; reconnecting undoes it"""
+    connections = ConnectionManager()
+    agents = AgentManager()
+    connections.on_presence_change = agents.on_presence_change
+    long_ago = datetime.utcnow() - timedelta(hours=1)
+    agents.registry.add(
+        AgentRecord(
+            "agent-1", "host-1", "10.0.0.1", 8080, [], "1.0", long_ago, long_ago
+        )
+    )
+
+    async def run():
+        connection_id = await connections.connect(object(), "agent-1")
+        connections.disconnect(connection_id)
+        record = agents.registry.get("agent-1")
+        assert record.status == "offline" and "agent-1" not in agents.deadlines
+
+        await connections.connect(object(), "agent-1")
+        assert record.status == "online" and record.last_heartbeat > long_ago
+        assert "agent-1" in agents.deadlines
+        assert agents.heartbeats.pending["agent-1"]["status"] == "online"
+        assert "agent-1" not in agents._offline_writes
+
+    previous = shared.manager
+    shared.manager = connections
+    try:
+        asyncio.run(run())
+    finally:
+        shared.manager = previous
+    print("✅ Reconnecting agents come back online")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Heartbeat Deadlines")
+    print("=" * 50)
+    test_only_expired_agents_are_popped()
+    test_newer_heartbeat_supersedes_old_deadline()
+    test_removed_agents_never_expire()
+    test_reconnecting_agent_comes_back_online()
+    print("\n🎉 All heartbeat deadline tests passed!")
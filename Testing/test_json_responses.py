@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test JSON Responses - Verify fast serialization matches FastAPI's and caching
+"""
+
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from fastapi.encoders import jsonable_encoder
+
+from Scripts.json_responses import CachedBody, dumps
+from Scripts.shared import RegisteredAgent
+
+
+def test_dumps_matches_jsonable_encoder():
+    """Models, datetimes and enums serialize exactly as FastAPI would"""
+    agent = RegisteredAgent(
+        agent_id="agent-1",
+        hostname="host-1",
+        ip_address="10.0.0.1",
+        port=8080,
+        capabilities=["bash"],
+        version="1.0",
+        registered_at=datetime(2024, 5, 1, 12, 30, 15, 250),
+        last_heartbeat=datetime(2024, 5, 1, 12, 31),
+    )
+    content = {"agents": [agent], "total": 1, "revision": 7, 3: None}
+    assert json.loads(dumps(content)) == json.loads(
+        json.dumps(jsonable_encoder(content))
+    )
+    print("✅ Fast serialization matches jsonable_encoder")
+
+
+def test_cached_body_follows_key_and_age():
+    """A body is reused only for the same key and while it is fresh"""
+    cache = CachedBody(max_age=0.05)
+    assert cache.get(1) is None
+    cache.put(1, b"{}")
+    assert cache.get(1) == b"{}"
+    assert cache.get(2) is None
+
+    time.sleep(0.06)
+    assert cache.get(1) is None
+
+    cache.put(2, b"[]")
+    cache.clear()
+    assert cache.get(2) is None
+    print("✅ Cached bodies follow their key and age")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing JSON Responses")
+    print("=" * 50)
+    test_dumps_matches_jsonable_encoder()
+    test_cached_body_follows_key_and_age()
+    print("=" * 50)
+    print("🎉 All JSON response tests passed!")
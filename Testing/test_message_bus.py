@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Test Message Bus - Verify commands and task events cross worker boundaries
+"""
+
+import asyncio
+import json
+import logging
+import socket
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root and Scripts directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / "Scripts"))
+
+from message_bus import BusError, UnixSocketBus
+from shared import ConnectionManager
+
+
+class FakeWebSocket:
+    """Minimal stand-in for a Starlette WebSocket"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, data: str):
+        self.sent.append(data)
+
+
+async def eventually(condition, timeout: float = 2.0):
+    """Wait for a broadcast to be handled by the other worker"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met"
+        await asyncio.sleep(0.01)
+
+
+def test_broadcast_and_request():
+    """Workers receive broadcasts and answer requests"""
+
+    async def run():
+        with tempfile.TemporaryDirectory() as directory:
+            first = UnixSocketBus(directory, worker_id="w1")
+            second = UnixSocketBus(directory, worker_id="w2")
+            received = []
+
+            async def on_ping(payload, sender):
+                received.append((payload, sender))
+
+            async def on_add(payload, sender):
+                return payload["a"] + payload["b"]
+
+            second.on("ping", on_ping)
+            second.on("add", on_add)
+            await first.start()
+            await second.start()
+
+            await first.broadcast("ping", {"n": 1})
+            await eventually(lambda: received)
+            assert received == [({"n": 1}, "w1")]
+            assert await first.request("w2", "add", {"a": 2, "b": 3}) == 5
+
+            await second.stop()
+            await first.stop()
+
+    asyncio.run(run())
+    print("✅ Broadcasts and requests reach the other worker")
+
+
+def test_stop_cancels_requests_being_answered():
+    """Answers in progress are tracked and cancelled when the worker stops"""
+
+    async def run():
+        with tempfile.TemporaryDirectory() as directory:
+            first = UnixSocketBus(directory, worker_id="w1")
+            second = UnixSocketBus(directory, worker_id="w2")
+            started = asyncio.Event()
+            cancelled = []
+
+            async def on_slow(payload, sender):
+                started.set()
+                try:
+                    await asyncio.sleep(60)
+                except asyncio.CancelledError:
+                    cancelled.append(sender)
+                    raise
+
+            second.on("slow", on_slow)
+            await first.start()
+            await second.start()
+
+            request = asyncio.ensure_future(first.request("w2", "slow", {}, timeout=5))
+            await started.wait()
+            assert len(second._answering) == 1
+            await second.stop()
+            assert cancelled == ["w1"] and not second._answering
+
+            request.cancel()
+            await asyncio.gather(request, return_exceptions=True)
+            await first.stop()
+
+    asyncio.run(run())
+    print("✅ Stopping a worker cancels the requests it is answering")
+
+
+class ListHandler(logging.Handler):
+    """Keeps the messages logged through it"""
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record: logging.LogRecord):
+        self.messages.append(record.getMessage())
+
+
+def test_published_broadcasts_are_tracked_and_failures_logged():
+    """Fire-and-forget broadcasts stay referenced until done and log errors"""
+
+    async def run():
+        with tempfile.TemporaryDirectory() as directory:
+            first = UnixSocketBus(directory, worker_id="w1")
+            second = UnixSocketBus(directory, worker_id="w2")
+            received = []
+
+            async def on_ping(payload, sender):
+                received.append(payload)
+
+            second.on("ping", on_ping)
+            await first.start()
+            await second.start()
+
+            first.publish("ping", {"n": 1})
+            assert len(first._publishing) == 1
+            await eventually(lambda: received)
+            assert received == [{"n": 1}] and not first._publishing
+
+            async def failing(kind, payload):
+                raise ConnectionResetError("peer went away")
+
+            handler = ListHandler()
+            first.logger.addHandler(handler)
+            first.broadcast = failing
+            first.publish("ping", {"n": 2})
+            await eventually(lambda: handler.messages)
+            first.logger.removeHandler(handler)
+            del first.broadcast
+            assert handler.messages == ["❌ Failed to broadcast ping: peer went away"]
+            assert not first._publishing
+
+            await second.stop()
+            await first.stop()
+
+    asyncio.run(run())
+    print("✅ Published broadcasts are tracked and failures logged")
+
+
+def test_dead_worker_socket_is_removed():
+    """A socket left behind by a crashed worker is cleaned up on first use"""
+
+    async def run():
+        with tempfile.TemporaryDirectory() as directory:
+            stale = Path(directory) / "crashed.sock"
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            listener.bind(str(stale))
+            listener.close()
+
+            bus = UnixSocketBus(directory, worker_id="w1")
+            await bus.start()
+            try:
+                await bus.request("crashed", "ping", {})
+                assert False, "request to a dead worker should fail"
+            except BusError:
+                pass
+            assert not stale.exists()
+            assert bus.peers() == []
+            await bus.stop()
+
+    asyncio.run(run())
+    print("✅ Stale worker sockets are removed")
+
+
+def test_commands_and_results_cross_workers():
+    """A command sent from one worker reaches a socket held by another"""
+
+    async def run():
+        with tempfile.TemporaryDirectory() as directory:
+            owner = ConnectionManager(UnixSocketBus(directory, worker_id="owner"))
+            other = ConnectionManager(UnixSocketBus(directory, worker_id="other"))
+            await owner.bus.start()
+            await other.bus.start()
+
+            websocket = FakeWebSocket()
+            connection_id = await owner.connect(websocket, "agent-1")
+            await eventually(lambda: other.is_agent_connected("agent-1"))
+
+            command = {"type": "command", "task_id": "task-1", "command": "hostname"}
+            assert await other.send_command_to_agent("agent-1", command)
+            assert json.loads(websocket.sent[0]) == command
+
+            owner.store_task_result("task-1", {"status": "completed", "output": "x"})
+            await eventually(lambda: other.get_task_result("task-1") is not None)
+            assert other.get_task_result("task-1")["output"] == "x"
+            # Only the receiving worker persists the result
+            assert len(owner.task_writer._queue) == 1
+            assert len(other.task_writer._queue) == 0
+
+            owner.disconnect(connection_id)
+            await eventually(lambda: not other.is_agent_connected("agent-1"))
+            assert not await other.send_command_to_agent("agent-1", command)
+
+            await other.bus.stop()
+            await owner.bus.stop()
+
+    asyncio.run(run())
+    print("✅ Commands and task results cross workers")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Message Bus")
+    print("=" * 50)
+    test_broadcast_and_request()
+    test_stop_cancels_requests_being_answered()
+    test_published_broadcasts_are_tracked_and_failures_logged()
+    test_dead_worker_socket_is_removed()
+    test_commands_and_results_cross_workers()
+    print("=" * 50)
+    print("🎉 All message bus tests passed!")
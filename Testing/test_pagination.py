@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Test Pagination - Verify keyset cursors, agent pages and their filters
+"""
+
+import sys
+import tempfile
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from Scripts.database import (
+    Agent,
+    DatabaseManager,
+    TunedSQLiteBackend,
+    decode_cursor,
+    encode_cursor,
+)
+
+# agent_id -> (hostname, version, capabilities, customer)
+FLEET = {
+    "agent-0": ("web-1", "1.0", ["shell"], "acme"),
+    "agent-1": ("web-2", "2.0", ["shell", "patch"], "acme"),
+    "agent-2": ("db-1", "1.0", ["shell"], "globex"),
+    "agent-3": ("web-3", "1.0", ["patch"], None),
+    "agent-4": ("db-2", "2.0", ["shell"], "acme"),
+    "agent-5": ("web_4", "1.0", ["shell"], "globex"),
+    "agent-6": ("cache-1", "2.0", [], None),
+}
+OFFLINE = ["agent-2", "agent-3"]
+
+
+def open_fleet(directory: str) -> DatabaseManager:
+    db = DatabaseManager(TunedSQLiteBackend(f"sqlite:///{directory}/test.db"))
+    for agent_id, (hostname, version, capabilities, customer) in FLEET.items():
+        db.register_agent(
+            {
+                "id": str(uuid.uuid4()),
+                "agent_id": agent_id,
+                "hostname": hostname,
+                "ip_address": "10.0.0.1",
+                "port": 8080,
+                "capabilities": capabilities,
+                "version": version,
+                "customer_uuid": customer,
+            }
+        )
+    db.mark_agents_offline(OFFLINE)
+    return db
+
+
+def walk(db: DatabaseManager, limit: int, **kwargs) -> list:
+    """Agent IDs of every page in order, checking each page's shape"""
+    agent_ids, cursor = [], None
+    while True:
+        page = db.get_agents_page(limit, cursor, **kwargs)
+        assert len(page["agents"]) <= limit
+        agent_ids.extend(agent["agent_id"] for agent in page["agents"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return agent_ids
+        assert len(page["agents"]) == limit
+
+
+def test_cursor_round_trips_datetimes():
+    """A cursor decodes back to the sort key it was built from"""
+    last_heartbeat = datetime(2024, 5, 1, 12, 30, 15, 250)
+    cursor = encode_cursor([last_heartbeat, "agent-1"])
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor, (Agent.last_heartbeat, Agent.agent_id)) == [
+        last_heartbeat,
+        "agent-1",
+    ]
+    print("✅ Cursor round-trips datetimes")
+
+
+def test_malformed_cursor_is_rejected():
+    """Garbage, mismatched or mistyped cursors raise ValueError"""
+    columns = (Agent.last_heartbeat, Agent.agent_id)
+    for cursor in (
+        "not base64!",
+        encode_cursor(["only-one"]),
+        encode_cursor({}),
+        encode_cursor([5, "agent-1"]),
+        encode_cursor([["2024-05-01"], "agent-1"]),
+        encode_cursor(["yesterday", "agent-1"]),
+    ):
+        try:
+            decode_cursor(cursor, columns)
+        except ValueError:
+            continue
+        raise AssertionError(f"cursor {cursor!r} was accepted")
+    print("✅ Malformed cursors are rejected")
+
+
+def test_pages_follow_tied_sort_keys_in_order():
+    """Rows sharing a sort key are ordered by agent_id, with no gaps or repeats"""
+    with tempfile.TemporaryDirectory() as directory:
+        db = open_fleet(directory)
+        by_version = sorted(FLEET, key=lambda agent_id: (FLEET[agent_id][1], agent_id))
+        for limit in (1, 2, 3, 7):
+            assert walk(db, limit, sort="version") == by_version
+            assert walk(db, limit, sort="version", descending=True) == list(
+                reversed(by_version)
+            )
+        # "offline" sorts before "online"
+        by_status = sorted(
+            FLEET, key=lambda agent_id: (agent_id not in OFFLINE, agent_id)
+        )
+        assert walk(db, 2, sort="status") == by_status
+
+        page = db.get_agents_page(7, sort="version")
+        assert len(page["agents"]) == 7 and page["next_cursor"] is None
+        assert page["total"] == 7 and page["online"] == 7
+        db.close()
+    print("✅ Pages follow tied sort keys in order")
+
+
+def test_filters_narrow_rows_and_counts():
+    """Status, customer and hostname filters apply to the rows and the totals"""
+    with tempfile.TemporaryDirectory() as directory:
+        db = open_fleet(directory)
+        cases = [
+            ({"status": "offline"}, ["agent-2", "agent-3"]),
+            ({"customer_uuid": "acme"}, ["agent-0", "agent-1", "agent-4"]),
+            ({"hostname_prefix": "web-"}, ["agent-0", "agent-1", "agent-3"]),
+            ({"hostname_prefix": "web_"}, ["agent-5"]),
+            ({"capability": "patch"}, ["agent-1", "agent-3"]),
+            ({"customer_uuid": "globex", "status": "online"}, ["agent-5"]),
+            ({"customer_uuid": "nobody"}, []),
+        ]
+        for filters, expected in cases:
+            assert sorted(walk(db, 2, **filters)) == expected, filters
+            page = db.get_agents_page(2, **filters)
+            assert page["total"] == len(expected), filters
+        db.close()
+    print("✅ Filters narrow rows and counts")
+
+
+def test_crafted_cursor_is_rejected_by_the_page_query():
+    """A cursor with the wrong type for its sort column is a ValueError (400)"""
+    with tempfile.TemporaryDirectory() as directory:
+        db = open_fleet(directory)
+        try:
+            db.get_agents_page(2, encode_cursor([5, "agent-1"]), sort="last_heartbeat")
+            raise AssertionError("the crafted cursor was accepted")
+        except ValueError:
+            pass
+        db.close()
+    print("✅ Crafted cursors are rejected by the page query")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Pagination")
+    print("=" * 50)
+    test_cursor_round_trips_datetimes()
+    test_malformed_cursor_is_rejected()
+    test_pages_follow_tied_sort_keys_in_order()
+    test_filters_narrow_rows_and_counts()
+    test_crafted_cursor_is_rejected_by_the_page_query()
+    print("\n🎉 All pagination tests passed!")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test Password Hashing - Verify the hashing pool's cap, queue limit and rehashing
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add project root and Scripts directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / "Scripts"))
+
+from auth import BCRYPT_ROUNDS, PasswordHasher, check_password, hash_password
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+
+def test_pool_caps_concurrency_and_counts_waits():
+    """No more than ``workers`` hashes run at once; the rest wait and are timed"""
+    hasher = PasswordHasher(workers=2, max_queue=10)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def work(value):
+        with lock:
+            running.append(value)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.remove(value)
+        return value * 2
+
+    async def run():
+        return await asyncio.gather(*(hasher.run(work, index) for index in range(6)))
+
+    assert asyncio.run(run()) == [0, 2, 4, 6, 8, 10]
+    metrics = hasher.metrics()
+    assert max(peak) == 2
+    assert metrics["completed"] == 6 and metrics["queued"] == 0
+    assert metrics["max_wait_seconds"] > 0.01
+    hasher.executor.shutdown()
+    print("✅ The pool caps concurrency and times the wait")
+
+
+def test_full_queue_turns_callers_away():
+    """Callers beyond the queue limit get a 503 instead of waiting
+
+    One call holds the only thread while two more fill the queue behind it.
+    """
+    hasher = PasswordHasher(workers=1, max_queue=2)
+    release = threading.Event()
+
+    async def run():
+        waiting = [asyncio.ensure_future(hasher.run(release.wait)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        rejected = None
+        try:
+            await hasher.run(lambda: None)
+        except HTTPException as e:
+            rejected = e
+        finally:
+            release.set()
+        await asyncio.gather(*waiting)
+        assert rejected is not None and rejected.status_code == 503
+
+    asyncio.run(run())
+    assert hasher.metrics()["rejected"] == 1
+    hasher.executor.shutdown()
+    print("✅ A full queue turns callers away")
+
+
+def test_cancelled_callers_leave_the_queue():
+    """Callers cancelled while waiting for a thread no longer count as queued"""
+    hasher = PasswordHasher(workers=1, max_queue=2)
+    release = threading.Event()
+
+    async def run():
+        holder = asyncio.ensure_future(hasher.run(release.wait))
+        await asyncio.sleep(0.05)
+        for _ in range(3):
+            waiting = [
+                asyncio.ensure_future(hasher.run(release.wait)) for _ in range(2)
+            ]
+            await asyncio.sleep(0.01)
+            assert hasher.metrics()["queued"] == 2
+            for task in waiting:
+                task.cancel()
+            await asyncio.gather(*waiting, return_exceptions=True)
+            assert hasher.metrics()["queued"] == 0
+        release.set()
+        await holder
+        assert await hasher.run(lambda: "done") == "done"
+
+    asyncio.run(run())
+    metrics = hasher.metrics()
+    assert metrics["queued"] == 0 and metrics["running"] == 0
+    assert metrics["rejected"] == 0
+    hasher.executor.shutdown()
+    print("✅ Cancelled callers leave the queue")
+
+
+def test_outdated_hashes_are_replaced():
+    """Hashes made with fewer rounds verify and come back rehashed"""
+    cheap = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=4).hash("secret")
+
+    async def run():
+        assert await check_password("wrong", cheap) == (False, None)
+        valid, new_hash = await check_password("secret", cheap)
+        assert valid and new_hash and f"${BCRYPT_ROUNDS:02d}$" in new_hash
+        assert await check_password("secret", new_hash) == (True, None)
+        assert (await check_password("secret", await hash_password("secret")))[0]
+
+    asyncio.run(run())
+    print("✅ Outdated hashes are replaced")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Password Hashing")
+    print("=" * 50)
+    test_pool_caps_concurrency_and_counts_waits()
+    test_full_queue_turns_callers_away()
+    test_cancelled_callers_leave_the_queue()
+    test_outdated_hashes_are_replaced()
+    print("=" * 50)
+    print("🎉 All password hashing tests passed!")
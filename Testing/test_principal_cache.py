@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test Principal Cache - Verify token lookups are cached and invalidated
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+# Add project root and Scripts directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / "Scripts"))
+
+from auth import (
+    PrincipalCache,
+    create_access_token,
+    get_user_for_token,
+    verify_token,
+)
+
+from Scripts.database import DatabaseManager, TunedSQLiteBackend
+
+
+def user(user_id: str = "user-1") -> dict:
+    return {"id": user_id, "username": f"name-{user_id}", "is_admin": False}
+
+
+def test_entries_expire_with_ttl_or_token():
+    """Entries live for the TTL, or until the token expires if sooner"""
+    cache = PrincipalCache(ttl=0.05)
+    cache.put("token-1", user(), None, cache.generation)
+    cache.put("token-2", user(), int(time.time()) - 1, cache.generation)
+    assert cache.get("token-1")["id"] == "user-1"
+    assert cache.get("token-2") is None
+
+    time.sleep(0.06)
+    assert cache.get("token-1") is None
+    assert len(cache) == 0
+    print("✅ Entries expire with the TTL or the token")
+
+
+def test_invalidation_drops_every_token_of_a_user():
+    """A changed user loses all of its cached tokens, and only its own"""
+    cache = PrincipalCache(max_size=3)
+    cache.put("token-1", user("user-1"), None, cache.generation)
+    cache.put("token-2", user("user-1"), None, cache.generation)
+    cache.put("token-3", user("user-2"), None, cache.generation)
+
+    cache.invalidate_user("user-1")
+    assert cache.get("token-1") is None and cache.get("token-2") is None
+    assert cache.get("token-3")["id"] == "user-2"
+
+    # A lookup that started before the change must not be cached
+    stale_generation = cache.generation
+    cache.invalidate_user("user-2")
+    cache.put("token-3", user("user-2"), None, stale_generation)
+    assert cache.get("token-3") is None
+
+    for index in range(5):
+        cache.put(f"extra-{index}", user(), None, cache.generation)
+    assert len(cache) == 3 and cache.get("extra-0") is None
+    print("✅ Invalidation drops every token of a user")
+
+
+def test_committed_user_changes_evict_cached_tokens():
+    """update_user and friends evict the user once their write commits"""
+    with tempfile.TemporaryDirectory() as directory:
+        db = DatabaseManager(TunedSQLiteBackend(f"sqlite:///{directory}/test.db"))
+        user_id = str(uuid.uuid4())
+        db.create_user(
+            {
+                "id": user_id,
+                "username": "alice",
+                "email": "alice@example.com",
+                "hashed_password": "x",
+                "is_approved": True,
+            }
+        )
+        cache = PrincipalCache()
+        cache.attach(db)
+        cache.attach(db)
+        assert db.user_listeners == [cache.invalidate_user]
+
+        token = create_access_token({"sub": "alice"}, timedelta(minutes=5))
+        token_data = verify_token(token)
+        assert token_data.exp is not None
+
+        for change in (
+            lambda: db.make_admin(user_id),
+            lambda: db.update_user(user_id, {"full_name": "Alice"}),
+            lambda: db.delete_user(user_id),
+        ):
+            cached = db.get_user_by_username("alice")
+            cache.put(token, cached, token_data.exp, cache.generation)
+            assert cache.get(token) is not None
+            assert change()
+            assert cache.get(token) is None
+        db.close()
+    print("✅ Committed user changes evict cached tokens")
+
+
+def test_get_user_for_token_rejects_bad_tokens():
+    """Garbage tokens resolve to no user"""
+    assert asyncio.run(get_user_for_token("not-a-jwt")) is None
+    print("✅ Bad tokens resolve to no user")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Principal Cache")
+    print("=" * 50)
+    test_entries_expire_with_ttl_or_token()
+    test_invalidation_drops_every_token_of_a_user()
+    test_committed_user_changes_evict_cached_tokens()
+    test_get_user_for_token_rejects_bad_tokens()
+    print("=" * 50)
+    print("🎉 All principal cache tests passed!")
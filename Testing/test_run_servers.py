@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test Run Servers - Verify several listeners share one app and one lifespan
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import uvicorn
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from run_servers import Listener, bind_socket, serve
+
+
+class CountingApp:
+    """ASGI app counting lifespan events and answering every request"""
+
+    def __init__(self):
+        self.startups = 0
+        self.shutdowns = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    self.startups += 1
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    self.shutdowns += 1
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def get(port: int) -> bytes:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET / HTTP/1.1\r\nHost: test\r\nConnection: close\r\n\r\n")
+    response = await reader.read()
+    writer.close()
+    return response
+
+
+def test_two_ports_share_one_lifespan():
+    """Both ports answer and the app starts and stops exactly once"""
+
+    async def run():
+        app = CountingApp()
+        servers = []
+        for lifespan in ("on", "off"):
+            sock = bind_socket("127.0.0.1", 0)
+            config = uvicorn.Config(app, lifespan=lifespan, log_level="warning")
+            servers.append((Listener(config), [sock]))
+        ports = [sockets[0].getsockname()[1] for _, sockets in servers]
+
+        task = asyncio.create_task(serve(servers))
+        while not all(server.started for server, _ in servers):
+            await asyncio.sleep(0.05)
+
+        for port in ports:
+            assert (await get(port)).startswith(b"HTTP/1.1 200")
+        assert app.startups == 1
+
+        # Stopping one listener stops the whole process
+        servers[1][0].should_exit = True
+        await asyncio.wait_for(task, 5)
+        assert app.shutdowns == 1
+
+    asyncio.run(run())
+    print("✅ Two ports share one lifespan")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Run Servers")
+    print("=" * 50)
+    test_two_ports_share_one_lifespan()
+    print("=" * 50)
+    print("🎉 All run server tests passed!")
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Test Storage Backend - Verify URL/profile selection and the SQLite tuning
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+
+from Scripts.database import (
+    DatabaseManager,
+    SQLiteBackend,
+    StorageBackend,
+    TunedSQLiteBackend,
+    create_storage_backend,
+)
+
+
+def test_backend_follows_url_and_profile():
+    """SQLite URLs get a profile; anything else is a server backend"""
+    url = "sqlite:///agents.db"
+    assert type(create_storage_backend(url, "production")) is TunedSQLiteBackend
+    assert type(create_storage_backend(url, "default")) is SQLiteBackend
+    server = create_storage_backend("postgresql://user@db/agents", "production")
+    assert type(server) is StorageBackend
+    assert server.engine_options()["pool_pre_ping"]
+
+    try:
+        create_storage_backend(url, "turbo")
+        assert False, "an unknown profile should be rejected"
+    except ValueError:
+        pass
+    print("✅ Backends follow the URL and profile")
+
+
+def test_production_profile_tunes_connections():
+    """Every connection of the production profile runs in WAL mode"""
+    with tempfile.TemporaryDirectory() as directory:
+        db = DatabaseManager(TunedSQLiteBackend(f"sqlite:///{directory}/test.db"))
+        with db.engine.connect() as connection:
+            pragma = lambda name: connection.execute(text(f"PRAGMA {name}")).scalar()
+            assert pragma("journal_mode") == "wal"
+            assert pragma("synchronous") == 1  # NORMAL
+            assert pragma("busy_timeout") == 5000
+        assert db.get_task("missing") is None
+        db.engine.dispose()
+    print("✅ The production profile tunes its connections")
+
+
+def test_memory_database_keeps_default_pool():
+    """In-memory SQLite can't share a pool of separate connections"""
+    assert "pool_size" not in SQLiteBackend("sqlite://").engine_options()
+    assert "pool_size" in SQLiteBackend("sqlite:///agents.db").engine_options()
+    print("✅ In-memory databases keep the default pool")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Storage Backend")
+    print("=" * 50)
+    test_backend_follows_url_and_profile()
+    test_production_profile_tunes_connections()
+    test_memory_database_keeps_default_pool()
+    print("=" * 50)
+    print("🎉 All storage backend tests passed!")
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Test Task Events - Verify SSE fan-out, unsubscribe and stream termination
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from Scripts import task_events
+from Scripts.task_events import TaskEventBroker, format_sse, stream_task_events
+
+
+class FakeRequest:
+    """Minimal stand-in for a Starlette Request"""
+
+    async def is_disconnected(self) -> bool:
+        return False
+
+
+def drain(subscription) -> list:
+    events = []
+    while not subscription.queue.empty():
+        events.append(subscription.queue.get_nowait())
+    return events
+
+
+def test_events_fan_out_to_matching_subscribers():
+    """Task subscribers get their tasks' events; global ones get everything"""
+
+    async def run():
+        broker = TaskEventBroker()
+        one = broker.subscribe(["task-1"])
+        both = broker.subscribe(["task-1", "task-2"])
+        everything = broker.subscribe()
+        assert broker.subscriber_count() == 3
+
+        broker.publish("task_status", "task-1", {"status": "running"})
+        broker.publish("task_status", "task-2", {"status": "running"})
+        broker.publish("task_status", "task-3", {"status": "running"})
+
+        assert [e["task_id"] for e in drain(one)] == ["task-1"]
+        assert [e["task_id"] for e in drain(both)] == ["task-1", "task-2"]
+        assert [e["task_id"] for e in drain(everything)] == [
+            "task-1",
+            "task-2",
+            "task-3",
+        ]
+
+    asyncio.run(run())
+    print("✅ Events fan out to matching subscribers")
+
+
+def test_unsubscribe_stops_delivery_and_cleans_up():
+    """Unsubscribed queues get nothing more and leave no index entries"""
+
+    async def run():
+        broker = TaskEventBroker()
+        watcher = broker.subscribe(["task-1"])
+        everything = broker.subscribe()
+        broker.unsubscribe(watcher)
+        broker.unsubscribe(everything)
+        assert broker.subscriber_count() == 0
+        assert broker._by_task == {} and broker._all_tasks == set()
+
+        broker.publish("task_result", "task-1", {"status": "completed"})
+        assert drain(watcher) == [] and drain(everything) == []
+
+    asyncio.run(run())
+    print("✅ Unsubscribing stops delivery and cleans up")
+
+
+def test_slow_subscriber_drops_oldest_events():
+    """A full queue loses its oldest events instead of blocking publish"""
+    previous = task_events.SUBSCRIBER_QUEUE_SIZE
+    task_events.SUBSCRIBER_QUEUE_SIZE = 2
+
+    async def run():
+        broker = TaskEventBroker()
+        subscription = broker.subscribe()
+        for index in range(4):
+            broker.publish("task_status", f"task-{index}", {"status": "running"})
+        assert subscription.dropped == 2
+        assert [e["task_id"] for e in drain(subscription)] == ["task-2", "task-3"]
+
+    try:
+        asyncio.run(run())
+    finally:
+        task_events.SUBSCRIBER_QUEUE_SIZE = previous
+    print("✅ Slow subscribers drop their oldest events")
+
+
+def test_stream_ends_when_watched_tasks_finish():
+    """A task stream replays initial events and closes after final statuses"""
+
+    async def run():
+        broker = TaskEventBroker()
+        initial = [
+            {"event": "task_result", "task_id": "task-1", "data": {"status": "failed"}}
+        ]
+        stream = stream_task_events(
+            broker, FakeRequest(), ["task-1", "task-2"], initial
+        )
+        frames = [await stream.__anext__(), await stream.__anext__()]
+        assert frames[0] == "retry: 3000\n\n"
+        assert frames[1].startswith("event: task_result\n")
+
+        next_frame = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+        broker.publish("task_status", "task-2", {"status": "running"})
+        broker.publish("task_result", "task-2", {"status": "completed"})
+        frames.append(await next_frame)
+        frames.extend([frame async for frame in stream])
+
+        assert [json.loads(f.split("data: ")[1])["status"] for f in frames[1:]] == [
+            "failed",
+            "running",
+            "completed",
+        ]
+        assert broker.subscriber_count() == 0
+
+    asyncio.run(run())
+    print("✅ Task streams end when the watched tasks finish")
+
+
+def test_format_sse_framing():
+    """Frames carry the event name, optional id and JSON data"""
+    frame = format_sse(
+        {"event": "task_output", "task_id": "t", "id": 3, "data": {"seq": 3}}
+    )
+    assert frame == 'id: 3\nevent: task_output\ndata: {"task_id": "t", "seq": 3}\n\n'
+    print("✅ SSE frames are well formed")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Task Events")
+    print("=" * 50)
+    test_events_fan_out_to_matching_subscribers()
+    test_unsubscribe_stops_delivery_and_cleans_up()
+    test_slow_subscriber_drops_oldest_events()
+    test_stream_ends_when_watched_tasks_finish()
+    test_format_sse_framing()
+    print("=" * 50)
+    print("🎉 All task event tests passed!")
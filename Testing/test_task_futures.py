@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test Task Futures - Verify results are correlated with the task that asked
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add project root and Scripts directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / "Scripts"))
+
+from shared import ConnectionManager
+from task_store import TaskFutures
+
+
+def test_untagged_results_match_oldest_task():
+    """A result without task_id answers the agent's oldest outstanding task"""
+
+    async def run():
+        futures = TaskFutures()
+        futures.track("agent-1", "task-1")
+        futures.track("agent-1", "task-2")
+        futures.track("agent-2", "task-3")
+
+        assert futures.oldest("agent-1") == "task-1"
+        assert futures.resolve("task-1", {"status": "completed"})
+        assert futures.oldest("agent-1") == "task-2"
+        assert futures.discard("task-2") is not None
+        assert futures.oldest("agent-1") is None
+        assert not futures.resolve("task-1", {})
+
+    asyncio.run(run())
+    print("✅ Untagged results match the oldest task")
+
+
+def test_in_flight_tasks_are_bounded():
+    """The oldest outstanding tasks are forgotten past the per-agent cap"""
+
+    async def run():
+        futures = TaskFutures(max_per_agent=2)
+        for task_id in ("task-1", "task-2", "task-3"):
+            futures.track("agent-1", task_id)
+        assert "task-1" not in futures
+        assert futures.oldest("agent-1") == "task-2"
+        assert len(futures) == 2
+
+    asyncio.run(run())
+    print("✅ Outstanding tasks are bounded")
+
+
+def test_wait_for_task_result():
+    """Waiters get the result as it arrives, or None on timeout"""
+
+    async def run():
+        manager = ConnectionManager()
+        manager.task_futures.track("agent-1", "task-1")
+        manager.task_futures.track("agent-1", "task-2")
+
+        waiter = asyncio.create_task(manager.wait_for_task_result("task-1", 5))
+        await asyncio.sleep(0.01)
+        manager.store_task_result("task-1", {"output": "hi"}, agent_id="agent-1")
+        result = await asyncio.wait_for(waiter, 1)
+        assert result["output"] == "hi" and result["status"] == "completed"
+
+        # Already finished: served from the result store
+        assert (await manager.wait_for_task_result("task-1", 5))["output"] == "hi"
+
+        # A final status ends the wait too
+        waiter = asyncio.create_task(manager.wait_for_task_result("task-2", 5))
+        await asyncio.sleep(0.01)
+        manager.store_task_status("task-2", {"status": "failed"}, agent_id="agent-1")
+        assert (await asyncio.wait_for(waiter, 1))["status"] == "failed"
+
+        manager.task_futures.track("agent-1", "task-3")
+        assert await manager.wait_for_task_result("task-3", 0.05) is None
+        assert await manager.wait_for_task_result("unknown", 0.05) is None
+
+    asyncio.run(run())
+    print("✅ Waiters get results or time out")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Task Futures")
+    print("=" * 50)
+    test_untagged_results_match_oldest_task()
+    test_in_flight_tasks_are_bounded()
+    test_wait_for_task_result()
+    print("=" * 50)
+    print("🎉 All task future tests passed!")
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test Task Result Store - Verify LRU/TTL eviction and output buffering
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from Scripts.task_store import TaskOutputBuffer, TaskResultStore, parse_output_chunk
+
+
+def test_count_bound_evicts_least_recently_used():
+    """The oldest untouched result goes first when the count cap is hit"""
+    store = TaskResultStore(max_entries=2)
+
+    store.put("t1", {"task_id": "t1", "output": "a"}, agent_id="agent-1")
+    store.put("t2", {"task_id": "t2", "output": "b"}, agent_id="agent-1")
+    assert store.get("t1") is not None  # t1 is now most recently used
+    store.put("t3", {"task_id": "t3", "output": "c"}, agent_id="agent-1")
+
+    assert "t1" in store and "t3" in store
+    assert "t2" not in store
+    assert store.metrics()["evicted_lru"] == 1
+    print("✅ Count bound evicts least recently used result")
+
+
+def test_byte_bound_evicts_oldest_results():
+    """Older results go once the stored bytes exceed the cap"""
+    store = TaskResultStore(max_bytes=200)
+
+    store.put("t1", {"task_id": "t1", "output": "x" * 100})
+    store.get("t1")
+    store.put("t2", {"task_id": "t2", "output": "y" * 100})
+
+    assert "t1" not in store
+    assert "t2" in store
+    assert store.total_bytes <= 200
+    assert store.metrics()["evicted_lru"] == 1
+    print("✅ Byte bound evicts the oldest results")
+
+
+def test_ttl_expiry_evicts_idle_results():
+    """Idle results expire"""
+    store = TaskResultStore(ttl=0.05)
+
+    store.put("t1", {"task_id": "t1", "status": "completed"}, agent_id="agent-1")
+    time.sleep(0.1)
+
+    assert store.get("t1") is None
+    metrics = store.metrics()
+    assert metrics["evicted_ttl"] == 1
+    assert metrics["misses"] == 1
+    assert metrics["entries"] == 0 and metrics["bytes"] == 0
+    print("✅ Idle results expire")
+
+
+def test_output_buffer_skips_duplicates_and_caps_bytes():
+    """Resent chunks are ignored and the oldest chunks go past the cap"""
+    buffer = TaskOutputBuffer("agent-1", max_bytes=8)
+
+    assert buffer.append(0, "abcd") is not None
+    assert buffer.append(0, "abcd") is None
+    buffer.append(1, "efgh")
+    buffer.append(3, "ij")
+
+    assert buffer.text() == "efghij"
+    assert [chunk["seq"] for chunk in buffer.read(2)] == [3]
+    info = buffer.info()
+    assert info["first_seq"] == 1
+    assert info["dropped_bytes"] == 4
+    assert info["missing_chunks"] == 1
+    print("✅ Output buffer skips duplicates and caps bytes")
+
+
+def test_malformed_output_chunks_are_rejected():
+    """Chunks with a bad task_id, seq, data or stream parse to None"""
+    assert parse_output_chunk({"task_id": "t1", "seq": "4", "data": "hi"}) == {
+        "task_id": "t1",
+        "seq": 4,
+        "data": "hi",
+        "stream": "stdout",
+    }
+    for data in (
+        None,
+        [],
+        {"seq": 1},
+        {"task_id": "t1"},
+        {"task_id": "t1", "seq": None},
+        {"task_id": "t1", "seq": "abc"},
+        {"task_id": "t1", "seq": True},
+        {"task_id": "t1", "seq": 1, "data": None},
+        {"task_id": "t1", "seq": 1, "stream": 2},
+    ):
+        assert parse_output_chunk(data) is None, data
+    print("✅ Malformed output chunks are rejected")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Task Result Store")
+    print("=" * 50)
+    test_count_bound_evicts_least_recently_used()
+    test_byte_bound_evicts_oldest_results()
+    test_ttl_expiry_evicts_idle_results()
+    test_output_buffer_skips_duplicates_and_caps_bytes()
+    test_malformed_output_chunks_are_rejected()
+    print("\n🎉 All task result store tests passed!")
@@ -12,18 +12,23 @@ from auth import (
     User,
     UserCreate,
     UserLogin,
+    check_password,
+    check_user_password,
     create_access_token,
     get_current_active_user,
     get_current_admin_user,
     get_current_approved_user,
-    get_password_hash,
-    verify_password,
+    hash_password,
+    password_hasher,
 )
-from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 
 sys.path.append(str(Path(__file__).parent.parent / "Scripts"))
 from shared import (
     AgentRegistration,
+    BulkCommandRequest,
+    BulkScriptExecutionRequest,
     CommandRequest,
     CustomerRegistration,
     HeartbeatRequest,
@@ -33,7 +38,18 @@ from shared import (
     manager,
 )
 
-from database import db_manager
+from Scripts.command_queue import (
+    COMMAND_LEASE_TIMEOUT,
+    LONG_POLL_MAX_WAIT,
+    CommandQueueFull,
+)
+from Scripts.database import AGENT_SORT_COLUMNS, MAX_PAGE_SIZE, async_db_manager
+from Scripts.json_responses import FAST_JSON, CachedBody, cached_response
+from Scripts.task_events import (
+    FINAL_TASK_STATUSES,
+    stream_task_events,
+    stream_task_output,
+)
 
 # Create router
 router = APIRouter(prefix="/api", tags=["API"])
@@ -45,11 +61,11 @@ async def register_user(user: UserCreate):
     """Register a new user via API"""
     try:
         # Check if user already exists
-        existing_user = db_manager.get_user_by_username(user.username)
+        existing_user = await async_db_manager.get_user_by_username(user.username)
         if existing_user:
             raise HTTPException(status_code=400, detail="Username already exists")
 
-        existing_email = db_manager.get_user_by_email(user.email)
+        existing_email = await async_db_manager.get_user_by_email(user.email)
         if existing_email:
             raise HTTPException(status_code=400, detail="Email already exists")
 
@@ -59,15 +75,17 @@ async def register_user(user: UserCreate):
             "username": user.username,
             "email": user.email,
             "full_name": user.full_name,
-            "hashed_password": get_password_hash(user.password),
+            "hashed_password": await hash_password(user.password),
             "is_active": True,
             "is_admin": False,
             "is_approved": False,
         }
 
-        user_id = db_manager.create_user(user_data)
+        user_id = await async_db_manager.create_user(user_data)
         return {"user_id": user_id, "message": "User registered successfully"}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Registration failed: {str(e)}")
 
@@ -89,10 +107,12 @@ async def login_user(user_credentials: UserLogin, request: Request):
         user_agent = request.headers.get("User-Agent")
 
         # Get user with password
-        user_data = db_manager.get_user_with_password(user_credentials.username)
+        user_data = await async_db_manager.get_user_with_password(
+            user_credentials.username
+        )
         if not user_data:
             # Record failed login attempt
-            db_manager.record_login_attempt(
+            await async_db_manager.record_login_attempt(
                 user_id="unknown",
                 username=user_credentials.username,
                 source_ip_external=source_ip_external,
@@ -104,9 +124,9 @@ async def login_user(user_credentials: UserLogin, request: Request):
             raise HTTPException(status_code=401, detail="Invalid username or password")
 
         # Verify password
-        if not verify_password(user_credentials.password, user_data["hashed_password"]):
+        if not await check_user_password(user_data, user_credentials.password):
             # Record failed login attempt
-            db_manager.record_login_attempt(
+            await async_db_manager.record_login_attempt(
                 user_id=user_data["id"],
                 username=user_data["username"],
                 source_ip_external=source_ip_external,
@@ -120,7 +140,7 @@ async def login_user(user_credentials: UserLogin, request: Request):
         # Check if user is active
         if not user_data["is_active"]:
             # Record failed login attempt
-            db_manager.record_login_attempt(
+            await async_db_manager.record_login_attempt(
                 user_id=user_data["id"],
                 username=user_data["username"],
                 source_ip_external=source_ip_external,
@@ -134,7 +154,7 @@ async def login_user(user_credentials: UserLogin, request: Request):
         # Check if user is approved (unless they are an admin)
         if not user_data["is_admin"] and not user_data["is_approved"]:
             # Record failed login attempt
-            db_manager.record_login_attempt(
+            await async_db_manager.record_login_attempt(
                 user_id=user_data["id"],
                 username=user_data["username"],
                 source_ip_external=source_ip_external,
@@ -148,7 +168,7 @@ async def login_user(user_credentials: UserLogin, request: Request):
             )
 
         # Record successful login
-        db_manager.record_login_attempt(
+        await async_db_manager.record_login_attempt(
             user_id=user_data["id"],
             username=user_data["username"],
             source_ip_external=source_ip_external,
@@ -182,11 +202,20 @@ async def login_user(user_credentials: UserLogin, request: Request):
 
 # User management API routes
 @router.get("/users")
-async def list_users(current_user: User = Depends(get_current_active_user)):
-    """List all users (admin only)"""
+async def list_users(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user),
+):
+    """List all users (admin only), one page at a time when ``limit`` is given"""
     try:
-        users = db_manager.get_all_users()
+        if limit is not None or cursor is not None:
+            page = await async_db_manager.get_users_page(limit or MAX_PAGE_SIZE, cursor)
+            return {**page, "count": len(page["users"])}
+        users = await async_db_manager.get_all_users()
         return {"users": users, "total": len(users)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list users: {str(e)}")
 
@@ -201,14 +230,14 @@ async def get_profile(current_user: User = Depends(get_current_active_user)):
     logger.info(f"🔍 Profile request for user: {current_user.username}")
 
     try:
-        user_data = db_manager.get_user_by_username(current_user.username)
+        user_data = await async_db_manager.get_user_by_username(current_user.username)
         if not user_data:
             logger.error(f"❌ User not found in database: {current_user.username}")
             raise HTTPException(status_code=404, detail="User not found")
 
         # Get login history information
-        last_login = db_manager.get_user_last_login(user_data["id"])
-        login_count = db_manager.get_user_login_count(user_data["id"])
+        last_login = await async_db_manager.get_user_last_login(user_data["id"])
+        login_count = await async_db_manager.get_user_login_count(user_data["id"])
 
         # Add real statistics
         user_data.update(
@@ -245,7 +274,7 @@ async def get_user(user_id: str, current_user: User = Depends(get_current_active
         # For now, only allow users to get their own info
         if current_user.id != user_id:
             raise HTTPException(status_code=403, detail="Access denied")
-        user_data = db_manager.get_user_by_username(current_user.username)
+        user_data = await async_db_manager.get_user_by_username(current_user.username)
         if not user_data:
             raise HTTPException(status_code=404, detail="User not found")
         return user_data
@@ -267,7 +296,7 @@ async def delete_user(
                 status_code=400, detail="Cannot delete your own account"
             )
 
-        success = db_manager.delete_user(user_id)
+        success = await async_db_manager.delete_user(user_id)
         if success:
             return {"message": "User deleted successfully"}
         else:
@@ -290,7 +319,7 @@ async def update_profile(
         if "full_name" in profile_data:
             updates["full_name"] = profile_data["full_name"]
 
-        success = db_manager.update_user(current_user.id, updates)
+        success = await async_db_manager.update_user(current_user.id, updates)
         if success:
             return {"message": "Profile updated successfully"}
         else:
@@ -318,16 +347,17 @@ async def change_password(
             )
 
         # Verify current password
-        user_data = db_manager.get_user_with_password(current_user.username)
+        user_data = await async_db_manager.get_user_with_password(current_user.username)
         if not user_data:
             raise HTTPException(status_code=404, detail="User not found")
 
-        if not verify_password(current_password, user_data["hashed_password"]):
+        valid, _ = await check_password(current_password, user_data["hashed_password"])
+        if not valid:
             raise HTTPException(status_code=400, detail="Current password is incorrect")
 
         # Update password
-        hashed_password = get_password_hash(new_password)
-        success = db_manager.update_user(
+        hashed_password = await hash_password(new_password)
+        success = await async_db_manager.update_user(
             current_user.id, {"hashed_password": hashed_password}
         )
 
@@ -365,19 +395,97 @@ async def agent_heartbeat(request: Request, agent_id: str, heartbeat: HeartbeatR
         raise HTTPException(status_code=500, detail=f"Heartbeat failed: {str(e)}")
 
 
+# Serialized full listings, reused while nothing has changed (FAST_JSON)
+_agent_list_body = CachedBody()
+_script_list_body = CachedBody()
+
+
 @router.get("/agents")
-async def list_agents():
-    """List all registered agents"""
-    try:
-        agents = agent_manager.get_all_agents()
-        online_count = len(agent_manager.get_online_agents())
+async def list_agents(
+    request: Request,
+    response: Response,
+    since: Optional[str] = Query(None, description="Fleet revision token"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    customer_uuid: Optional[str] = None,
+    hostname: Optional[str] = Query(None, description="Hostname prefix"),
+    capability: Optional[str] = None,
+    version: Optional[str] = None,
+    sort: str = Query("hostname", pattern="^(" + "|".join(AGENT_SORT_COLUMNS) + ")$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+):
+    """List registered agents
 
-        return {
-            "agents": agents,
-            "total": len(agents),
-            "online": online_count,
-            "offline": len(agents) - online_count,
+    Without paging or filter parameters every agent is returned. Otherwise
+    one page of at most ``limit`` agents is returned along with
+    ``next_cursor``, to be passed back as ``cursor`` for the next page.
+
+    Responses carry the fleet revision token as an ETag, and a matching
+    ``If-None-Match`` gets 304. With ``since=<revision>`` only the agents
+    changed or removed after that revision are returned; a token from
+    another worker gets a full listing.
+    """
+    try:
+        etag = agent_manager.etag()
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+
+        if since is not None:
+            delta = await agent_manager.get_agents_since(since)
+            if delta is not None:
+                return {
+                    **delta,
+                    "full": False,
+                    "offline": delta["total"] - delta["online"],
+                }
+
+        filters = {
+            "status": status,
+            "customer_uuid": customer_uuid,
+            "hostname_prefix": hostname,
+            "capability": capability,
+            "version": version,
         }
+        paged = limit is not None or cursor is not None
+        if paged or any(filters.values()) or sort != "hostname" or order != "asc":
+            page = await agent_manager.get_agents_page(
+                limit or MAX_PAGE_SIZE,
+                cursor,
+                sort,
+                order == "desc",
+                **filters,
+            )
+            return {
+                "agents": page["agents"],
+                "count": len(page["agents"]),
+                "next_cursor": page["next_cursor"],
+                "total": page["total"],
+                "online": page["online"],
+                "offline": page["total"] - page["online"],
+            }
+
+        revision = agent_manager.revision
+
+        async def full_listing():
+            agents, online_count = await agent_manager.get_agents_with_counts()
+            return {
+                "agents": agents,
+                "total": len(agents),
+                "online": online_count,
+                "offline": len(agents) - online_count,
+                "revision": agent_manager.revision_token(revision),
+                "full": True,
+            }
+
+        if FAST_JSON:
+            return await cached_response(
+                _agent_list_body, revision, full_listing, {"ETag": etag}
+            )
+        return await full_listing()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list agents: {str(e)}")
 
@@ -386,7 +494,7 @@ async def list_agents():
 async def list_online_agents():
     """List only online agents"""
     try:
-        agents = agent_manager.get_online_agents()
+        agents = await agent_manager.get_online_agents()
         return {"agents": agents, "count": len(agents)}
     except Exception as e:
         raise HTTPException(
@@ -398,7 +506,7 @@ async def list_online_agents():
 async def get_agent_status(agent_id: str):
     """Get specific agent status"""
     try:
-        agent = agent_manager.get_agent(agent_id)
+        agent = await agent_manager.get_agent(agent_id)
         if not agent:
             raise HTTPException(status_code=404, detail="Agent not found")
         return agent
@@ -437,7 +545,7 @@ async def create_customer(customer: CustomerRegistration):
             "address": customer.address,
         }
 
-        customer_uuid = db_manager.create_customer(customer_data)
+        customer_uuid = await async_db_manager.create_customer(customer_data)
         return {"uuid": customer_uuid, "message": "Customer created successfully"}
     except Exception as e:
         raise HTTPException(
@@ -446,11 +554,21 @@ async def create_customer(customer: CustomerRegistration):
 
 
 @router.get("/customers")
-async def list_customers():
-    """List all customers"""
+async def list_customers(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """List all customers, one page at a time when ``limit`` is given"""
     try:
-        customers = db_manager.get_all_customers()
+        if limit is not None or cursor is not None:
+            page = await async_db_manager.get_customers_page(
+                limit or MAX_PAGE_SIZE, cursor
+            )
+            return {**page, "count": len(page["customers"])}
+        customers = await async_db_manager.get_all_customers()
         return {"customers": customers, "total": len(customers)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to list customers: {str(e)}"
@@ -461,7 +579,7 @@ async def list_customers():
 async def get_customer(customer_uuid: str):
     """Get specific customer"""
     try:
-        customer = db_manager.get_customer(customer_uuid)
+        customer = await async_db_manager.get_customer(customer_uuid)
         if not customer:
             raise HTTPException(status_code=404, detail="Customer not found")
         return customer
@@ -479,8 +597,9 @@ async def update_customer(customer_uuid: str, customer: CustomerRegistration):
         if customer.address is not None:
             updates["address"] = customer.address
 
-        success = db_manager.update_customer(customer_uuid, updates)
+        success = await async_db_manager.update_customer(customer_uuid, updates)
         if success:
+            agent_manager.update_customer_name(customer_uuid, customer.name)
             return {"message": "Customer updated successfully"}
         else:
             raise HTTPException(status_code=404, detail="Customer not found")
@@ -494,8 +613,9 @@ async def update_customer(customer_uuid: str, customer: CustomerRegistration):
 async def delete_customer(customer_uuid: str):
     """Delete a customer"""
     try:
-        success = db_manager.delete_customer(customer_uuid)
+        success = await async_db_manager.delete_customer(customer_uuid)
         if success:
+            agent_manager.update_customer_name(customer_uuid, None)
             return {"message": "Customer deleted successfully"}
         else:
             raise HTTPException(status_code=404, detail="Customer not found")
@@ -514,7 +634,7 @@ async def generate_customer_api_key(
 ):
     """Generate API key for a customer (admin only)"""
     try:
-        api_key = db_manager.generate_api_key(customer_uuid)
+        api_key = await async_db_manager.generate_api_key(customer_uuid)
         if api_key:
             return {"api_key": api_key, "message": "API key generated successfully"}
         else:
@@ -533,7 +653,7 @@ async def revoke_customer_api_key(
 ):
     """Revoke API key for a customer (admin only)"""
     try:
-        success = db_manager.revoke_api_key(customer_uuid)
+        success = await async_db_manager.revoke_api_key(customer_uuid)
         if success:
             return {"message": "API key revoked successfully"}
         else:
@@ -552,7 +672,7 @@ async def download_customer_config(
 ):
     """Download customer configuration file (admin only)"""
     try:
-        customer = db_manager.get_customer(customer_uuid)
+        customer = await async_db_manager.get_customer(customer_uuid)
         if not customer:
             raise HTTPException(status_code=404, detail="Customer not found")
 
@@ -609,18 +729,35 @@ async def create_script(script: ScriptRegistration):
             "customer_uuid": script.customer_uuid,
         }
 
-        script_id = db_manager.create_script(script_data)
+        script_id = await async_db_manager.create_script(script_data)
         return {"script_id": script_id, "message": "Script created successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Script creation failed: {str(e)}")
 
 
 @router.get("/scripts")
-async def list_scripts():
-    """List all scripts"""
+async def list_scripts(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """List all scripts, one page at a time when ``limit`` is given"""
     try:
-        scripts = db_manager.get_all_scripts()
-        return {"scripts": scripts, "total": len(scripts)}
+        if limit is not None or cursor is not None:
+            page = await async_db_manager.get_scripts_page(
+                limit or MAX_PAGE_SIZE, cursor
+            )
+            return {**page, "count": len(page["scripts"])}
+
+        async def full_listing():
+            scripts = await async_db_manager.get_all_scripts()
+            return {"scripts": scripts, "total": len(scripts)}
+
+        if FAST_JSON:
+            version = await async_db_manager.get_scripts_version()
+            return await cached_response(_script_list_body, version, full_listing)
+        return await full_listing()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list scripts: {str(e)}")
 
@@ -629,7 +766,7 @@ async def list_scripts():
 async def get_script(script_id: str):
     """Get specific script"""
     try:
-        script = db_manager.get_script(script_id)
+        script = await async_db_manager.get_script(script_id)
         if not script:
             raise HTTPException(status_code=404, detail="Script not found")
         return script
@@ -651,7 +788,7 @@ async def update_script(script_id: str, script: ScriptRegistration):
             "customer_uuid": script.customer_uuid,
         }
 
-        success = db_manager.update_script(script_id, updates)
+        success = await async_db_manager.update_script(script_id, updates)
         if success:
             return {"message": "Script updated successfully"}
         else:
@@ -666,7 +803,7 @@ async def update_script(script_id: str, script: ScriptRegistration):
 async def delete_script(script_id: str):
     """Delete a script"""
     try:
-        success = db_manager.delete_script(script_id)
+        success = await async_db_manager.delete_script(script_id)
         if success:
             return {"message": "Script deleted successfully"}
         else:
@@ -677,35 +814,38 @@ async def delete_script(script_id: str):
         raise HTTPException(status_code=500, detail=f"Script deletion failed: {str(e)}")
 
 
+def _script_command(script: dict, parameters: Optional[dict]) -> CommandRequest:
+    """Build the command that runs a stored script"""
+    script_content = script["content"]
+
+    # Replace parameters if provided
+    if parameters:
+        for param, value in parameters.items():
+            script_content = script_content.replace(f"${{{param}}}", value)
+
+    return CommandRequest(
+        command=script_content, shell_type=script["script_type"], timeout=30
+    )
+
+
 @router.post("/scripts/{script_id}/execute")
 async def execute_script(script_id: str, execution_request: ScriptExecutionRequest):
     """Execute a script on a specific agent"""
     try:
         # Get the script
-        script = db_manager.get_script(script_id)
+        script = await async_db_manager.get_script(script_id)
         if not script:
             raise HTTPException(status_code=404, detail="Script not found")
 
         # Get the agent
-        agent = agent_manager.get_agent(execution_request.agent_id)
+        agent = await agent_manager.get_agent(execution_request.agent_id)
         if not agent:
             raise HTTPException(status_code=404, detail="Agent not found")
 
         if agent.status != "online":
             raise HTTPException(status_code=400, detail="Agent is offline")
 
-        # Prepare the command with script content
-        script_content = script["content"]
-
-        # Replace parameters if provided
-        if execution_request.parameters:
-            for param, value in execution_request.parameters.items():
-                script_content = script_content.replace(f"${{{param}}}", value)
-
-        # Create command request
-        command_request = CommandRequest(
-            command=script_content, shell_type=script["script_type"], timeout=30
-        )
+        command_request = _script_command(script, execution_request.parameters)
 
         # Execute the command
         result = await agent_manager.send_command_to_agent(
@@ -721,6 +861,8 @@ async def execute_script(script_id: str, execution_request: ScriptExecutionReque
 
     except HTTPException:
         raise
+    except CommandQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Script execution failed: {str(e)}"
@@ -729,34 +871,152 @@ async def execute_script(script_id: str, execution_request: ScriptExecutionReque
 
 # Command execution API routes
 @router.post("/agents/{agent_id}/commands")
-async def send_command_to_agent(agent_id: str, command_request: CommandRequest):
-    """Send a command to a specific agent"""
+async def send_command_to_agent(
+    agent_id: str,
+    command_request: CommandRequest,
+    wait: float = Query(0, ge=0, le=LONG_POLL_MAX_WAIT),
+):
+    """Send a command to a specific agent
+
+    With ``wait`` the response is held until the task finishes (its result
+    is included) or ``wait`` seconds pass, in which case the usual
+    accepted/pending response is returned and the result can be polled.
+    """
     try:
         result = await agent_manager.send_command_to_agent(agent_id, command_request)
+        if wait > 0:
+            task_result = await manager.wait_for_task_result(result["task_id"], wait)
+            if task_result is not None:
+                return {
+                    **result,
+                    "status": task_result.get("status", "completed"),
+                    "message": "Command finished",
+                    "result": task_result,
+                }
         return result
+    except CommandQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Command execution failed: {str(e)}"
         )
 
 
+@router.post("/scripts/{script_id}/execute/bulk")
+async def execute_script_bulk(
+    script_id: str, execution_request: BulkScriptExecutionRequest
+):
+    """Execute a script on every agent matching the given filters"""
+    try:
+        if execution_request.is_empty():
+            raise HTTPException(
+                status_code=400,
+                detail="Provide agent_ids, customer_uuid or capability",
+            )
+
+        script = await async_db_manager.get_script(script_id)
+        if not script:
+            raise HTTPException(status_code=404, detail="Script not found")
+
+        command_request = _script_command(script, execution_request.parameters)
+        job = await agent_manager.dispatch_bulk(command_request, execution_request)
+        return {"script_id": script_id, **job}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Bulk script execution failed: {str(e)}"
+        )
+
+
+@router.post("/commands/bulk")
+async def send_bulk_command(command_request: BulkCommandRequest):
+    """Send one command to every agent matching the given filters"""
+    try:
+        if command_request.is_empty():
+            raise HTTPException(
+                status_code=400,
+                detail="Provide agent_ids, customer_uuid or capability",
+            )
+        return await agent_manager.dispatch_bulk(command_request, command_request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Bulk command execution failed: {str(e)}"
+        )
+
+
+@router.get("/jobs")
+async def list_jobs():
+    """List recent bulk dispatch jobs with their progress"""
+    jobs = [job.to_dict(include_tasks=False) for job in manager.jobs.recent()]
+    return {"jobs": jobs, "count": len(jobs)}
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get a bulk dispatch job with per-agent task IDs and statuses"""
+    job = manager.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
 @router.get("/agents/{agent_id}/commands")
-async def get_agent_commands(agent_id: str):
-    """Get pending commands for an agent (HTTP agent polling)"""
+async def get_agent_commands(
+    agent_id: str, wait: float = Query(0, ge=0, le=LONG_POLL_MAX_WAIT)
+):
+    """Get pending commands for an agent (HTTP agent polling)
+
+    Returned commands are leased: they are not returned again until the
+    lease runs out, unless acknowledged (or their result is submitted)
+    first. With ``wait`` the request is held until a command is queued or
+    ``wait`` seconds pass.
+    """
     try:
-        commands = manager.get_pending_commands(agent_id)
-        return {"commands": commands, "count": len(commands)}
+        commands = await manager.poll_pending_commands(agent_id, wait)
+        return {
+            "commands": commands,
+            "count": len(commands),
+            "lease_timeout": COMMAND_LEASE_TIMEOUT,
+        }
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to get agent commands: {str(e)}"
         )
 
 
+@router.post("/agents/{agent_id}/commands/{task_id}/ack")
+async def acknowledge_agent_command(agent_id: str, task_id: str):
+    """Confirm an HTTP agent received a command so it is not delivered again"""
+    if not manager.remove_pending_command(agent_id, task_id):
+        raise HTTPException(status_code=404, detail="Command not pending")
+    return {"message": "Command acknowledged"}
+
+
+@router.post("/agents/{agent_id}/tasks/{task_id}/result")
+async def submit_agent_task_result(agent_id: str, task_id: str, result: dict):
+    """Submit the result of a command executed by an HTTP agent"""
+    try:
+        if not await agent_manager.get_agent(agent_id):
+            raise HTTPException(status_code=404, detail="Agent not found")
+        manager.store_task_result(task_id, {"task_id": task_id, **result}, agent_id)
+        return {"message": "Task result submitted successfully"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to submit task result: {str(e)}"
+        )
+
+
 @router.get("/agents/{agent_id}/tasks")
 async def get_agent_tasks(agent_id: str):
     """Get all tasks for an agent"""
     try:
-        tasks = db_manager.get_agent_tasks(agent_id)
+        tasks = await async_db_manager.get_agent_tasks(agent_id)
         return {"tasks": tasks, "count": len(tasks)}
     except Exception as e:
         raise HTTPException(
@@ -768,7 +1028,7 @@ async def get_agent_tasks(agent_id: str):
 async def get_agent_task_status(agent_id: str, task_id: str):
     """Get specific task status from an agent"""
     try:
-        agent = agent_manager.get_agent(agent_id)
+        agent = await agent_manager.get_agent(agent_id)
         if not agent:
             raise HTTPException(status_code=404, detail="Agent not found")
 
@@ -781,6 +1041,11 @@ async def get_agent_task_status(agent_id: str, task_id: str):
         stored_result = manager.get_task_result(task_id)
         if stored_result:
             return stored_result
+
+        # Results evicted from memory are still in the tasks table
+        persisted_task = await async_db_manager.get_task(task_id)
+        if persisted_task and persisted_task["agent_id"] == agent_id:
+            return persisted_task
         else:
             # Return pending status for WebSocket agents
             return {
@@ -798,13 +1063,81 @@ async def get_agent_task_status(agent_id: str, task_id: str):
         )
 
 
+@router.get("/agents/{agent_id}/tasks/{task_id}/output")
+async def stream_agent_task_output(
+    request: Request, agent_id: str, task_id: str, from_seq: int = 0
+):
+    """Tail a task's output live as Server-Sent Events
+
+    Agents stream output with ``task_output_chunk`` messages; each chunk is
+    sent with its sequence number as the event id. ``from_seq`` (or the
+    ``Last-Event-ID`` header on reconnect) skips chunks already seen.
+    """
+    output_buffer = manager.task_output.get(task_id)
+    if output_buffer is not None and output_buffer.agent_id != agent_id:
+        raise HTTPException(status_code=404, detail="Task not found for this agent")
+
+    last_event_id = request.headers.get("Last-Event-ID", "")
+    if last_event_id.isdigit():
+        from_seq = max(from_seq, int(last_event_id) + 1)
+
+    final_result = None
+    stored_result = manager.get_task_result(task_id)
+    if stored_result and stored_result.get("status", "completed") in (
+        FINAL_TASK_STATUSES
+    ):
+        final_result = stored_result
+
+    return StreamingResponse(
+        stream_task_output(
+            manager.task_events,
+            manager.task_output,
+            request,
+            task_id,
+            from_seq=from_seq,
+            final_result=final_result,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/tasks/events")
+async def task_events(request: Request, task_id: List[str] = Query(default=[])):
+    """Stream task status transitions and results as Server-Sent Events
+
+    Pass one or more ``task_id`` parameters to follow specific tasks (the
+    stream ends once they all finish), or none to follow every task.
+    """
+    # Replay anything that arrived before the browser subscribed
+    initial_events = []
+    for watched_task_id in task_id:
+        stored_result = manager.get_task_result(watched_task_id)
+        if stored_result:
+            initial_events.append(
+                {
+                    "event": "task_status",
+                    "task_id": watched_task_id,
+                    "data": stored_result,
+                }
+            )
+
+    return StreamingResponse(
+        stream_task_events(
+            manager.task_events, request, task_id or None, initial_events
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # Health check
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
     try:
-        online_agents = len(agent_manager.get_online_agents())
-        total_agents = len(agent_manager.get_all_agents())
+        agents, online_agents = await agent_manager.get_agents_with_counts()
+        total_agents = len(agents)
         from main import manager
 
         websocket_connections = len(manager.active_connections)
@@ -817,6 +1150,10 @@ async def health_check():
                 "offline": total_agents - online_agents,
             },
             "websocket_connections": websocket_connections,
+            "task_results": manager.task_results.metrics(),
+            "task_writer": manager.task_writer.metrics(),
+            "task_output": manager.task_output.metrics(),
+            "password_hashing": password_hasher.metrics(),
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Health check failed: {str(e)}")
@@ -833,7 +1170,7 @@ async def get_pending_users(current_user: User = Depends(get_current_admin_user)
     logger.info(f"🔍 Pending users request from admin: {current_user.username}")
 
     try:
-        pending_users = db_manager.get_pending_users()
+        pending_users = await async_db_manager.get_pending_users()
         logger.info(f"✅ Found {len(pending_users)} pending users")
         return {"pending_users": pending_users, "total": len(pending_users)}
     except Exception as e:
@@ -849,7 +1186,7 @@ async def approve_user(
 ):
     """Approve a user (admin only)"""
     try:
-        success = db_manager.approve_user(user_id, current_user.username)
+        success = await async_db_manager.approve_user(user_id, current_user.username)
         if success:
             return {"message": "User approved successfully"}
         else:
@@ -866,7 +1203,7 @@ async def reject_user(
 ):
     """Reject a user (admin only)"""
     try:
-        success = db_manager.reject_user(user_id)
+        success = await async_db_manager.reject_user(user_id)
         if success:
             return {"message": "User rejected successfully"}
         else:
@@ -883,7 +1220,7 @@ async def make_user_admin(
 ):
     """Make a user an admin (admin only)"""
     try:
-        success = db_manager.make_admin(user_id)
+        success = await async_db_manager.make_admin(user_id)
         if success:
             return {"message": "User made admin successfully"}
         else:
@@ -902,7 +1239,7 @@ async def remove_user_admin(
 ):
     """Remove admin privileges from a user (admin only)"""
     try:
-        success = db_manager.remove_admin(user_id)
+        success = await async_db_manager.remove_admin(user_id)
         if success:
             return {"message": "Admin privileges removed successfully"}
         else:
@@ -6,26 +6,26 @@ import sys
 import uuid
 from datetime import timedelta
 from pathlib import Path
+from typing import Optional
 
 from fastapi import APIRouter, Depends, Form, HTTPException, Request
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
-from jose import JWTError, jwt
 
 sys.path.append(str(Path(__file__).parent.parent / "Scripts"))
 from auth import (
-    ALGORITHM,
-    SECRET_KEY,
     User,
     UserCreate,
     UserLogin,
+    check_user_password,
     create_access_token,
     get_current_active_user,
-    get_password_hash,
-    verify_password,
+    get_user_for_token,
+    hash_password,
 )
 
-from database import db_manager
+from Scripts.database import async_db_manager
+from Scripts.task_events import FINAL_TASK_STATUSES
 
 # Create router
 router = APIRouter(prefix="/ui", tags=["UI"])
@@ -73,10 +73,10 @@ async def login(request: Request, username: str = Form(...), password: str = For
         user_agent = request.headers.get("User-Agent")
 
         # Get user with password
-        user_data = db_manager.get_user_with_password(username)
+        user_data = await async_db_manager.get_user_with_password(username)
         if not user_data:
             # Record failed login attempt
-            db_manager.record_login_attempt(
+            await async_db_manager.record_login_attempt(
                 user_id="unknown",
                 username=username,
                 source_ip_external=source_ip_external,
@@ -91,9 +91,9 @@ async def login(request: Request, username: str = Form(...), password: str = For
             )
 
         # Verify password
-        if not verify_password(password, user_data["hashed_password"]):
+        if not await check_user_password(user_data, password):
             # Record failed login attempt
-            db_manager.record_login_attempt(
+            await async_db_manager.record_login_attempt(
                 user_id=user_data["id"],
                 username=user_data["username"],
                 source_ip_external=source_ip_external,
@@ -110,7 +110,7 @@ async def login(request: Request, username: str = Form(...), password: str = For
         # Check if user is active
         if not user_data["is_active"]:
             # Record failed login attempt
-            db_manager.record_login_attempt(
+            await async_db_manager.record_login_attempt(
                 user_id=user_data["id"],
                 username=user_data["username"],
                 source_ip_external=source_ip_external,
@@ -124,7 +124,7 @@ async def login(request: Request, username: str = Form(...), password: str = For
             )
 
         # Record successful login
-        db_manager.record_login_attempt(
+        await async_db_manager.record_login_attempt(
             user_id=user_data["id"],
             username=user_data["username"],
             source_ip_external=source_ip_external,
@@ -173,14 +173,14 @@ async def register(
     """Handle registration"""
     try:
         # Check if user already exists
-        existing_user = db_manager.get_user_by_username(username)
+        existing_user = await async_db_manager.get_user_by_username(username)
         if existing_user:
             return templates.TemplateResponse(
                 "register.html",
                 {"request": request, "error": "Username already exists"},
             )
 
-        existing_email = db_manager.get_user_by_email(email)
+        existing_email = await async_db_manager.get_user_by_email(email)
         if existing_email:
             return templates.TemplateResponse(
                 "register.html", {"request": request, "error": "Email already exists"}
@@ -192,13 +192,13 @@ async def register(
             "username": username,
             "email": email,
             "full_name": full_name if full_name else None,
-            "hashed_password": get_password_hash(password),
+            "hashed_password": await hash_password(password),
             "is_active": True,
             "is_admin": False,
             "is_approved": False,
         }
 
-        db_manager.create_user(user_data)
+        await async_db_manager.create_user(user_data)
 
         # Redirect to login with approval message
         response = RedirectResponse(url="/ui/login", status_code=302)
@@ -221,6 +221,22 @@ async def logout():
 
 
 # Protected UI routes
+async def get_page_user(request: Request) -> Optional[dict]:
+    """The user logged in with the access_token cookie, if any"""
+    access_token = request.cookies.get("access_token")
+    if not access_token:
+        return None
+    return await get_user_for_token(access_token)
+
+
+async def render_for_approved_user(request: Request, template: str):
+    """Render a page for approved users; send anyone else to the login page"""
+    user_data = await get_page_user(request)
+    if not user_data or not user_data.get("is_approved"):
+        return RedirectResponse(url="/ui/login", status_code=302)
+    return templates.TemplateResponse(template, {"request": request})
+
+
 @router.get("/dashboard", response_class=HTMLResponse)
 async def dashboard(request: Request):
     """Main dashboard page"""
@@ -232,141 +248,45 @@ async def dashboard(request: Request):
         f"🔍 Dashboard access attempt from {request.client.host if request.client else 'unknown'}"
     )
 
-    # Check if user is authenticated
-    access_token = request.cookies.get("access_token")
-    if not access_token:
+    # Check if user is authenticated and approved
+    user_data = await get_page_user(request)
+    if not user_data or not user_data.get("is_approved"):
         logger.warning(
-            f"❌ No access token found for dashboard access from {request.client.host}"
+            f"❌ No approved user for dashboard access from {request.client.host}"
         )
         return RedirectResponse(url="/ui/login", status_code=302)
 
-    try:
-        # Verify token
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        if not username:
-            logger.warning(
-                f"❌ No username in token for dashboard access from {request.client.host}"
-            )
-            return RedirectResponse(url="/ui/login", status_code=302)
-
-        # Check if user exists and is approved
-        user_data = db_manager.get_user_by_username(username)
-        if not user_data or not user_data.get("is_approved"):
-            logger.warning(
-                f"❌ User not found or not approved: {username} from {request.client.host}"
-            )
-            return RedirectResponse(url="/ui/login", status_code=302)
-
-        logger.info(
-            f"✅ Dashboard access granted for user: {username} from {request.client.host}"
-        )
-        return templates.TemplateResponse("dashboard.html", {"request": request})
-    except JWTError as e:
-        logger.error(
-            f"❌ JWT error for dashboard access from {request.client.host}: {str(e)}"
-        )
-        return RedirectResponse(url="/ui/login", status_code=302)
+    logger.info(
+        f"✅ Dashboard access granted for user: {user_data['username']} from {request.client.host}"
+    )
+    return templates.TemplateResponse(
+        "dashboard.html",
+        {"request": request, "final_task_statuses": sorted(FINAL_TASK_STATUSES)},
+    )
 
 
 @router.get("/customers", response_class=HTMLResponse)
 async def customers_page(request: Request):
     """Customers management page"""
-    # Check if user is authenticated
-    access_token = request.cookies.get("access_token")
-    if not access_token:
-        return RedirectResponse(url="/ui/login", status_code=302)
-
-    try:
-        # Verify token
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        if not username:
-            return RedirectResponse(url="/ui/login", status_code=302)
-
-        # Check if user exists and is approved
-        user_data = db_manager.get_user_by_username(username)
-        if not user_data or not user_data.get("is_approved"):
-            return RedirectResponse(url="/ui/login", status_code=302)
-
-        return templates.TemplateResponse("customers.html", {"request": request})
-    except JWTError:
-        return RedirectResponse(url="/ui/login", status_code=302)
+    return await render_for_approved_user(request, "customers.html")
 
 
 @router.get("/scripts", response_class=HTMLResponse)
 async def scripts_page(request: Request):
     """Scripts management page"""
-    # Check if user is authenticated
-    access_token = request.cookies.get("access_token")
-    if not access_token:
-        return RedirectResponse(url="/ui/login", status_code=302)
-
-    try:
-        # Verify token
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        if not username:
-            return RedirectResponse(url="/ui/login", status_code=302)
-
-        # Check if user exists and is approved
-        user_data = db_manager.get_user_by_username(username)
-        if not user_data or not user_data.get("is_approved"):
-            return RedirectResponse(url="/ui/login", status_code=302)
-
-        return templates.TemplateResponse("scripts.html", {"request": request})
-    except JWTError:
-        return RedirectResponse(url="/ui/login", status_code=302)
+    return await render_for_approved_user(request, "scripts.html")
 
 
 @router.get("/users", response_class=HTMLResponse)
 async def users_page(request: Request):
     """Users management page"""
-    # Check if user is authenticated
-    access_token = request.cookies.get("access_token")
-    if not access_token:
-        return RedirectResponse(url="/ui/login", status_code=302)
-
-    try:
-        # Verify token
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        if not username:
-            return RedirectResponse(url="/ui/login", status_code=302)
-
-        # Check if user exists and is approved
-        user_data = db_manager.get_user_by_username(username)
-        if not user_data or not user_data.get("is_approved"):
-            return RedirectResponse(url="/ui/login", status_code=302)
-
-        return templates.TemplateResponse("users.html", {"request": request})
-    except JWTError:
-        return RedirectResponse(url="/ui/login", status_code=302)
+    return await render_for_approved_user(request, "users.html")
 
 
 @router.get("/profile", response_class=HTMLResponse)
 async def profile_page(request: Request):
     """User profile page"""
-    # Check if user is authenticated
-    access_token = request.cookies.get("access_token")
-    if not access_token:
-        return RedirectResponse(url="/ui/login", status_code=302)
-
-    try:
-        # Verify token
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        if not username:
-            return RedirectResponse(url="/ui/login", status_code=302)
-
-        # Check if user exists and is approved
-        user_data = db_manager.get_user_by_username(username)
-        if not user_data or not user_data.get("is_approved"):
-            return RedirectResponse(url="/ui/login", status_code=302)
-
-        return templates.TemplateResponse("profile.html", {"request": request})
-    except JWTError:
-        return RedirectResponse(url="/ui/login", status_code=302)
+    return await render_for_approved_user(request, "profile.html")
 
 
 @router.get("/admin", response_class=HTMLResponse)
@@ -381,64 +301,28 @@ async def admin_dashboard(request: Request):
     )
 
     # Check if user is authenticated and is admin
-    access_token = request.cookies.get("access_token")
-    if not access_token:
+    user_data = await get_page_user(request)
+    if not user_data:
         logger.warning(
-            f"❌ No access token found for admin dashboard access from {request.client.host}"
+            f"❌ No valid login for admin dashboard access from {request.client.host}"
         )
         return RedirectResponse(url="/ui/login", status_code=302)
-
-    try:
-        # Verify token and check if user is admin
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        if not username:
-            logger.warning(
-                f"❌ No username in token for admin dashboard access from {request.client.host}"
-            )
-            return RedirectResponse(url="/ui/login", status_code=302)
-
-        user_data = db_manager.get_user_by_username(username)
-        if not user_data or not user_data.get("is_admin"):
-            logger.warning(f"❌ User not admin: {username} from {request.client.host}")
-            return RedirectResponse(url="/ui/dashboard", status_code=302)
-
-        logger.info(
-            f"✅ Admin dashboard access granted for user: {username} from {request.client.host}"
-        )
-        return templates.TemplateResponse("admin_dashboard.html", {"request": request})
-    except JWTError as e:
-        logger.error(
-            f"❌ JWT error for admin dashboard access from {request.client.host}: {str(e)}"
+    if not user_data.get("is_admin"):
+        logger.warning(
+            f"❌ User not admin: {user_data['username']} from {request.client.host}"
         )
-        return RedirectResponse(url="/ui/login", status_code=302)
+        return RedirectResponse(url="/ui/dashboard", status_code=302)
+
+    logger.info(
+        f"✅ Admin dashboard access granted for user: {user_data['username']} from {request.client.host}"
+    )
+    return templates.TemplateResponse("admin_dashboard.html", {"request": request})
 
 
 @router.get("/test", response_class=HTMLResponse)
 async def test_page(request: Request):
     """Test page for debugging"""
-    # Check if user is authenticated
-    access_token = request.cookies.get("access_token")
-    if not access_token:
-        return RedirectResponse(url="/ui/login", status_code=302)
-
-    try:
-        # Verify token
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        if not username:
-            return RedirectResponse(url="/ui/login", status_code=302)
-
-        # Check if user exists and is approved
-        user_data = db_manager.get_user_by_username(username)
-        if not user_data or not user_data.get("is_approved"):
-            return RedirectResponse(url="/ui/login", status_code=302)
-
-        return templates.TemplateResponse(
-            "test_user_display.html", {"request": request}
-        )
-    except JWTError:
-        return RedirectResponse(url="/ui/login", status_code=302)
+    return await render_for_approved_user(request, "test_user_display.html")
 
 
 @router.get("/admin-test", response_class=HTMLResponse)
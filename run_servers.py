@@ -1,19 +1,36 @@
 #!/usr/bin/env python3
 """
 Run both HTTP and HTTPS servers simultaneously
+
+Both ports are served from one process (one event loop, one set of managers),
+so an agent connected over wss:// is visible to an operator on the HTTP port.
+With ``--workers N`` that process is started N times and every worker binds
+the ports with SO_REUSEPORT; the workers share agents over the Unix socket message
+bus.
 """
 
+import argparse
+import asyncio
+import contextlib
+import multiprocessing
+import os
 import signal
+import socket
 import subprocess
 import sys
-import time
 from pathlib import Path
+from typing import List, Optional, Tuple
+
+import uvicorn
+
+CERT_FILE = Path("CertificateConfiguration/certs/server.crt")
+KEY_FILE = Path("CertificateConfiguration/certs/server.key")
 
 
 def check_certificates():
     """Check if SSL certificates exist"""
-    cert_file = Path("CertificateConfiguration/certs/server.crt")
-    key_file = Path("CertificateConfiguration/certs/server.key")
+    cert_file = CERT_FILE
+    key_file = KEY_FILE
 
     if not cert_file.exists() or not key_file.exists():
         print("❌ SSL certificates not found!")
@@ -32,54 +49,186 @@ def check_certificates():
     return True
 
 
-def main():
-    print("🚀 Starting Remote Agent Manager with SSL/TLS support...")
+class Listener(uvicorn.Server):
+    """A uvicorn server that leaves signal handling to ``serve``
+
+    uvicorn installs its own SIGINT/SIGTERM handlers per server; with several
+    servers on one loop only the last one would ever hear the signal.
+    """
+
+    @contextlib.contextmanager
+    def capture_signals(self):
+        yield
+
+    def install_signal_handlers(self):
+        pass
+
+
+def bind_socket(host: str, port: int, reuse_port: bool = False) -> socket.socket:
+    """Listening socket; with ``reuse_port`` several workers can bind the port"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+
+def build_listeners(
+    app,
+    host: str,
+    http_port: Optional[int],
+    https_port: Optional[int],
+    reuse_port: bool = False,
+) -> List[Tuple[Listener, List[socket.socket]]]:
+    """One server per port; only the first one runs the app's lifespan"""
+    listeners = []
+    # Agent messages are repetitive JSON; deflate is negotiated per socket
+    if http_port is not None:
+        config = uvicorn.Config(
+            app, host=host, port=http_port, ws_per_message_deflate=True
+        )
+        listeners.append(config)
+    if https_port is not None:
+        config = uvicorn.Config(
+            app,
+            host=host,
+            port=https_port,
+            ssl_certfile=str(CERT_FILE),
+            ssl_keyfile=str(KEY_FILE),
+            ws_per_message_deflate=True,
+        )
+        listeners.append(config)
+
+    servers = []
+    for index, config in enumerate(listeners):
+        # Startup/shutdown (registry load, background flushers) must run once
+        config.lifespan = "on" if index == 0 else "off"
+        sockets = [bind_socket(host, config.port, reuse_port)]
+        servers.append((Listener(config), sockets))
+    return servers
+
+
+async def serve(servers: List[Tuple[Listener, List[socket.socket]]]):
+    """Run every server on this event loop until SIGINT/SIGTERM
+
+    The first server (the one running the lifespan) starts before the others
+    accept connections, and stops last.
+    """
+    loop = asyncio.get_running_loop()
+
+    def stop():
+        # The secondary servers stop first; the primary follows below
+        for server, _ in servers[1:] or servers:
+            server.should_exit = True
+
+    signals = (signal.SIGINT, signal.SIGTERM)
+    with contextlib.suppress(NotImplementedError, RuntimeError):
+        for sig in signals:
+            loop.add_signal_handler(sig, stop)
+    try:
+        await _serve_all(servers, stop)
+    finally:
+        for sig in signals:
+            with contextlib.suppress(NotImplementedError, RuntimeError):
+                loop.remove_signal_handler(sig)
+
+
+async def _serve_all(servers: List[Tuple[Listener, List[socket.socket]]], stop):
+    primary, primary_sockets = servers[0]
+    primary_task = asyncio.create_task(primary.serve(sockets=primary_sockets))
+    while not primary.started and not primary_task.done():
+        await asyncio.sleep(0.05)
+    if primary_task.done():
+        # Startup failed; don't open the other ports
+        await primary_task
+        return
 
-    # Check certificates
-    if not check_certificates():
-        print("⚠️  Starting HTTP server only (no SSL certificates)")
-        http_process = subprocess.Popen([sys.executable, "main.py"])
+    others = [
+        asyncio.create_task(server.serve(sockets=sockets))
+        for server, sockets in servers[1:]
+    ]
+    # Once any server stops (signal or failure), stop them all
+    await asyncio.wait([primary_task, *others], return_when=asyncio.FIRST_COMPLETED)
+    stop()
+    await asyncio.gather(*others)
+    primary.should_exit = True
+    await primary_task
 
-        try:
-            http_process.wait()
-        except KeyboardInterrupt:
-            print("\n🛑 Shutting down...")
-            http_process.terminate()
-        return
 
-    # Start HTTP server (port 80)
-    print("📡 Starting HTTP server on port 80...")
-    http_process = subprocess.Popen([sys.executable, "Scripts/main.py"])
+def run_worker(host: str, http_port: int, https_port: Optional[int], reuse_port: bool):
+    """Import the app and serve it on the given ports in this process"""
+    sys.path.insert(0, str(Path(__file__).parent / "Scripts"))
+    from main import app
 
-    # Wait a moment for HTTP server to start
-    time.sleep(3)
+    servers = build_listeners(app, host, http_port, https_port, reuse_port)
+    asyncio.run(serve(servers))
 
-    # Start HTTPS server (port 443)
-    print("🔒 Starting HTTPS server on port 443...")
-    https_process = subprocess.Popen([sys.executable, "Scripts/main.py", "--https"])
 
-    print("\n✅ Both servers started successfully!")
-    print("📡 HTTP server: http://remote.skyshift.dev:80")
-    print("🔒 HTTPS server: https://remote.skyshift.dev:443")
-    print("\nPress Ctrl+C to stop all servers...")
+def run_workers(workers: int, host: str, http_port: int, https_port: Optional[int]):
+    """Fork ``workers`` processes sharing the ports through SO_REUSEPORT"""
+    if not hasattr(socket, "SO_REUSEPORT"):
+        print("⚠️  SO_REUSEPORT is not available here; running a single worker")
+        run_worker(host, http_port, https_port, reuse_port=False)
+        return
+
+    # The workers find each other's agents through the message bus
+    os.environ.setdefault("MESSAGE_BUS", "unix")
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(
+            target=run_worker, args=(host, http_port, https_port, True), daemon=False
+        )
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
 
     def signal_handler(sig, frame):
-        print("\n🛑 Shutting down servers...")
-        http_process.terminate()
-        https_process.terminate()
-        http_process.wait()
-        https_process.wait()
-        print("✅ Servers stopped")
-        sys.exit(0)
+        print("\n🛑 Shutting down workers...")
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
 
     signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+    for process in processes:
+        process.join()
+    print("✅ Servers stopped")
 
-    try:
-        # Keep running until interrupted
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        signal_handler(None, None)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Remote Agent Manager")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--http-port", type=int, default=80)
+    parser.add_argument("--https-port", type=int, default=443)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="worker processes sharing the ports via SO_REUSEPORT",
+    )
+    args = parser.parse_args()
+
+    print("🚀 Starting Remote Agent Manager with SSL/TLS support...")
+
+    https_port = args.https_port
+    if not check_certificates():
+        print("⚠️  Starting HTTP server only (no SSL certificates)")
+        https_port = None
+
+    print(f"📡 HTTP server: http://remote.skyshift.dev:{args.http_port}")
+    if https_port is not None:
+        print(f"🔒 HTTPS server: https://remote.skyshift.dev:{https_port}")
+    print("\nPress Ctrl+C to stop all servers...")
+
+    if args.workers > 1:
+        print(f"👥 Starting {args.workers} workers...")
+        run_workers(args.workers, args.host, args.http_port, https_port)
+    else:
+        run_worker(args.host, args.http_port, https_port, reuse_port=False)
+        print("✅ Servers stopped")
 
 
 if __name__ == "__main__":